@@ -0,0 +1,192 @@
+"""
+Deadline-aware admission control for caller turns.
+
+Twilio abandons a webhook after ~15 s. Every turn gets a deadline when
+its request arrives; before each expensive stage the controller estimates
+what the rest of the pipeline will cost and, if it cannot finish in time,
+the turn is shed to a cheap path instead of timing out:
+
+- "spl":   the closest SPL intent, with a relaxed similarity threshold
+- "cache": a recent reply to the same question (same tenant)
+- "say":   the LLM reply spoken by Twilio's <Say> (no local TTS)
+- "hold":  a pre-rendered "please hold / repeat that" clip, then re-record
+
+A stage's cost is its smoothed service time (measured on the worker, so
+queueing is excluded) times the work queued ahead of it per worker:
+
+    estimate(stage) = service(stage) * (1 + queued(stage) / workers(stage))
+
+Turn outcomes and the current estimates are exported at /metrics
+(Prometheus text format).
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+
+from app.config import (
+    ADMISSION_REPLY_CACHE_SIZE,
+    ADMISSION_SAFETY_MARGIN,
+    ADMISSION_TURN_DEADLINE,
+)
+from app.cpu_scheduler import cpu_scheduler
+from app.profiler import current_call_sid, sampling_profiler
+from app.spl_engine import normalize_text
+
+# Cold-start service times (seconds) until real latencies are observed
+DEFAULT_SERVICE_TIMES = {"stt": 1.5, "llm": 5.0, "tts": 2.0}
+
+OUTCOMES = ("full", "spl", "shed_spl", "shed_cache", "shed_say", "shed_hold", "error")
+
+
+@dataclass
+class TurnBudget:
+    deadline: float  # seconds after start
+    start: float
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def remaining(self) -> float:
+        return self.deadline - self.elapsed()
+
+
+class ReplyCache:
+    """
+    LRU of recent full-pipeline replies keyed by (tenant, normalized question).
+    """
+
+    def __init__(self, max_size: int = ADMISSION_REPLY_CACHE_SIZE):
+        self.max_size = max_size
+        self._replies: "OrderedDict[Tuple[Optional[str], str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id: Optional[str], question: str) -> Optional[str]:
+        key = (tenant_id, normalize_text(question))
+        with self._lock:
+            reply = self._replies.get(key)
+            if reply is not None:
+                self._replies.move_to_end(key)
+            return reply
+
+    def put(self, tenant_id: Optional[str], question: str, reply: str):
+        key = (tenant_id, normalize_text(question))
+        with self._lock:
+            self._replies[key] = reply
+            self._replies.move_to_end(key)
+            while len(self._replies) > self.max_size:
+                self._replies.popitem(last=False)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        deadline: float = ADMISSION_TURN_DEADLINE,
+        safety_margin: float = ADMISSION_SAFETY_MARGIN,
+        smoothing: float = 0.3,
+        service_times: Optional[Dict[str, float]] = None,
+    ):
+        self.deadline = deadline
+        self.safety_margin = safety_margin
+        self.smoothing = smoothing
+
+        self._lock = threading.Lock()
+        self._service: Dict[str, float] = dict(service_times or DEFAULT_SERVICE_TIMES)
+        self._queued: Counter = Counter()
+        self._outcomes: Counter = Counter({outcome: 0 for outcome in OUTCOMES})
+        self.reply_cache = ReplyCache()
+
+    # =========================
+    # Budget & estimates
+    # =========================
+
+    def start_turn(self) -> TurnBudget:
+        return TurnBudget(deadline=self.deadline, start=time.monotonic())
+
+    def estimate(self, stage: str) -> float:
+        with self._lock:
+            workers = cpu_scheduler.plan[stage].workers if stage in cpu_scheduler.plan else 1
+            return self._service.get(stage, 0.0) * (1 + self._queued[stage] / max(workers, 1))
+
+    def fits(self, budget: TurnBudget, stages: Iterable[str]) -> bool:
+        """
+        Whether ``stages`` can still finish before the turn's deadline.
+        """
+        return sum(self.estimate(stage) for stage in stages) <= budget.remaining() - self.safety_margin
+
+    def _record_service(self, stage: str, seconds: float):
+        with self._lock:
+            previous = self._service.get(stage)
+            if previous is None:
+                self._service[stage] = seconds
+            else:
+                self._service[stage] = self.smoothing * seconds + (1 - self.smoothing) * previous
+
+    async def run(self, stage: str, fn: Callable, *args, **kwargs):
+        """
+        ``cpu_scheduler.arun`` with queue accounting and a service-time
+        measurement taken on the worker (queue wait excluded). The worker is
+        tagged with the request's CallSid for the sampling profiler.
+        """
+        call_sid = current_call_sid.get()
+
+        def timed_call():
+            start = time.perf_counter()
+            try:
+                with sampling_profiler.tag_thread(call_sid):
+                    return fn(*args, **kwargs)
+            finally:
+                self._record_service(stage, time.perf_counter() - start)
+
+        with self._lock:
+            self._queued[stage] += 1
+        try:
+            return await cpu_scheduler.arun(stage, timed_call)
+        finally:
+            with self._lock:
+                self._queued[stage] -= 1
+
+    # =========================
+    # Outcomes & export
+    # =========================
+
+    def record(self, outcome: str, call_sid: Optional[str] = None, budget: Optional[TurnBudget] = None):
+        with self._lock:
+            self._outcomes[outcome] += 1
+        if outcome.startswith("shed_"):
+            elapsed = f" after {budget.elapsed():.1f}s" if budget is not None else ""
+            logger.warning(f"[ADMISSION] Shed turn for {call_sid} -> {outcome}{elapsed} (estimates: {self.estimates()})")
+
+    def estimates(self) -> Dict[str, float]:
+        return {stage: round(self.estimate(stage), 2) for stage in sorted(self._service)}
+
+    def metrics_text(self) -> str:
+        with self._lock:
+            outcomes = dict(self._outcomes)
+            queued = dict(self._queued)
+        lines = [
+            "# HELP voice_turns_total Caller turns by outcome (full pipeline, SPL, or shed path).",
+            "# TYPE voice_turns_total counter",
+        ]
+        lines += [f'voice_turns_total{{outcome="{outcome}"}} {count}' for outcome, count in sorted(outcomes.items())]
+        lines += [
+            "# HELP voice_turns_shed_total Caller turns shed to a cheap path to meet the deadline.",
+            "# TYPE voice_turns_shed_total counter",
+            f"voice_turns_shed_total {sum(c for o, c in outcomes.items() if o.startswith('shed_'))}",
+            "# HELP voice_stage_estimate_seconds Estimated cost of a stage for a new turn, incl. queue.",
+            "# TYPE voice_stage_estimate_seconds gauge",
+        ]
+        lines += [f'voice_stage_estimate_seconds{{stage="{stage}"}} {seconds}' for stage, seconds in self.estimates().items()]
+        lines += [
+            "# HELP voice_stage_queued Calls waiting for or running on a stage.",
+            "# TYPE voice_stage_queued gauge",
+        ]
+        lines += [f'voice_stage_queued{{stage="{stage}"}} {count}' for stage, count in sorted(queued.items())]
+        return "\n".join(lines) + "\n"
+
+
+admission_controller = AdmissionController()
@@ -1,13 +1,39 @@
 from langchain_community.llms import LlamaCpp
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import Chroma
 import os
+import time
+from typing import Iterator, Optional, Tuple
+
+from app.config import (
+    CHROMA_DB_PATH,
+    KNOWLEDGE_BASE_PATH,
+    PHI2_MODEL_PATH,
+    LLAMA3B_MODEL_PATH,
+    LLM_N_CTX,
+    LLM_MAX_TOKENS,
+    LLM_SPECULATIVE,
+    RETRIEVAL_K,
+    SPL_RULES_PATH,
+)
+from app.cpu_scheduler import cpu_scheduler
+from app.speculative import DraftModelDrafter, make_drafter
+from app.spl_engine import SPLEngine, SPLResult, load_rules
+from app.tenants import Tenant, tenant_store
+from app.transcript_gate import transcript_gate
+from app.embedding_engine import get_embedding_engine
+from app.prompt_builder import GenerationResult, PackedPrompt, PromptBuilder
+from app.vector_search import split_knowledge_base
+
+# Optional speculative-decoding drafter (LLM_SPECULATIVE)
+try:
+    drafter = make_drafter(LLM_SPECULATIVE, n_threads=cpu_scheduler.plan["llm"].threads)
+except Exception as e:
+    print(f"Error loading speculative drafter, decoding without it: {e}")
+    drafter = None
 
-from app.config import CHROMA_DB_PATH, PHI2_MODEL_PATH, LLAMA3B_MODEL_PATH
-from app.spl_engine import SPLEngine
-
-# Initialize SPL Engine
-spl_engine = SPLEngine()
+llm_kwargs = cpu_scheduler.llama_kwargs() # n_threads / n_threads_batch for the LLM core set
+if drafter is not None:
+    llm_kwargs.setdefault("model_kwargs", {})["draft_model"] = drafter
 
 # Load the LLM model (using LlamaCpp for GGUF)
 # Ensure you have either phi-2.gguf or llama-3b.gguf in the models/ directory
@@ -17,17 +43,20 @@ try:
     
     llm = LlamaCpp(
         model_path=model_path,
-        n_ctx=2048, # Context window size
+        n_ctx=LLM_N_CTX, # Context window size
         n_gpu_layers=-1, # Offload all layers to GPU if available
         verbose=True, # Enable verbose output for debugging
+        **llm_kwargs,
     )
+    if isinstance(drafter, DraftModelDrafter):
+        drafter.bind(llm.client)
 except Exception as e:
     print(f"Error loading LLM model for RAG: {e}")
     llm = None
 
 # Load the embeddings model
 try:
-    embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+    embeddings = get_embedding_engine()
 except Exception as e:
     print(f"Error loading embeddings model for RAG: {e}")
     embeddings = None
@@ -35,63 +64,189 @@ except Exception as e:
 # Load the Chroma vector store
 try:
     vectorstore = Chroma(persist_directory=CHROMA_DB_PATH, embedding_function=embeddings)
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 1})
+    # Several candidates; the prompt builder packs them by relevance within budget
+    retriever = vectorstore.as_retriever(search_kwargs={"k": RETRIEVAL_K})
 except Exception as e:
     print(f"Error loading Chroma vector store: {e}")
     vectorstore = None
     retriever = None
 
-def get_rag_response(query: str) -> str:
+def load_default_rules():
+    """
+    Default rule pack: SPL_RULES_PATH if it exists, the built-in rules otherwise.
+    """
+    return load_rules(SPL_RULES_PATH) if os.path.exists(SPL_RULES_PATH) else None
+
+# Initialize SPL Engine (Layer 2 shares the retrieval embeddings model)
+try:
+    spl_engine = SPLEngine(embeddings=embeddings, patterns=load_default_rules())
+except Exception as e:
+    print(f"Error loading SPL rules from {SPL_RULES_PATH}, using the built-in rules: {e}")
+    spl_engine = SPLEngine(embeddings=embeddings)
+
+# Token-budgeted prompt packing + early stop at the sentence limit
+prompt_builder = PromptBuilder(llm, drafter=drafter)
+
+def get_spl_engine(tenant_id: Optional[str] = None) -> SPLEngine:
+    """
+    SPL engine for a tenant's rule pack (default rules when ``tenant_id`` is None).
+    """
+    return tenant_store.get(tenant_id).spl_engine if tenant_id else spl_engine
+
+def decide_for_tenant(text: str, tenant_id: Optional[str] = None, stt_issue: Optional[str] = None) -> Tuple[SPLEngine, SPLResult]:
+    """
+    SPL decision with the tenant's engine, and the engine itself (for
+    ``closest_intent`` when shedding). Blocking: the first use of a tenant,
+    or one whose index is stale or evicted, loads or rebuilds its index, so
+    async callers run this in a thread.
+    """
+    spl = get_spl_engine(tenant_id)
+    return spl, spl.decide(text, stt_issue)
+
+# =========================
+# Hot reload (see app.hot_reload)
+# =========================
+# Rebuilt objects replace the module globals in one assignment each; turns
+# already running keep the objects they started with. Models are untouched.
+
+def reload_default_rules():
+    """
+    Rebuild the default SPL engine from its rule pack and swap it in.
+    Raises (keeping the current rules) if the rule pack is invalid.
+    """
+    global spl_engine
+    spl_engine = SPLEngine(embeddings=embeddings, patterns=load_default_rules())
+
+def reload_default_knowledge_base():
+    """
+    Re-chunk and re-embed data/knowledge_base.md into a new in-memory Chroma
+    collection and swap it in. Returns the new store. The persisted index is
+    rebuilt only by ``python -m app.vector_search``.
+    """
+    global vectorstore, retriever
+    with open(KNOWLEDGE_BASE_PATH, "r", encoding="utf-8") as f:
+        docs = split_knowledge_base(f.read())
+    store = Chroma.from_texts(
+        texts=docs,
+        embedding=embeddings,
+        collection_name=f"knowledge_base_{time.time_ns()}", # in-memory collections share one client
+    )
+    retriever = store.as_retriever(search_kwargs={"k": RETRIEVAL_K})
+    vectorstore = store
+    print(f"Reloaded knowledge base: {len(docs)} chunks")
+    return store
+
+def retrieve_documents(query: str, query_embedding=None):
+    """
+    Retrieve context for a query, reusing an embedding computed upstream
+    (e.g. by SPL Layer 2) so the query is never embedded twice.
+    """
+    if query_embedding is not None and vectorstore is not None:
+        return vectorstore.similarity_search_by_vector(
+            query_embedding.tolist(), k=retriever.search_kwargs.get("k", 1)
+        )
+    return retriever.invoke(query)
+
+def _print_token_usage(packed: PackedPrompt, result: GenerationResult):
+    print("\n📊 LLM TOKEN USAGE")
+    print(f"Prefill tokens: {result.prefill_tokens} "
+          f"(context chunks: {packed.chunks_used} used, {packed.chunks_trimmed} trimmed, {packed.chunks_dropped} dropped)")
+    print(f"Decode tokens: {result.decode_tokens}"
+          f"{' (stopped at sentence limit)' if result.stopped_early else ''}")
+    print("Total tokens:", result.prefill_tokens + result.decode_tokens)
+    if result.draft_proposed:
+        print(f"Speculative ({drafter.name}): {result.draft_accepted}/{result.draft_proposed} draft tokens accepted "
+              f"({result.draft_accepted / result.draft_proposed:.0%})")
+
+def _retrieve_chunks(query: str, spl_result: SPLResult, tenant: Optional[Tenant]) -> list[str]:
+    if tenant is None:
+        return [d.page_content for d in retrieve_documents(query, spl_result.embedding)]
+    query_vector = spl_result.embedding
+    if query_vector is None:
+        query_vector = tenant.spl_engine.embed_query(query)
+    return tenant.index.search(query_vector, RETRIEVAL_K)
+
+def _pack_rag_prompt(query: str, spl_result: SPLResult, max_tokens: int, tenant: Optional[Tenant] = None) -> PackedPrompt:
+    chunks = _retrieve_chunks(query, spl_result, tenant)
+    return prompt_builder.build(query, chunks, max_tokens=max_tokens)
+
+def _rag_ready(tenant: Optional[Tenant]) -> bool:
+    # Tenants carry their own index; only the default setup needs Chroma
+    return llm is not None and (tenant is not None or retriever is not None)
+
+def get_rag_response(
+    query: str,
+    spl_result: Optional[SPLResult] = None,
+    max_tokens: Optional[int] = None,
+    tenant_id: Optional[str] = None,
+    stt_issue: Optional[str] = None,
+) -> str:
     """
     Generates a response using a simple RAG flow:
     1. Retrieve relevant documents from Chroma
     2. Inject context into the prompt
     3. Ask the LLM to answer
+
+    Pass ``spl_result`` when the caller already ran ``spl_engine.decide``
+    so the decision (and its embedding) is not recomputed. ``max_tokens``
+    caps the generation length (LLM_MAX_TOKENS when omitted).
+    ``tenant_id`` answers from that tenant's knowledge base and SPL rules
+    (see app.tenants); the default restaurant otherwise.
+    ``stt_issue`` (from app.transcript_gate) makes SPL ask the caller to
+    repeat instead of answering an unreliable transcript.
     """
-    if llm is None or retriever is None:
-        return "RAG system not initialized. Cannot generate context-aware reply."
     try:
+        tenant = tenant_store.get(tenant_id) if tenant_id else None
+        if not _rag_ready(tenant):
+            return "RAG system not initialized. Cannot generate context-aware reply."
+
         # =========================
         # SPL Decision Engine (Phase 1)
         # =========================
-        spl_result = spl_engine.decide(query)
+        if spl_result is None:
+            spl_result = (tenant.spl_engine if tenant else spl_engine).decide(query, stt_issue)
         if spl_result.handled:
             print(f"[SPL] Handled at layer {spl_result.layer}: {spl_result.reason}")
             return spl_result.response
 
-        docs = retriever.invoke(query)
-
-        context = "\n\n".join([d.page_content for d in docs])
-
-        prompt = f"""
-You are a restaurant voice assistant.
-
-Answer ONLY the user's question.
-Do NOT include unrelated information.
-Be concise and specific.
-If the answer is not present, say you don't know.
-
-Context:
-{context}
+        max_tokens = max_tokens or LLM_MAX_TOKENS
+        packed = _pack_rag_prompt(query, spl_result, max_tokens, tenant)
+        transcript_gate.record_llm_call()
+        result = prompt_builder.generate(packed, max_tokens=max_tokens)
+        _print_token_usage(packed, result)
 
-User question:
-{query}
-
-Answer (1–2 sentences max):
-"""
-
-
-        result = llm.generate([prompt])
-
-        generation = result.generations[0][0]
-        text = generation.text
-        info = generation.generation_info or {}
-
-        print("\n📊 LLM TOKEN USAGE")
-        print("Prompt tokens:", info.get("prompt_tokens"))
-        print("Completion tokens:", info.get("completion_tokens"))
-        print("Total tokens:", info.get("total_tokens"))
-
-        return text
+        return result.text
     except Exception as e:
         return f"Error generating RAG response: {e}"
+
+def stream_rag_response(
+    query: str,
+    spl_result: Optional[SPLResult] = None,
+    max_tokens: Optional[int] = None,
+    tenant_id: Optional[str] = None,
+    stt_issue: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Token-by-token variant of ``get_rag_response``: yields text pieces as
+    the LLM produces them. SPL answers are yielded as a single piece.
+    Errors are raised rather than returned as text.
+    """
+    tenant = tenant_store.get(tenant_id) if tenant_id else None
+    if not _rag_ready(tenant):
+        raise RuntimeError("RAG system not initialized. Cannot generate context-aware reply.")
+
+    if spl_result is None:
+        spl_result = (tenant.spl_engine if tenant else spl_engine).decide(query, stt_issue)
+    if spl_result.handled:
+        print(f"[SPL] Handled at layer {spl_result.layer}: {spl_result.reason}")
+        yield spl_result.response
+        return
+
+    max_tokens = max_tokens or LLM_MAX_TOKENS
+    packed = _pack_rag_prompt(query, spl_result, max_tokens, tenant)
+    transcript_gate.record_llm_call()
+    result = GenerationResult(text="", prefill_tokens=packed.prefill_tokens, decode_tokens=0)
+    try:
+        yield from prompt_builder.stream(packed, max_tokens=max_tokens, stats=result)
+    finally:
+        _print_token_usage(packed, result)
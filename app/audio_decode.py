@@ -0,0 +1,214 @@
+import io
+import os
+import struct
+import numpy as np
+from typing import List, Optional
+import logging
+
+from app.audio_packetizer import StreamingResampler, ulaw_to_int16
+
+logger = logging.getLogger(__name__)
+
+WHISPER_SAMPLE_RATE = 16000
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_MULAW = 0x0007
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavStreamDecoder:
+    """
+    Incremental WAV decoder: feed raw bytes as they arrive from the network
+    and get back mono float32 audio at 16 kHz, ready for Whisper.
+
+    Supports 16-bit PCM, 32-bit float and 8-bit μ-law (Twilio's formats).
+    Samples are converted and resampled as soon as they arrive, so only
+    the decoded 16 kHz audio is kept — never the raw file.
+    """
+
+    def __init__(self, target_rate: int = WHISPER_SAMPLE_RATE):
+        self.target_rate = target_rate
+        self.sample_rate: Optional[int] = None
+        self.channels: Optional[int] = None
+        self.format_tag: Optional[int] = None
+        self.bits_per_sample: Optional[int] = None
+
+        self._buffer = bytearray()
+        self._header_done = False
+        self._in_data = False
+        self._data_remaining: Optional[int] = None
+        self._skip_remaining = 0
+        self._resampler: Optional[StreamingResampler] = None
+        self._chunks: List[np.ndarray] = []
+
+    # =========================
+    # Header parsing
+    # =========================
+
+    def _parse_header(self) -> bool:
+        """
+        Consume RIFF/fmt chunks from the buffer. Returns True once the
+        data chunk starts.
+        """
+        if not self._header_done:
+            if len(self._buffer) < 12:
+                return False
+            riff, _, wave = struct.unpack("<4sI4s", self._buffer[:12])
+            if riff != b"RIFF" or wave != b"WAVE":
+                raise ValueError("Not a RIFF/WAVE stream")
+            del self._buffer[:12]
+            self._header_done = True
+
+        while True:
+            if self._skip_remaining:
+                skipped = min(self._skip_remaining, len(self._buffer))
+                del self._buffer[:skipped]
+                self._skip_remaining -= skipped
+                if self._skip_remaining:
+                    return False
+
+            if len(self._buffer) < 8:
+                return False
+            chunk_id, chunk_size = struct.unpack("<4sI", self._buffer[:8])
+
+            if chunk_id == b"data":
+                if self.format_tag is None:
+                    raise ValueError("WAV data chunk before fmt chunk")
+                del self._buffer[:8]
+                # 0 / 0xFFFFFFFF are used by streaming writers for "unknown length"
+                self._data_remaining = None if chunk_size in (0, 0xFFFFFFFF) else chunk_size
+                self._in_data = True
+                return True
+
+            if chunk_id == b"fmt ":
+                if len(self._buffer) < 8 + chunk_size:
+                    return False
+                self._parse_fmt(bytes(self._buffer[8:8 + chunk_size]))
+                del self._buffer[:8 + chunk_size + (chunk_size & 1)]
+                continue
+
+            # LIST, fact, ... : skip (chunks are word aligned)
+            del self._buffer[:8]
+            self._skip_remaining = chunk_size + (chunk_size & 1)
+
+    def _parse_fmt(self, fmt: bytes):
+        format_tag, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+        if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            format_tag = struct.unpack("<H", fmt[24:26])[0]
+
+        supported = {
+            (WAVE_FORMAT_PCM, 16),
+            (WAVE_FORMAT_IEEE_FLOAT, 32),
+            (WAVE_FORMAT_MULAW, 8),
+        }
+        if (format_tag, bits) not in supported:
+            raise ValueError(f"Unsupported WAV encoding: format={format_tag}, bits={bits}")
+
+        self.format_tag = format_tag
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.bits_per_sample = bits
+        self._resampler = StreamingResampler(sample_rate, self.target_rate)
+
+    # =========================
+    # Sample conversion
+    # =========================
+
+    def _convert(self, raw: bytes) -> np.ndarray:
+        if self.format_tag == WAVE_FORMAT_PCM:
+            audio = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+        elif self.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+            audio = np.frombuffer(raw, dtype="<f4").astype(np.float32)
+        else:
+            audio = ulaw_to_int16(np.frombuffer(raw, dtype=np.uint8)).astype(np.float32) / 32768.0
+
+        if self.channels > 1:
+            audio = audio.reshape(-1, self.channels).mean(axis=1)
+        return audio
+
+    def feed(self, data: bytes):
+        """
+        Consume the next bytes of the WAV stream.
+        """
+        self._buffer.extend(data)
+
+        if not self._in_data and not self._parse_header():
+            return
+
+        frame_size = self.channels * self.bits_per_sample // 8
+        usable = len(self._buffer)
+        if self._data_remaining is not None:
+            usable = min(usable, self._data_remaining)
+        usable -= usable % frame_size
+        if not usable:
+            return
+
+        audio = self._convert(bytes(self._buffer[:usable]))
+        del self._buffer[:usable]
+        if self._data_remaining is not None:
+            self._data_remaining -= usable
+            if self._data_remaining == 0:
+                # Trailing chunks (LIST etc.) are irrelevant
+                self._buffer.clear()
+
+        self._chunks.append(self._resampler.process(audio))
+
+    def finish(self) -> np.ndarray:
+        """
+        Flush the resampler and return the full utterance (float32, 16 kHz).
+        """
+        if self._resampler is None:
+            raise ValueError("Incomplete WAV stream: no audio data received")
+        self._chunks.append(self._resampler.flush())
+        audio = np.concatenate(self._chunks).astype(np.float32)
+        self._chunks = []
+        return audio
+
+
+def decode_wav_bytes(data: bytes, target_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+    """
+    Decode a complete in-memory WAV file to mono float32 at ``target_rate``.
+    """
+    decoder = WavStreamDecoder(target_rate)
+    decoder.feed(data)
+    return decoder.finish()
+
+
+class CompressedStreamDecoder:
+    """
+    Decoder for compressed uploads (MP3/OGG). Compressed bytes are small,
+    so they are collected in memory and decoded with PyAV (through
+    faster-whisper) once the stream ends — still without a temp file.
+    """
+
+    def __init__(self, target_rate: int = WHISPER_SAMPLE_RATE):
+        self.target_rate = target_rate
+        self._buffer = io.BytesIO()
+
+    def feed(self, data: bytes):
+        self._buffer.write(data)
+
+    def finish(self) -> np.ndarray:
+        from faster_whisper import decode_audio
+
+        self._buffer.seek(0)
+        try:
+            return decode_audio(self._buffer, sampling_rate=self.target_rate).astype(np.float32)
+        finally:
+            self._buffer = io.BytesIO()
+
+
+SUPPORTED_UPLOAD_EXTENSIONS = (".wav", ".mp3", ".ogg")
+
+
+def decoder_for_filename(filename: str, target_rate: int = WHISPER_SAMPLE_RATE):
+    """
+    Incremental decoder (``feed`` / ``finish``) for an upload, chosen by extension.
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".wav":
+        return WavStreamDecoder(target_rate)
+    if extension in SUPPORTED_UPLOAD_EXTENSIONS:
+        return CompressedStreamDecoder(target_rate)
+    raise ValueError(f"Unsupported audio format: {filename}")
@@ -0,0 +1,209 @@
+import numpy as np
+from math import gcd
+from typing import Iterable, Iterator, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# G.711 μ-law constants
+ULAW_BIAS = 0x84
+ULAW_CLIP = 32635
+ULAW_SILENCE = 0xFF
+
+
+def _build_ulaw_encode_table() -> np.ndarray:
+    """
+    Precompute the μ-law byte for every 16-bit PCM value so encoding
+    is a single vectorized table lookup.
+    """
+    pcm = np.arange(-32768, 32768, dtype=np.int32)
+    sign = (pcm < 0).astype(np.int32)
+    magnitude = np.minimum(np.abs(pcm), ULAW_CLIP) + ULAW_BIAS
+
+    # Exponent = position of the highest set bit above bit 7
+    _, bit_length = np.frexp(magnitude.astype(np.float64))
+    exponent = np.clip(bit_length - 8, 0, 7).astype(np.int32)
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+
+    ulaw = ~((sign << 7) | (exponent << 4) | mantissa) & 0xFF
+    return ulaw.astype(np.uint8)
+
+
+def _build_ulaw_decode_table() -> np.ndarray:
+    ulaw = ~np.arange(256, dtype=np.int32) & 0xFF
+    sign = ulaw & 0x80
+    exponent = (ulaw >> 4) & 0x07
+    mantissa = ulaw & 0x0F
+    magnitude = (((mantissa << 3) + ULAW_BIAS) << exponent) - ULAW_BIAS
+    return np.where(sign != 0, -magnitude, magnitude).astype(np.int16)
+
+
+_ULAW_ENCODE_TABLE = _build_ulaw_encode_table()
+_ULAW_DECODE_TABLE = _build_ulaw_decode_table()
+
+
+def float_to_ulaw(audio: np.ndarray) -> np.ndarray:
+    """
+    Encode float32 PCM in [-1, 1] to μ-law bytes (uint8 array).
+    """
+    pcm = np.clip(np.rint(audio * 32767.0), -32768, 32767).astype(np.int32)
+    return _ULAW_ENCODE_TABLE[pcm + 32768]
+
+
+def ulaw_to_int16(ulaw: np.ndarray) -> np.ndarray:
+    """
+    Decode μ-law bytes to 16-bit linear PCM.
+    """
+    return _ULAW_DECODE_TABLE[np.asarray(ulaw, dtype=np.uint8)]
+
+
+class StreamingResampler:
+    """
+    Stateful rational resampler (polyphase FIR, windowed-sinc anti-aliasing).
+
+    Audio can be fed in arbitrary chunk sizes; filter history and output
+    phase carry over between calls, so chunk boundaries are seamless.
+    """
+
+    def __init__(
+        self,
+        in_rate: int,
+        out_rate: int,
+        taps_per_phase: int = 16,
+        block_size: int = 4096,
+    ):
+        divisor = gcd(in_rate, out_rate)
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.up = out_rate // divisor
+        self.down = in_rate // divisor
+        self.block_size = block_size
+
+        # Longer filters when decimating hard, so the stopband stays sharp
+        self.num_taps = taps_per_phase * max(1, -(-self.down // self.up))
+        self._bank = self._design_filter_bank()
+
+        self._history = np.zeros(self.num_taps - 1, dtype=np.float32)
+        self._position = (self.num_taps - 1) * self.up
+
+    def _design_filter_bank(self) -> np.ndarray:
+        """
+        Kaiser-windowed sinc low-pass at the upsampled rate, split into
+        ``up`` polyphase branches of ``num_taps`` coefficients each.
+        """
+        length = self.num_taps * self.up
+        cutoff = 0.95 / max(self.up, self.down)  # fraction of Nyquist
+        n = np.arange(length) - (length - 1) / 2.0
+        prototype = cutoff * np.sinc(cutoff * n) * np.kaiser(length, 8.0)
+        prototype *= self.up / prototype.sum()
+        # bank[p, k] = h[p + k * up]
+        return prototype.reshape(self.num_taps, self.up).T.astype(np.float32).copy()
+
+    def process(self, audio: np.ndarray) -> np.ndarray:
+        """
+        Resample one chunk. Returns every output sample the chunk completes.
+        """
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        if self.up == self.down:
+            return audio
+
+        buffer = np.concatenate((self._history, audio))
+        available = len(buffer) * self.up
+        if self._position >= available:
+            count = 0
+        else:
+            count = -(-(available - self._position) // self.down)
+
+        output = np.empty(count, dtype=np.float32)
+        taps = np.arange(self.num_taps)
+        for start in range(0, count, self.block_size):
+            stop = min(start + self.block_size, count)
+            positions = self._position + np.arange(start, stop) * self.down
+            phases = positions % self.up
+            newest = positions // self.up
+            frames = buffer[newest[:, None] - taps[None, :]]
+            output[start:stop] = np.einsum("mk,mk->m", self._bank[phases], frames)
+
+        keep = self.num_taps - 1
+        self._position += count * self.down - (len(buffer) - keep) * self.up
+        self._history = buffer[len(buffer) - keep:].copy()
+        return output
+
+    def flush(self) -> np.ndarray:
+        """
+        Drain the filter delay line with silence.
+        """
+        if self.up == self.down:
+            return np.empty(0, dtype=np.float32)
+        tail = self.process(np.zeros(self.num_taps // 2, dtype=np.float32))
+        self.reset()
+        return tail
+
+    def reset(self):
+        self._history[:] = 0.0
+        self._position = (self.num_taps - 1) * self.up
+
+
+class MulawPacketizer:
+    """
+    Outbound codec stage: TTS float32 chunks in, fixed-size 8 kHz μ-law
+    frames out (20 ms = 160 bytes by default), ready to transmit.
+
+    Only a partial frame is buffered between calls, so memory is constant
+    regardless of reply length.
+    """
+
+    def __init__(
+        self,
+        in_rate: int = 24000,
+        out_rate: int = 8000,
+        frame_ms: int = 20,
+    ):
+        self.out_rate = out_rate
+        self.frame_bytes = out_rate * frame_ms // 1000
+        self._resampler = StreamingResampler(in_rate, out_rate)
+        self._pending = np.empty(0, dtype=np.uint8)
+
+    def _frames(self, ulaw: np.ndarray) -> Iterator[bytes]:
+        buffer = np.concatenate((self._pending, ulaw)) if len(self._pending) else ulaw
+        complete = len(buffer) - len(buffer) % self.frame_bytes
+        for start in range(0, complete, self.frame_bytes):
+            yield buffer[start:start + self.frame_bytes].tobytes()
+        self._pending = buffer[complete:].copy()
+
+    def feed(self, audio: np.ndarray) -> Iterator[bytes]:
+        """
+        Consume one TTS chunk and yield every frame it completes.
+        """
+        try:
+            resampled = self._resampler.process(audio)
+        except Exception as e:
+            logger.error(f"Error resampling outbound audio: {e}")
+            raise
+        yield from self._frames(float_to_ulaw(resampled))
+
+    def flush(self) -> Iterator[bytes]:
+        """
+        Emit the remaining audio, padding the last frame with μ-law silence.
+        """
+        yield from self._frames(float_to_ulaw(self._resampler.flush()))
+        if len(self._pending):
+            padding = np.full(self.frame_bytes - len(self._pending), ULAW_SILENCE, dtype=np.uint8)
+            yield np.concatenate((self._pending, padding)).tobytes()
+        self._pending = np.empty(0, dtype=np.uint8)
+
+    def packetize(self, chunks: Iterable[np.ndarray]) -> Iterator[bytes]:
+        """
+        Convenience wrapper: frames for a whole stream of chunks,
+        e.g. ``packetizer.packetize(streaming_tts.stream(text))``.
+        """
+        for chunk in chunks:
+            yield from self.feed(chunk)
+        yield from self.flush()
+
+    def reset(self, in_rate: Optional[int] = None):
+        if in_rate is not None and in_rate != self._resampler.in_rate:
+            self._resampler = StreamingResampler(in_rate, self.out_rate)
+        else:
+            self._resampler.reset()
+        self._pending = np.empty(0, dtype=np.uint8)
@@ -0,0 +1,191 @@
+"""
+CallSid-affine front router for several voice-agent workers.
+
+Run one ``app.main`` per worker (separate ports or hosts) and put this in
+front of them as the public endpoint Twilio calls:
+
+    uvicorn app.main:app --port 8001
+    uvicorn app.main:app --port 8002
+    ROUTER_WORKERS=http://127.0.0.1:8001,http://127.0.0.1:8002 \\
+        uvicorn app.call_router:app --port 8000
+
+Every request is forwarded to a worker chosen by consistent hashing:
+
+- /twilio_voice: on the form's CallSid, so all turns of a call reach the
+  worker holding its warm state (reply cache, loaded tenant, audio files)
+- /audio/reply_<CallSid>.<ext>: on the same CallSid, the worker that
+  synthesized the file
+- anything else: on the path
+
+Adding or removing a worker moves only ~1/N of the calls. If a worker
+refuses the connection, the next one on the ring serves the request (a
+request that reached a worker is never replayed: timeouts give 504 and
+dropped connections 502); shared session
+state (app.sessions, "sqlite" or "kv" backend) keeps the call's turns
+consistent there.
+"""
+
+import bisect
+import hashlib
+import re
+from contextlib import asynccontextmanager
+from typing import Iterator, List, Optional
+from urllib.parse import parse_qs
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+from loguru import logger
+from starlette.background import BackgroundTask
+
+from app.config import ROUTER_VIRTUAL_NODES, ROUTER_WORKERS
+
+REPLY_AUDIO_PATTERN = re.compile(r"^/audio/reply_([A-Za-z0-9]+)\.")
+# Hop-by-hop headers are not forwarded. Bodies pass through unchanged in
+# both directions, so Content-Length and Content-Encoding still hold.
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "upgrade", "host"}
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ConsistentHashRing:
+    """
+    Hash ring with ``replicas`` virtual nodes per worker, so keys spread
+    evenly and a membership change only remaps the keys of that worker.
+    """
+
+    def __init__(self, nodes: List[str], replicas: int = ROUTER_VIRTUAL_NODES):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self.nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str):
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str):
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def nodes_for(self, key: str) -> Iterator[str]:
+        """
+        Distinct nodes in ring order from ``key``'s position: the owner
+        first, then the fallbacks.
+        """
+        if not self._points:
+            return
+        start = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        seen = set()
+        for offset in range(len(self._points)):
+            owner = self._owners[(start + offset) % len(self._points)]
+            if owner not in seen:
+                seen.add(owner)
+                yield owner
+                if len(seen) == len(self.nodes):
+                    return
+
+    def node_for(self, key: str) -> Optional[str]:
+        return next(self.nodes_for(key), None)
+
+
+def routing_key(path: str, body: bytes, content_type: str, query: str) -> str:
+    """
+    CallSid for call webhooks and reply audio, the path otherwise.
+    """
+    match = REPLY_AUDIO_PATTERN.match(path)
+    if match:
+        return match.group(1)
+    if path.startswith("/twilio_voice"):
+        fields = parse_qs(query)
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            fields.update(parse_qs(body.decode("utf-8", "replace")))
+        if fields.get("CallSid"):
+            return fields["CallSid"][0]
+    return path
+
+
+ring = ConsistentHashRing([w.strip().rstrip("/") for w in ROUTER_WORKERS.split(",") if w.strip()])
+client: Optional[httpx.AsyncClient] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client
+    # Replies can take as long as a full turn
+    client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=2.0))
+    logger.info(f"[ROUTER] {len(ring.nodes)} workers: {', '.join(ring.nodes)}")
+    yield
+    await client.aclose()
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+async def forward(path: str, request: Request):
+    """
+    Proxy one request, streaming bodies both ways: only /twilio_voice
+    forms are read up front (small, and needed for the CallSid), so
+    uploads and reply audio are never held whole in the router.
+    """
+    url_path = "/" + path
+    if url_path.startswith("/twilio_voice"):
+        body = await request.body()
+    elif "content-length" in request.headers or "transfer-encoding" in request.headers:
+        body = request.stream()
+    else:
+        body = None
+    key = routing_key(
+        url_path,
+        body if isinstance(body, bytes) else b"",
+        request.headers.get("content-type", ""),
+        request.url.query,
+    )
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+
+    for worker in ring.nodes_for(key):
+        upstream_request = client.build_request(
+            request.method,
+            worker + url_path,
+            params=request.query_params,
+            content=body,
+            headers=headers,
+        )
+        try:
+            upstream = await client.send(upstream_request, stream=True)
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            # Nothing was sent: safe to try the next worker
+            logger.warning(f"[ROUTER] {worker} unreachable for {key}: {e}; trying the next worker")
+            continue
+        except httpx.TimeoutException as e:
+            # The worker may still be running the turn; replaying it elsewhere
+            # would run a second STT+LLM+TTS turn past Twilio's deadline
+            logger.error(f"[ROUTER] {worker} timed out for {key}: {e!r}")
+            return Response(content="Worker timed out", status_code=504)
+        except httpx.TransportError as e:
+            logger.error(f"[ROUTER] {worker} failed mid-request for {key}: {e!r}")
+            return Response(content="Worker connection failed", status_code=502)
+        response_headers = {k: v for k, v in upstream.headers.items() if k.lower() not in HOP_HEADERS}
+        response_headers["X-Served-By"] = worker
+        return StreamingResponse(
+            upstream.aiter_raw(),
+            status_code=upstream.status_code,
+            headers=response_headers,
+            background=BackgroundTask(upstream.aclose),
+        )
+
+    return Response(content="No worker available", status_code=503)
@@ -6,6 +6,15 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 KNOWLEDGE_BASE_PATH = os.path.join(BASE_DIR, "data", "knowledge_base.md")
 CHROMA_DB_PATH = os.path.join(BASE_DIR, "embeddings", "chroma_db")
+SPL_RULES_PATH = os.getenv("SPL_RULES_PATH", os.path.join(BASE_DIR, "data", "spl_rules.json"))  # optional; built-in rules if absent
+
+# Hot reload of knowledge bases and SPL rules (see app/hot_reload.py)
+HOT_RELOAD = os.getenv("HOT_RELOAD", "1") == "1"
+HOT_RELOAD_INTERVAL = float(os.getenv("HOT_RELOAD_INTERVAL", "2.0"))  # seconds between source-file polls
+
+# Multi-tenant knowledge bases: data/tenants/<tenant_id>/ (see app/tenants.py)
+TENANTS_DIR = os.getenv("TENANTS_DIR", os.path.join(BASE_DIR, "data", "tenants"))
+TENANT_MEMORY_BUDGET_MB = float(os.getenv("TENANT_MEMORY_BUDGET_MB", "512"))  # loaded tenant indexes
 MODEL_DIR = os.path.join(BASE_DIR, "models")
 PHI2_MODEL_PATH = os.path.join(MODEL_DIR, "phi-2.Q4_K_M.gguf")
 LLAMA3B_MODEL_PATH = os.path.join(
@@ -15,13 +24,96 @@ LLAMA3B_MODEL_PATH = os.path.join(
 
 ACTIVE_MODEL_PATH = LLAMA3B_MODEL_PATH
 
+# LLM generation / prompt packing
+LLM_N_CTX = int(os.getenv("LLM_N_CTX", "2048"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "128"))  # hard cap on reply tokens
+PROMPT_PREFILL_BUDGET = int(os.getenv("PROMPT_PREFILL_BUDGET", "1024"))  # prompt tokens incl. context
+MAX_REPLY_SENTENCES = int(os.getenv("MAX_REPLY_SENTENCES", "2"))  # generation stops after this many
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))  # candidate chunks, packed by relevance
+
+# Speculative decoding (see app/speculative.py)
+LLM_SPECULATIVE = os.getenv("LLM_SPECULATIVE", "off")  # "off", "prompt-lookup" or "draft-model"
+LLM_DRAFT_MODEL_PATH = os.getenv("LLM_DRAFT_MODEL_PATH", PHI2_MODEL_PATH)  # for "draft-model"
+LLM_DRAFT_TOKENS = int(os.getenv("LLM_DRAFT_TOKENS", "10"))  # tokens proposed per step
+LLM_DRAFT_NGRAM_SIZE = int(os.getenv("LLM_DRAFT_NGRAM_SIZE", "2"))  # for "prompt-lookup"
+
+# Speech-to-text (see app/stt_engine.py for the decode profiles)
+STT_MODEL_SIZE = os.getenv("STT_MODEL_SIZE", "base")
+STT_DEVICE = os.getenv("STT_DEVICE", "cpu")
+STT_COMPUTE_TYPE = os.getenv("STT_COMPUTE_TYPE", "int8")
+STT_LANGUAGE = os.getenv("STT_LANGUAGE", "en")  # fixed: skips language detection
+STT_DEFAULT_PROFILE = os.getenv("STT_DEFAULT_PROFILE", "accurate")  # "accurate" or "phone-fast"
+
+# Transcript confidence gate (see app/transcript_gate.py)
+STT_GATE_ENABLED = os.getenv("STT_GATE_ENABLED", "1") == "1"
+STT_MIN_AVG_LOGPROB = float(os.getenv("STT_MIN_AVG_LOGPROB", "-1.0"))  # below = low confidence
+STT_NO_SPEECH_THRESHOLD = float(os.getenv("STT_NO_SPEECH_THRESHOLD", "0.6"))  # at or above, with low confidence = no speech
+STT_MAX_COMPRESSION_RATIO = float(os.getenv("STT_MAX_COMPRESSION_RATIO", "2.4"))  # above = repetitive output
+
+# Streaming XTTS voice (app/tts_streaming.py)
+TTS_XTTS_SPEAKER = os.getenv("TTS_XTTS_SPEAKER", "Ana Florence")  # built-in XTTS-v2 speaker
+TTS_XTTS_SPEAKER_WAV = os.getenv("TTS_XTTS_SPEAKER_WAV", "")  # reference clip for voice cloning (overrides speaker)
+TTS_XTTS_STREAM_CHUNK_SIZE = int(os.getenv("TTS_XTTS_STREAM_CHUNK_SIZE", "20"))  # GPT tokens per audio chunk
+
 AUDIO_UPLOAD_DIR = os.path.join(BASE_DIR, "audio_uploads")
 AUDIO_OUTPUT_DIR = os.path.join(BASE_DIR, "audio_output")
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))  # /process_audio body cap
+
+# Reply audio formats served by /audio (see app/reply_formats.py)
+REPLY_FORMAT_CACHE_DIR = os.path.join(AUDIO_OUTPUT_DIR, "formats")  # encoded copies, one subdir per format
+TWILIO_REPLY_FORMAT = os.getenv("TWILIO_REPLY_FORMAT", "ulaw-wav")  # format requested in Twilio <Play> URLs
+
+# Embedding engine (shared by retrieval, index builds and SPL Layer 2)
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "onnx-int8")  # "onnx-int8" or "torch"
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "32"))
+EMBEDDING_MAX_WAIT_MS = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5"))  # batching window
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))  # cached queries
+
+# Load-adaptive quality controller
+LOAD_MAX_QUEUE_DEPTH = int(os.getenv("LOAD_MAX_QUEUE_DEPTH", "4"))  # turns in flight
+LOAD_TURN_LATENCY_BUDGET = float(os.getenv("LOAD_TURN_LATENCY_BUDGET", "8.0"))  # seconds
+LOAD_STEP_COOLDOWN = float(os.getenv("LOAD_STEP_COOLDOWN", "10.0"))  # seconds between steps
+LOAD_LATENCY_HALF_LIFE = float(os.getenv("LOAD_LATENCY_HALF_LIFE", "30.0"))  # seconds; idle stage latencies decay
+
+# CPU partitioning across STT / LLM / TTS (see app/cpu_scheduler.py)
+CPU_PARTITIONING = os.getenv("CPU_PARTITIONING", "1") == "1"  # 0 = every stage uses all cores
+CPU_PIN_AFFINITY = os.getenv("CPU_PIN_AFFINITY", "0") == "1"  # pin stage threads to their cores
+CPU_STAGE_WEIGHTS = os.getenv("CPU_STAGE_WEIGHTS", "stt:1,llm:2,tts:1")  # share of cores per stage
+STT_NUM_WORKERS = int(os.getenv("STT_NUM_WORKERS", "1"))  # concurrent Whisper transcriptions
+
+# Deadline-aware admission control (see app/admission.py)
+ADMISSION_TURN_DEADLINE = float(os.getenv("ADMISSION_TURN_DEADLINE", "15.0"))  # Twilio webhook timeout, seconds
+ADMISSION_SAFETY_MARGIN = float(os.getenv("ADMISSION_SAFETY_MARGIN", "2.0"))  # network + TwiML headroom
+ADMISSION_SPL_SLACK = float(os.getenv("ADMISSION_SPL_SLACK", "0.08"))  # relaxed SPL similarity threshold when shedding
+ADMISSION_REPLY_CACHE_SIZE = int(os.getenv("ADMISSION_REPLY_CACHE_SIZE", "512"))  # recent replies kept
+
+# Per-call session state (see app/sessions.py) and CallSid routing (app/call_router.py)
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")  # "memory", "sqlite" or "kv"
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", os.path.join(BASE_DIR, "data", "sessions.db"))
+SESSION_KV_URL = os.getenv("SESSION_KV_URL", "redis://127.0.0.1:6379")  # Redis or `python -m app.sessions serve-kv`
+SESSION_TTL = float(os.getenv("SESSION_TTL", "3600"))  # seconds after a call's last turn
+ROUTER_WORKERS = os.getenv("ROUTER_WORKERS", "http://127.0.0.1:8001")  # comma-separated worker base URLs
+ROUTER_VIRTUAL_NODES = int(os.getenv("ROUTER_VIRTUAL_NODES", "100"))  # ring points per worker
+
+# On-demand sampling profiler at /debug/profile (see app/profiler.py)
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+PROFILER_TOKEN = os.getenv("PROFILER_TOKEN", "")  # required as ?token=; the endpoint is off without one
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+
+# Public base URL Twilio fetches reply audio from
+PUBLIC_BASE_URL = os.getenv("PUBLIC_BASE_URL", "https://preexistent-multiaxial-kelsie.ngrok-free.dev")
 
 # Twilio Credentials
 TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
 TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
 
+# Twilio recording downloads (shared keep-alive client)
+TWILIO_FETCH_MAX_CONNECTIONS = int(os.getenv("TWILIO_FETCH_MAX_CONNECTIONS", "20"))
+TWILIO_FETCH_TIMEOUT = float(os.getenv("TWILIO_FETCH_TIMEOUT", "10.0"))  # seconds
+TWILIO_RECORDING_RETRIES = int(os.getenv("TWILIO_RECORDING_RETRIES", "2"))  # on 404 right after recording
+
 # Ensure directories exist
 for d in [AUDIO_UPLOAD_DIR, AUDIO_OUTPUT_DIR]:
     os.makedirs(d, exist_ok=True)
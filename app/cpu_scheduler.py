@@ -0,0 +1,209 @@
+"""
+CPU core partitioning for the STT, LLM and TTS stages.
+
+faster-whisper/CTranslate2, llama.cpp and PyTorch each size their thread
+pools to every core by default; with concurrent calls they oversubscribe
+the CPU and all slow down. The scheduler splits the available cores into
+disjoint sets by stage weight and:
+
+- gives each library a matching thread count (Whisper ``cpu_threads``,
+  LlamaCpp ``n_threads``/``n_threads_batch``, torch intra-op threads)
+- runs each stage's blocking calls on a dedicated executor whose worker
+  threads are optionally pinned to the stage's cores. Threads the
+  libraries spawn inherit that affinity, so models should also be loaded
+  through ``run``.
+
+With partitioning disabled, every stage gets all cores and library
+defaults; the executors then only move blocking work off the event loop.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+from app.config import CPU_PARTITIONING, CPU_PIN_AFFINITY, CPU_STAGE_WEIGHTS, STT_NUM_WORKERS
+
+STAGES = ("stt", "llm", "tts")
+
+
+@dataclass(frozen=True)
+class StagePlan:
+    stage: str
+    cores: List[int]
+    threads: int
+    workers: int
+
+
+def available_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """
+    "stt:1,llm:2,tts:1" -> {"stt": 1.0, "llm": 2.0, "tts": 1.0}
+    Stages left out get weight 1; unknown stages or bad weights raise
+    ValueError naming the offending entry.
+    """
+    weights = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        stage, _, weight = item.partition(":")
+        stage = stage.strip()
+        if stage not in STAGES:
+            raise ValueError(f"CPU_STAGE_WEIGHTS: unknown stage {stage!r} (stages: {', '.join(STAGES)})")
+        try:
+            weights[stage] = float(weight or 1)
+        except ValueError:
+            raise ValueError(f"CPU_STAGE_WEIGHTS: bad weight {weight!r} for stage {stage!r}")
+        if weights[stage] <= 0:
+            raise ValueError(f"CPU_STAGE_WEIGHTS: weight for stage {stage!r} must be positive")
+    for stage in STAGES:
+        if stage not in weights:
+            logger.warning(f"[CPU] CPU_STAGE_WEIGHTS has no weight for {stage}; using 1")
+            weights[stage] = 1.0
+    return weights
+
+
+def partition_cores(cores: List[int], weights: Dict[str, float]) -> Dict[str, List[int]]:
+    """
+    Split ``cores`` into contiguous, disjoint sets proportional to
+    ``weights`` (at least one core each). With fewer cores than stages,
+    stages share cores round-robin.
+    """
+    stages = [s for s in STAGES if s in weights]
+    if len(cores) < len(stages):
+        return {stage: [cores[i % len(cores)]] for i, stage in enumerate(stages)}
+
+    total = sum(weights[s] for s in stages)
+    counts = {s: max(1, int(len(cores) * weights[s] / total)) for s in stages}
+    # Hand out cores lost to rounding to the heaviest stages first
+    spare = len(cores) - sum(counts.values())
+    for stage in sorted(stages, key=lambda s: -weights[s]):
+        if spare <= 0:
+            break
+        counts[stage] += 1
+        spare -= 1
+    while sum(counts.values()) > len(cores):
+        largest = max(stages, key=lambda s: counts[s])
+        counts[largest] -= 1
+
+    plan, start = {}, 0
+    for stage in stages:
+        plan[stage] = cores[start:start + counts[stage]]
+        start += counts[stage]
+    return plan
+
+
+class CPUScheduler:
+    def __init__(
+        self,
+        enabled: bool = CPU_PARTITIONING,
+        pin_affinity: bool = CPU_PIN_AFFINITY,
+        weights: Optional[Dict[str, float]] = None,
+        cores: Optional[List[int]] = None,
+        stt_workers: int = STT_NUM_WORKERS,
+    ):
+        self.enabled = enabled
+        self.pin_affinity = pin_affinity and enabled and hasattr(os, "sched_setaffinity")
+        cores = cores or available_cores()
+        workers = {"stt": stt_workers, "llm": 1, "tts": 1}
+
+        if enabled:
+            core_sets = partition_cores(cores, weights or parse_weights(CPU_STAGE_WEIGHTS))
+        else:
+            core_sets = {stage: cores for stage in STAGES}
+
+        self.plan: Dict[str, StagePlan] = {
+            stage: StagePlan(
+                stage=stage,
+                cores=core_sets[stage],
+                # Whisper splits its threads across concurrent workers
+                threads=max(1, len(core_sets[stage]) // (workers[stage] if stage == "stt" else 1)),
+                workers=workers[stage],
+            )
+            for stage in STAGES
+        }
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+        self._torch_configured = False
+
+        for plan in self.plan.values():
+            logger.info(
+                f"[CPU] {plan.stage}: cores={plan.cores if enabled else 'all'} threads={plan.threads} "
+                f"workers={plan.workers} pinned={self.pin_affinity}"
+            )
+
+    # -------------------------
+    # Library settings
+    # -------------------------
+
+    def whisper_kwargs(self) -> dict:
+        plan = self.plan["stt"]
+        if not self.enabled:
+            return {"num_workers": plan.workers}
+        return {"cpu_threads": plan.threads, "num_workers": plan.workers}
+
+    def llama_kwargs(self) -> dict:
+        if not self.enabled:
+            return {}
+        threads = self.plan["llm"].threads
+        return {"n_threads": threads, "model_kwargs": {"n_threads_batch": threads}}
+
+    def configure_torch(self):
+        """
+        Size torch's intra-op pool for TTS. Process-wide; applied once.
+        """
+        if not self.enabled or self._torch_configured:
+            return
+        self._torch_configured = True
+        try:
+            import torch
+
+            torch.set_num_threads(self.plan["tts"].threads)
+            torch.set_num_interop_threads(1)
+        except Exception as e:
+            logger.warning(f"[CPU] Could not set torch threads: {e}")
+
+    # -------------------------
+    # Stage executors
+    # -------------------------
+
+    def _pin(self, stage: str):
+        if self.pin_affinity:
+            # pid 0 = the calling thread on Linux
+            os.sched_setaffinity(0, self.plan[stage].cores)
+
+    def executor(self, stage: str) -> ThreadPoolExecutor:
+        with self._lock:
+            if stage not in self._executors:
+                self._executors[stage] = ThreadPoolExecutor(
+                    max_workers=self.plan[stage].workers,
+                    thread_name_prefix=f"cpu-{stage}",
+                    initializer=self._pin,
+                    initargs=(stage,),
+                )
+            return self._executors[stage]
+
+    def run(self, stage: str, fn: Callable, *args, **kwargs):
+        """
+        Run ``fn`` on the stage's executor and wait for it (sync callers).
+        """
+        return self.executor(stage).submit(fn, *args, **kwargs).result()
+
+    async def arun(self, stage: str, fn: Callable, *args, **kwargs):
+        """
+        Await ``fn`` on the stage's executor without blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor(stage), lambda: fn(*args, **kwargs))
+
+
+cpu_scheduler = CPUScheduler()
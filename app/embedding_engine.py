@@ -0,0 +1,244 @@
+"""
+Shared sentence-embedding engine.
+
+One instance serves the retriever, the vector index builder and SPL
+Layer 2. It provides:
+- an int8-quantized ONNX Runtime backend on CPU (falls back to
+  sentence-transformers/PyTorch if ONNX Runtime is unavailable)
+- dynamic batching: concurrent embed_query calls are coalesced into one
+  forward pass
+- an LRU cache of query embeddings keyed on normalized text
+
+It implements LangChain's Embeddings interface, so it plugs straight into
+Chroma.
+"""
+
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+from app.config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_MAX_BATCH_SIZE,
+    EMBEDDING_MAX_WAIT_MS,
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_ONNX_FILE,
+)
+
+
+def normalize_query(text: str) -> str:
+    """
+    Cache key for a query. The model is uncased, so lower-casing and
+    collapsing whitespace does not change the embedding.
+    """
+    return " ".join(text.lower().split())
+
+
+# =========================
+# Backends
+# =========================
+
+class OnnxInt8Backend:
+    """
+    Quantized ONNX export of the sentence-transformers model, run with
+    ONNX Runtime, followed by mean pooling and L2 normalization.
+    """
+
+    name = "onnx-int8"
+
+    def __init__(self, model_name: str, onnx_file: str, max_length: int = 256):
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        model_path = hf_hub_download(model_name, onnx_file)
+        tokenizer_path = hf_hub_download(model_name, "tokenizer.json")
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_padding()
+        self.tokenizer.enable_truncation(max_length=max_length)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+
+class TorchBackend:
+    """
+    Full-precision sentence-transformers model (what HuggingFaceEmbeddings
+    runs), used when ONNX Runtime is not installed.
+    """
+
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts, normalize_embeddings=True, convert_to_numpy=True
+        ).astype(np.float32)
+
+
+def load_backend(backend: str, model_name: str, onnx_file: str):
+    if backend == "onnx-int8":
+        try:
+            return OnnxInt8Backend(model_name, onnx_file)
+        except Exception as e:
+            logger.warning(f"ONNX int8 embeddings unavailable ({e}); falling back to PyTorch")
+    return TorchBackend(model_name)
+
+
+# =========================
+# Engine
+# =========================
+
+class EmbeddingEngine(Embeddings):
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL_NAME,
+        backend: str = EMBEDDING_BACKEND,
+        onnx_file: str = EMBEDDING_ONNX_FILE,
+        max_batch_size: int = EMBEDDING_MAX_BATCH_SIZE,
+        max_wait_ms: float = EMBEDDING_MAX_WAIT_MS,
+        cache_size: int = EMBEDDING_CACHE_SIZE,
+    ):
+        self.backend = load_backend(backend, model_name, onnx_file)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache_size = cache_size
+
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        self._requests: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        self._worker = threading.Thread(
+            target=self._batch_loop, name="embedding-batcher", daemon=True
+        )
+        self._worker.start()
+        logger.info(f"Embedding engine ready: {model_name} ({self.backend.name})")
+
+    # -------------------------
+    # Dynamic batching
+    # -------------------------
+
+    def _batch_loop(self):
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.backend.encode(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+    def _submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._requests.put((text, future))
+        return future
+
+    # -------------------------
+    # Query cache
+    # -------------------------
+
+    def _cache_get(self, key: str) -> Optional[np.ndarray]:
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+            return vector
+
+    def _cache_put(self, key: str, vector: np.ndarray):
+        with self._cache_lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # -------------------------
+    # Public API
+    # -------------------------
+
+    def embed_query_vector(self, text: str) -> np.ndarray:
+        """
+        Embed one query as a normalized float32 vector (cached, batched).
+        """
+        key = normalize_query(text)
+        vector = self._cache_get(key)
+        if vector is None:
+            vector = self._submit(key).result()
+            self._cache_put(key, vector)
+        return vector
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_query_vector(text).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Documents are encoded in direct batches (index builds), bypassing
+        the query cache.
+        """
+        vectors = []
+        for start in range(0, len(texts), self.max_batch_size):
+            vectors.extend(self.backend.encode(texts[start:start + self.max_batch_size]).tolist())
+        return vectors
+
+
+_engine: Optional[EmbeddingEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_embedding_engine() -> EmbeddingEngine:
+    """
+    Process-wide engine, created on first use.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = EmbeddingEngine()
+        return _engine
@@ -0,0 +1,237 @@
+"""
+Hot reload of knowledge bases and SPL rule packs.
+
+A background thread polls the modification times of the source files:
+
+- data/knowledge_base.md      -> default retrieval index
+- SPL_RULES_PATH               -> default SPL rule pack
+- data/tenants/<id>/knowledge_base.md, spl_rules.json -> tenant index + rules
+- data/tenants/*/tenant.json   -> tenant list and phone number routes
+
+A change is acted on once the files have stopped changing for one poll
+interval (editors save in several writes). The new index or rule tables
+are built on the watcher thread while calls keep using the current ones,
+then swapped in with a single assignment: turns in flight finish on the
+version they started with, and no model (Whisper, LLM, TTS, embeddings)
+is reloaded. A failed rebuild (e.g. a bad regex) keeps the previous version.
+
+Reload durations are logged and exported at /metrics.
+"""
+
+import os
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from app.config import CHROMA_DB_PATH, HOT_RELOAD_INTERVAL, KNOWLEDGE_BASE_PATH, SPL_RULES_PATH
+from app.tenants import SOURCE_FILES, TenantStore, tenant_store
+
+DEFAULT_KNOWLEDGE_BASE = "default:knowledge_base"
+DEFAULT_RULES = "default:spl_rules"
+TENANT_ROUTES = "tenants:routes"
+TENANT_PREFIX = "tenant:"
+
+# Replaced in-memory collections are dropped once no turn can still be using them
+RETIRE_AFTER = 60.0  # seconds
+
+Signature = Tuple[Tuple[str, Optional[int], Optional[int]], ...]
+
+
+def file_signature(paths: List[str]) -> Signature:
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+
+def _latest_mtime_ns(directory: str) -> int:
+    latest = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            latest = max(latest, os.stat(os.path.join(root, name)).st_mtime_ns)
+    return latest
+
+
+@dataclass
+class ReloadEvent:
+    target: str
+    seconds: float
+    ok: bool
+    at: float
+
+
+class KnowledgeWatcher:
+    def __init__(self, interval: float = HOT_RELOAD_INTERVAL, store: TenantStore = tenant_store):
+        self.interval = interval
+        self.store = store
+
+        self._signatures: Dict[str, Signature] = {}
+        self._pending: Dict[str, Signature] = {}
+        self._retired: List[Tuple[float, object]] = []
+        self._reloaded_store = None
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.history: Deque[ReloadEvent] = deque(maxlen=50)
+        self.totals: Counter = Counter()
+
+    # =========================
+    # Sources
+    # =========================
+
+    def _scan(self) -> Dict[str, Signature]:
+        """
+        Current signature of every reload target's source files.
+        """
+        targets = {
+            DEFAULT_KNOWLEDGE_BASE: file_signature([KNOWLEDGE_BASE_PATH]),
+            DEFAULT_RULES: file_signature([SPL_RULES_PATH]),
+        }
+        manifests = []
+        if os.path.isdir(self.store.root):
+            for tenant_id in sorted(os.listdir(self.store.root)):
+                tenant_dir = os.path.join(self.store.root, tenant_id)
+                if not os.path.isdir(tenant_dir):
+                    continue
+                manifests.append(os.path.join(tenant_dir, "tenant.json"))
+                targets[TENANT_PREFIX + tenant_id] = file_signature(
+                    [os.path.join(tenant_dir, name) for name in SOURCE_FILES]
+                )
+        targets[TENANT_ROUTES] = file_signature(manifests)
+        return targets
+
+    # =========================
+    # Polling
+    # =========================
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._signatures = self._scan()
+        # Knowledge base edited while the server was down: the persisted index is stale
+        if os.path.isdir(CHROMA_DB_PATH):
+            kb_mtime = self._signatures[DEFAULT_KNOWLEDGE_BASE][0][1] or 0
+            if kb_mtime > _latest_mtime_ns(CHROMA_DB_PATH):
+                logger.info("[RELOAD] knowledge_base.md is newer than the Chroma index, rebuilding")
+                self._signatures.pop(DEFAULT_KNOWLEDGE_BASE)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="knowledge-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"[RELOAD] Watching {len(self._signatures)} sources every {self.interval:.1f}s")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"[RELOAD] Poll failed: {e}")
+
+    def poll(self):
+        """
+        One pass: reload every target whose sources changed and have been
+        stable since the previous pass.
+        """
+        for target, signature in self._scan().items():
+            if signature == self._signatures.get(target):
+                self._pending.pop(target, None)
+                continue
+            if self._pending.get(target) != signature:
+                self._pending[target] = signature  # still being written, perhaps
+                continue
+            del self._pending[target]
+            # Recorded even on failure: the next edit triggers a new attempt
+            self._signatures[target] = signature
+            self.reload(target)
+        self._drop_retired()
+
+    # =========================
+    # Reloads
+    # =========================
+
+    def reload(self, target: str) -> bool:
+        start = time.perf_counter()
+        try:
+            if target == DEFAULT_KNOWLEDGE_BASE:
+                self._reload_default_knowledge_base()
+            elif target == DEFAULT_RULES:
+                from app.agent import reload_default_rules
+
+                reload_default_rules()
+            elif target == TENANT_ROUTES:
+                self.store.refresh_routes()
+            elif target.startswith(TENANT_PREFIX):
+                tenant_id = target[len(TENANT_PREFIX):]
+                if tenant_id not in self.store.tenant_ids():
+                    return True  # not a tenant (yet): picked up with its tenant.json
+                self.store.reload(tenant_id)
+            else:
+                raise ValueError(f"Unknown reload target: {target}")
+            ok = True
+        except Exception as e:
+            logger.error(f"[RELOAD] {target} failed, keeping the previous version: {e}")
+            ok = False
+
+        seconds = time.perf_counter() - start
+        with self._lock:
+            self.history.append(ReloadEvent(target=target, seconds=seconds, ok=ok, at=time.time()))
+            self.totals[(target, "ok" if ok else "error")] += 1
+        if ok:
+            logger.info(f"[RELOAD] {target} rebuilt and swapped in {seconds * 1000:.0f} ms")
+        return ok
+
+    def _reload_default_knowledge_base(self):
+        from app.agent import reload_default_knowledge_base
+
+        previous = self._reloaded_store
+        self._reloaded_store = reload_default_knowledge_base()
+        # Only collections built here are dropped; the persisted index stays on disk
+        if previous is not None:
+            self._retired.append((time.monotonic(), previous))
+
+    def _drop_retired(self):
+        now = time.monotonic()
+        while self._retired and now - self._retired[0][0] > RETIRE_AFTER:
+            _, store = self._retired.pop(0)
+            try:
+                store.delete_collection()
+            except Exception as e:
+                logger.warning(f"[RELOAD] Could not drop a replaced collection: {e}")
+
+    # =========================
+    # Export
+    # =========================
+
+    def metrics_text(self) -> str:
+        with self._lock:
+            history = list(self.history)
+            totals = dict(self.totals)
+        last = {event.target: event.seconds for event in history if event.ok}
+        lines = [
+            "# HELP voice_reloads_total Knowledge base / rule reloads by target and result.",
+            "# TYPE voice_reloads_total counter",
+        ]
+        lines += [f'voice_reloads_total{{target="{t}",result="{r}"}} {n}' for (t, r), n in sorted(totals.items())]
+        lines += [
+            "# HELP voice_reload_duration_seconds Duration of the last successful rebuild and swap.",
+            "# TYPE voice_reload_duration_seconds gauge",
+        ]
+        lines += [f'voice_reload_duration_seconds{{target="{t}"}} {s:.3f}' for t, s in sorted(last.items())]
+        return "\n".join(lines) + "\n"
+
+
+knowledge_watcher = KnowledgeWatcher()
@@ -0,0 +1,193 @@
+"""
+Load-adaptive quality/latency controller.
+
+Watches how many turns are in flight and the recent latency of each
+pipeline stage, and steps the whole pipeline down to cheaper settings
+under pressure (greedy STT, shorter generations, lighter TTS voice).
+It steps back up once load eases, also when traffic stops: smoothed
+latencies decay with wall-clock time since their last sample. Every step
+is logged with the numbers that triggered it.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from app.config import (
+    LLM_MAX_TOKENS,
+    LOAD_LATENCY_HALF_LIFE,
+    LOAD_MAX_QUEUE_DEPTH,
+    LOAD_TURN_LATENCY_BUDGET,
+    LOAD_STEP_COOLDOWN,
+)
+
+
+@dataclass(frozen=True)
+class QualityLevel:
+    name: str
+    stt_profile: str  # app.stt_engine decode profile
+    max_tokens: int
+    tts_model: str
+
+
+# Ordered from best quality to cheapest
+QUALITY_LEVELS: List[QualityLevel] = [
+    QualityLevel("full", stt_profile="accurate", max_tokens=LLM_MAX_TOKENS, tts_model="tts_models/en/ljspeech/tacotron2-DDC"),
+    QualityLevel("greedy", stt_profile="phone-fast", max_tokens=LLM_MAX_TOKENS, tts_model="tts_models/en/ljspeech/tacotron2-DDC"),
+    QualityLevel("short", stt_profile="phone-fast", max_tokens=64, tts_model="tts_models/en/ljspeech/tacotron2-DDC"),
+    QualityLevel("light", stt_profile="phone-fast", max_tokens=48, tts_model="tts_models/en/ljspeech/glow-tts"),
+]
+
+
+class LoadController:
+    """
+    Picks a QualityLevel from queue depth and stage latencies.
+
+    Pressure is the larger of queue depth relative to ``max_queue_depth``
+    and the smoothed end-to-end turn latency relative to
+    ``latency_budget``. Above ``high_water`` the controller steps one level
+    down; below ``low_water`` it steps one level up per ``cooldown``
+    elapsed since the last step. Steps are at least ``cooldown`` seconds
+    apart so the smoothed latencies can react.
+
+    A stage's smoothed latency halves every ``half_life`` seconds without
+    a new sample, so a spike followed by silence does not keep the
+    pipeline degraded until new traffic arrives.
+    """
+
+    def __init__(
+        self,
+        levels: Optional[List[QualityLevel]] = None,
+        max_queue_depth: int = LOAD_MAX_QUEUE_DEPTH,
+        latency_budget: float = LOAD_TURN_LATENCY_BUDGET,
+        cooldown: float = LOAD_STEP_COOLDOWN,
+        high_water: float = 1.0,
+        low_water: float = 0.5,
+        smoothing: float = 0.3,
+        half_life: float = LOAD_LATENCY_HALF_LIFE,
+    ):
+        self.levels = levels or QUALITY_LEVELS
+        self.max_queue_depth = max_queue_depth
+        self.latency_budget = latency_budget
+        self.cooldown = cooldown
+        self.high_water = high_water
+        self.low_water = low_water
+        self.smoothing = smoothing
+        self.half_life = half_life
+
+        self._lock = threading.Lock()
+        self._level_index = 0
+        self._in_flight = 0
+        self._stage_latency: Dict[str, float] = {}
+        self._sampled_at: Dict[str, float] = {}  # stage -> monotonic time of the last sample
+        self._last_step = 0.0
+
+    # =========================
+    # Observations
+    # =========================
+
+    @property
+    def queue_depth(self) -> int:
+        return self._in_flight
+
+    @contextmanager
+    def track_turn(self):
+        """
+        Wrap one caller turn; counts toward queue depth while active.
+        """
+        with self._lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def record_latency(self, stage: str, seconds: float):
+        """
+        Fold one stage latency into its exponentially weighted average.
+        """
+        with self._lock:
+            now = time.monotonic()
+            previous = self._decayed(stage, now)
+            if previous is None:
+                self._stage_latency[stage] = seconds
+            else:
+                self._stage_latency[stage] = (
+                    self.smoothing * seconds + (1 - self.smoothing) * previous
+                )
+            self._sampled_at[stage] = now
+
+    @contextmanager
+    def timed(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_latency(stage, time.perf_counter() - start)
+
+    def _decayed(self, stage: str, now: float) -> Optional[float]:
+        latency = self._stage_latency.get(stage)
+        if latency is None or not self.half_life:
+            return latency
+        idle = max(0.0, now - self._sampled_at[stage])
+        return latency * 0.5 ** (idle / self.half_life)
+
+    def _decayed_latencies(self, now: float) -> Dict[str, float]:
+        return {stage: self._decayed(stage, now) for stage in self._stage_latency}
+
+    def stage_latencies(self) -> Dict[str, float]:
+        with self._lock:
+            return self._decayed_latencies(time.monotonic())
+
+    # =========================
+    # Decisions
+    # =========================
+
+    def _pressure(self, latencies: Dict[str, float]) -> float:
+        queue_pressure = self._in_flight / max(self.max_queue_depth, 1)
+        turn_latency = sum(latencies.values())
+        latency_pressure = turn_latency / self.latency_budget if self.latency_budget else 0.0
+        return max(queue_pressure, latency_pressure)
+
+    def current(self) -> QualityLevel:
+        """
+        Re-evaluate pressure and return the level to use for this turn.
+        """
+        with self._lock:
+            now = time.monotonic()
+            stage_latency = self._decayed_latencies(now)
+            pressure = self._pressure(stage_latency)
+            index = self._level_index
+
+            since_step = now - self._last_step
+            if since_step >= self.cooldown:
+                if pressure > self.high_water and index < len(self.levels) - 1:
+                    index += 1
+                elif pressure < self.low_water and index > 0:
+                    # After a quiet spell, recover the levels it would have stepped up
+                    steps = int(since_step // self.cooldown) if self.cooldown else 1
+                    index -= min(index, steps)
+
+            if index != self._level_index:
+                previous = self.levels[self._level_index]
+                self._level_index = index
+                self._last_step = now
+                level = self.levels[index]
+                latencies = ", ".join(
+                    f"{stage}={seconds:.2f}s" for stage, seconds in sorted(stage_latency.items())
+                )
+                logger.info(
+                    f"[LOAD] {previous.name} -> {level.name} "
+                    f"(pressure={pressure:.2f}, queue={self._in_flight}, {latencies or 'no latencies yet'}) "
+                    f"stt_profile={level.stt_profile} max_tokens={level.max_tokens} tts_model={level.tts_model}"
+                )
+
+            return self.levels[self._level_index]
+
+
+load_controller = LoadController()
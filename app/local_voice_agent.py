@@ -8,8 +8,9 @@ import re
 import time
 from app.stt_streaming import StreamingSTT
 from app.stt import transcribe_audio
-from app.agent import get_rag_response, spl_engine
-from app.tts import synthesize_speech
+from app.agent import get_rag_response, get_spl_engine
+from app.transcript_gate import transcript_gate
+from app.tts_streaming import StreamingTTS
 
 # =========================
 # Audio configuration
@@ -19,6 +20,8 @@ CHANNELS = 1              # mono
 DTYPE = "float32"         # IMPORTANT: float32 for macOS
 BLOCKSIZE = 1024
 MIN_SECONDS = 1.0         # prevent Whisper guessing
+TTS_SAMPLE_RATE = 24000   # XTTS output rate
+TTS_LOOKAHEAD = 1         # sentences rendered ahead of playback
 
 
 def clean_for_tts(text: str) -> str:
@@ -44,11 +47,16 @@ def clean_for_voice(text: str) -> str:
 # Streaming STT (initialized once)
 # =========================
 streaming_stt = StreamingSTT(
-    model_size="base",
-    device="cpu",        # change later if GPU available
-    compute_type="int8",
+    profile="phone-fast",  # short mic turns: greedy, no timestamps
+)
+
+# =========================
+# Streaming TTS (initialized once)
+# =========================
+streaming_tts = StreamingTTS(
     language="en",
-)    
+    device="cpu",
+)
 
 
 def record_push_to_talk():
@@ -87,8 +95,12 @@ def record_push_to_talk():
     print(f"🔈 Audio RMS: {rms:.2f}")
 
 
-def play_audio_macos(path: str):
-    os.system(f"afplay '{path}'")
+def play_audio_chunk(output: sd.OutputStream, audio: np.ndarray):
+    """
+    Blocking write of one chunk to a continuous output stream (no gaps
+    between chunks); synthesis keeps running on the TTS worker meanwhile.
+    """
+    output.write(audio.reshape(-1, 1))
 
 
 def run_agent_loop():
@@ -110,10 +122,11 @@ def run_agent_loop():
             # 2. STT
             # =========================
             stt_start = time.perf_counter()
-            text = streaming_stt.finalize()
+            transcription = streaming_stt.finalize()
+            text = transcription.text
             stt_time = time.perf_counter() - stt_start
 
-            print("\n📝 STT OUTPUT repr():", repr(text))
+            print("\n📝 STT OUTPUT repr():", repr(text), transcription.confidence())
             print(f"📝 You said: {text}")
 
             if not text.strip():
@@ -126,14 +139,15 @@ def run_agent_loop():
             # =========================
             llm_start = time.perf_counter()
             
-            # First check with SPL engine
-            spl_result = spl_engine.decide(text)
+            # First check with SPL engine (unreliable transcripts stop there)
+            stt_issue = transcript_gate.check(transcription)
+            spl_result = get_spl_engine().decide(text, stt_issue=stt_issue)
             if spl_result.handled:
                 print(f"[SPL] Handled at layer {spl_result.layer}: {spl_result.reason}")
                 reply = spl_result.response
             else:
                 # Only call RAG if SPL doesn't handle it
-                reply = get_rag_response(text)
+                reply = get_rag_response(text, spl_result=spl_result)
                 
             llm_time = time.perf_counter() - llm_start
 
@@ -151,21 +165,26 @@ def run_agent_loop():
                 continue
 
             # =========================
-            # 5. TTS
+            # 5. TTS + 6. Playback (pipelined)
             # =========================
             tts_start = time.perf_counter()
-            output_audio = synthesize_speech(clean_reply, "local_reply.wav")
-            tts_time = time.perf_counter() - tts_start
-
-            # =========================
-            # END COMPUTE TIMING
-            # =========================
+            tts_time = 0.0
             compute_time = time.perf_counter() - compute_start
 
-            # =========================
-            # 6. Playback (NOT timed)
-            # =========================
-            play_audio_macos(output_audio)
+            with sd.OutputStream(samplerate=TTS_SAMPLE_RATE, channels=1, dtype="float32") as output:
+                for audio in streaming_tts.stream(
+                    clean_reply,
+                    sample_rate=TTS_SAMPLE_RATE,
+                    lookahead=TTS_LOOKAHEAD,
+                ):
+                    if not tts_time:
+                        # =========================
+                        # END COMPUTE TIMING (first audio ready)
+                        # =========================
+                        tts_time = time.perf_counter() - tts_start
+                        compute_time = time.perf_counter() - compute_start
+
+                    play_audio_chunk(output, audio)
 
             # =========================
             # Timing report
@@ -173,8 +192,11 @@ def run_agent_loop():
             print("\n⏱ COMPUTE TIMING BREAKDOWN")
             print(f"⏱ STT time:   {stt_time:.2f}s")
             print(f"⏱ LLM time:   {llm_time:.2f}s")
-            print(f"⏱ TTS time:   {tts_time:.2f}s")
-            print(f"⏱ TOTAL (compute only): {compute_time:.2f}s\n")
+            print(f"⏱ TTS time (first audio): {tts_time:.2f}s")
+            tts_stats = streaming_tts.stats_summary()
+            if tts_stats:
+                print(f"⏱ TTS per sentence: first chunk {tts_stats['ttfc_s']:.2f}s, RTF {tts_stats['rtf']:.2f}")
+            print(f"⏱ TOTAL (compute to first audio): {compute_time:.2f}s\n")
 
 
 
@@ -1,49 +1,132 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request
-from fastapi.responses import FileResponse, Response
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from contextlib import asynccontextmanager
+import asyncio
+import hmac
 import os
-import shutil
+import threading
+import time
 import uuid
 import httpx
 from twilio.twiml.voice_response import VoiceResponse, Play
 from loguru import logger
 
-from app.stt import transcribe_audio
-from app.agent import get_rag_response # Changed from app.llm import generate_reply
+from app.stt import transcribe_audio_result
+from app.agent import decide_for_tenant, get_rag_response # Changed from app.llm import generate_reply
 from app.tts import synthesize_speech
-from app.config import AUDIO_UPLOAD_DIR, AUDIO_OUTPUT_DIR, BASE_DIR, TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN
+from app.config import (
+    ADMISSION_SPL_SLACK,
+    AUDIO_OUTPUT_DIR,
+    BASE_DIR,
+    HOT_RELOAD,
+    MAX_UPLOAD_BYTES,
+    PROFILER_ENABLED,
+    PROFILER_MAX_SECONDS,
+    PROFILER_TOKEN,
+    PUBLIC_BASE_URL,
+    TWILIO_ACCOUNT_SID,
+    TWILIO_AUTH_TOKEN,
+    TWILIO_REPLY_FORMAT,
+)
+from app.admission import admission_controller
+from app.hot_reload import knowledge_watcher
+from app.profiler import ProfilerBusy, current_call_sid, sampling_profiler
+from app.reply_formats import UnknownFormat, negotiate, reply_audio_cache
+from app.sessions import session_store
+from app.transcript_gate import transcript_gate
+from app.load_controller import load_controller
+from app.tenants import TenantNotFound, tenant_store
+from app.twilio_fetch import RecordingFetcher
+from app.upload_reader import UploadError, read_audio_upload
+from app.turn_stream import stream_turn
 
 # Configure Loguru logger
 LOG_FILE_PATH = os.path.join(BASE_DIR, "logs", "agent.log")
 logger.add(LOG_FILE_PATH, rotation="500 MB", compression="zip", level="INFO")
 
-app = FastAPI()
+# One keep-alive client for all recording downloads
+recording_fetcher = RecordingFetcher(auth=(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN))
 
-# Global dict to track if first reply was given for each call
-first_reply_given = {}
+# Pre-rendered clip for turns shed under overload
+HOLD_MESSAGE = "Sorry, we're very busy right now. Please hold on and ask your question again after the tone."
+HOLD_CLIP_FILENAME = "hold.wav"
+hold_clip_ready = False
+
+async def prerender_hold_clip():
+    global hold_clip_ready
+    if not os.path.exists(os.path.join(AUDIO_OUTPUT_DIR, HOLD_CLIP_FILENAME)):
+        result = await admission_controller.run("tts", synthesize_speech, HOLD_MESSAGE, HOLD_CLIP_FILENAME)
+        if "Error" in result or "not loaded" in result:
+            logger.error(f"Could not pre-render hold clip: {result}")
+            return
+    hold_clip_ready = True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await recording_fetcher.start()
+    await prerender_hold_clip()
+    if HOT_RELOAD:
+        knowledge_watcher.start()
+    yield
+    knowledge_watcher.stop()
+    await recording_fetcher.close()
+
+app = FastAPI(lifespan=lifespan)
 
 @app.post("/process_audio/")
-async def process_audio(audio_file: UploadFile = File(...)):
-    logger.info(f"Received audio processing request for file: {audio_file.filename}")
-    if not audio_file.filename.endswith(('.wav', '.mp3', '.ogg')):
-        logger.error(f"Invalid file format received: {audio_file.filename}")
-        raise HTTPException(status_code=400, detail="Invalid file format. Only WAV, MP3, OGG are supported.")
-
-    # Save the uploaded audio file temporarily
-    unique_filename = f"{uuid.uuid4()}_{audio_file.filename}"
-    audio_path = os.path.join(AUDIO_UPLOAD_DIR, unique_filename)
-    with open(audio_path, "wb") as buffer:
-        shutil.copyfileobj(audio_file.file, buffer)
-    logger.info(f"Audio file saved temporarily to: {audio_path}")
+async def process_audio(request: Request):
+    """
+    Multipart upload with an ``audio_file`` part (WAV/MP3/OGG). The body is
+    decoded as it streams in; nothing is written to disk.
+    """
+    with load_controller.track_turn():
+        return await _process_audio(request)
+
+def _request_tenant(request: Request):
+    """
+    Tenant from the ``?tenant=<id>`` query parameter (default restaurant if absent).
+    """
+    try:
+        return tenant_store.resolve(tenant_id=request.query_params.get("tenant"))
+    except TenantNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+async def _process_audio(request: Request):
+    logger.info("Received audio processing request")
+    tenant_id = _request_tenant(request)
+    try:
+        upload = await read_audio_upload(
+            request.stream(),
+            request.headers.get("content-type", ""),
+            max_bytes=MAX_UPLOAD_BYTES,
+        )
+    except UploadError as e:
+        logger.error(f"Rejected audio upload: {e}")
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    logger.info(f"Decoded upload {upload.filename} in memory: {upload.bytes_received} bytes, {len(upload.audio) / 16000:.2f}s")
+
+    quality = load_controller.current()
 
     # 1. Transcribe audio
-    transcribed_text = transcribe_audio(audio_path)
-    if "Error" in transcribed_text:
-        logger.error(f"STT Error for {audio_file.filename}: {transcribed_text}")
-        raise HTTPException(status_code=500, detail=f"STT Error: {transcribed_text}")
-    logger.info(f"Transcribed text: {transcribed_text}")
-
-    # 2. Generate LLM reply using RAG
-    llm_reply = get_rag_response(transcribed_text) # Changed from generate_reply
+    with load_controller.timed("stt"):
+        transcription = await admission_controller.run("stt", transcribe_audio_result, upload.audio, profile=quality.stt_profile)
+    if transcription.error:
+        logger.error(f"STT Error for {upload.filename}: {transcription.error}")
+        raise HTTPException(status_code=500, detail=f"STT Error: {transcription.error}")
+    transcribed_text = transcription.text
+    logger.info(f"Transcribed text: {transcribed_text} {transcription.confidence()}")
+    # Noise and hallucinated transcripts get a "say again" from SPL, not the LLM
+    stt_issue = transcript_gate.check(transcription)
+
+    # 2. SPL first (cheap), so its replies don't queue behind LLM generations;
+    # then the LLM reply using RAG
+    _, spl_result = await asyncio.to_thread(decide_for_tenant, transcribed_text, tenant_id, stt_issue)
+    if spl_result.handled:
+        llm_reply = spl_result.response
+    else:
+        with load_controller.timed("llm"):
+            llm_reply = await admission_controller.run("llm", get_rag_response, transcribed_text, spl_result=spl_result, max_tokens=quality.max_tokens, tenant_id=tenant_id) # Changed from generate_reply
     if "Error" in llm_reply:
         logger.error(f"RAG Error for \"{transcribed_text}\": {llm_reply}")
         raise HTTPException(status_code=500, detail=f"RAG Error: {llm_reply}")
@@ -51,91 +134,186 @@ async def process_audio(audio_file: UploadFile = File(...)):
 
     # 3. Synthesize speech from LLM reply
     output_audio_filename = f"reply_{uuid.uuid4()}.wav"
-    synthesized_audio_path = synthesize_speech(llm_reply, output_audio_filename)
+    with load_controller.timed("tts"):
+        synthesized_audio_path = await admission_controller.run("tts", synthesize_speech, llm_reply, output_audio_filename, model_name=quality.tts_model)
     if "Error" in synthesized_audio_path:
         logger.error(f"TTS Error for \"{llm_reply}\": {synthesized_audio_path}")
         raise HTTPException(status_code=500, detail=f"TTS Error: {synthesized_audio_path}")
     logger.info(f"Synthesized audio saved to: {synthesized_audio_path}")
 
-    # Clean up the uploaded audio file
-    os.remove(audio_path)
-    logger.info(f"Cleaned up temporary audio file: {audio_path}")
+    return {
+        "transcribed_text": transcribed_text,
+        "stt_confidence": transcription.confidence(),
+        "stt_issue": stt_issue,
+        "llm_reply": llm_reply,
+        "reply_audio_path": synthesized_audio_path,
+    }
+
+@app.post("/process_audio_stream/")
+async def process_audio_stream(request: Request):
+    """
+    Same turn as /process_audio/, returned progressively as server-sent
+    events: the transcript, then LLM tokens, then audio per sentence.
+    """
+    logger.info("Received streaming audio processing request")
+    tenant_id = _request_tenant(request)
+    try:
+        upload = await read_audio_upload(
+            request.stream(),
+            request.headers.get("content-type", ""),
+            max_bytes=MAX_UPLOAD_BYTES,
+        )
+    except UploadError as e:
+        logger.error(f"Rejected audio upload: {e}")
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    async def events():
+        with load_controller.track_turn():
+            async for event in stream_turn(upload.audio, load_controller.current(), tenant_id):
+                yield event
 
-    return {"transcribed_text": transcribed_text, "llm_reply": llm_reply, "reply_audio_path": synthesized_audio_path}
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.post("/twilio_voice")
 async def twilio_voice(request: Request):
+    with load_controller.track_turn():
+        return await _twilio_voice(request)
+
+def _public_audio_url(filename: str) -> str:
+    # Twilio plays 8 kHz μ-law anyway: fetch it in that form, not 22 kHz PCM
+    return f"{PUBLIC_BASE_URL}/audio/{filename}?format={TWILIO_REPLY_FORMAT}"
+
+def _record_action(explicit_tenant):
+    # Keep an explicit tenant on the follow-up webhook
+    return f"/twilio_voice?tenant={explicit_tenant}" if explicit_tenant else "/twilio_voice"
+
+def _shed_to_hold(response: VoiceResponse, call_sid, budget, explicit_tenant) -> Response:
+    admission_controller.record("shed_hold", call_sid, budget)
+    if hold_clip_ready:
+        response.play(_public_audio_url(HOLD_CLIP_FILENAME))
+    else:
+        response.say(HOLD_MESSAGE)
+    response.record(action=_record_action(explicit_tenant), maxLength="10", timeout="5", transcribe=True)
+    return Response(content=str(response), media_type="application/xml")
+
+async def _twilio_voice(request: Request):
+    # The deadline runs from the moment Twilio's webhook arrives
+    budget = admission_controller.start_turn()
     logger.info("Received Twilio voice webhook request.")
     form_data = await request.form()
     call_sid = form_data.get("CallSid")
     recording_url = form_data.get("RecordingUrl") # URL of the recorded speech from Twilio
+    current_call_sid.set(call_sid) # stage workers are tagged with it for /debug/profile
+
+    # Tenant: explicit ?tenant=<id> on the webhook URL, else the dialed number
+    explicit_tenant = request.query_params.get("tenant")
+    try:
+        tenant_id = tenant_store.resolve(tenant_id=explicit_tenant, phone_number=form_data.get("To"))
+    except TenantNotFound as e:
+        logger.warning(f"{e} for Twilio call {call_sid}; using the default knowledge base")
+        explicit_tenant, tenant_id = None, None
 
     response = VoiceResponse()
 
     if recording_url:
         logger.info(f"Twilio recording URL received: {recording_url} for CallSid: {call_sid}")
         try:
-            # Create auth tuple
-            auth = (TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-            
-            # First, get the recording details to verify it exists
-            recording_sid = recording_url.split('/')[-1]
-            details_url = f"https://api.twilio.com/2010-04-01/Accounts/{TWILIO_ACCOUNT_SID}/Recordings/{recording_sid}.json"
-            
-            async with httpx.AsyncClient(auth=auth) as client:
-                # Verify recording exists
-                details_response = await client.get(details_url)
-                details_response.raise_for_status()
-                
-                # Download the recording with .wav extension
-                media_url = f"{recording_url}.wav"
-                audio_response = await client.get(media_url)
-                audio_response.raise_for_status()
-                
-                # Save the downloaded audio
-                unique_filename = f"{call_sid}_recorded.wav"
-                recorded_audio_path = os.path.join(AUDIO_UPLOAD_DIR, unique_filename)
-                with open(recorded_audio_path, "wb") as f:
-                    f.write(audio_response.content)
-                
-                logger.info(f"Recorded audio saved temporarily to: {recorded_audio_path}")
-
-                # 1. Transcribe audio
-            transcribed_text = transcribe_audio(recorded_audio_path)
-            os.remove(recorded_audio_path) # Clean up recorded audio
-            logger.info(f"Transcribed text from Twilio call {call_sid}: {transcribed_text}")
-
-            if "Error" in transcribed_text:
-                logger.error(f"STT Error for Twilio call {call_sid}: {transcribed_text}")
+            # Stream the recording straight into the in-memory decoder
+            recorded_audio = await recording_fetcher.fetch_audio(recording_url)
+            logger.info(f"Recording for Twilio call {call_sid} decoded in memory: {len(recorded_audio) / 16000:.2f}s")
+
+            quality = load_controller.current()
+
+            # No time left even to transcribe: hold and ask again
+            if not admission_controller.fits(budget, ("stt",)):
+                return _shed_to_hold(response, call_sid, budget, explicit_tenant)
+
+            # 1. Transcribe audio
+            with load_controller.timed("stt"):
+                transcription = await admission_controller.run("stt", transcribe_audio_result, recorded_audio, profile=quality.stt_profile)
+            transcribed_text = transcription.text
+            logger.info(f"Transcribed text from Twilio call {call_sid}: {transcribed_text} {transcription.confidence()}")
+
+            if transcription.error:
+                logger.error(f"STT Error for Twilio call {call_sid}: {transcription.error}")
+                admission_controller.record("error")
                 response.say("I apologize, but I encountered an error transcribing your speech.")
                 return Response(content=str(response), media_type="application/xml")
 
-            # 2. Generate LLM reply using RAG
-            llm_reply = get_rag_response(transcribed_text) # Changed from generate_reply
+            # 2. SPL first (cheap); the LLM only if the rest of the turn fits.
+            # Unreliable transcripts (noise, hallucinations) stop at SPL Layer 0.
+            stt_issue = transcript_gate.check(transcription)
+            # The tenant lookup may load or build its index: keep it off the event loop
+            spl, spl_result = await asyncio.to_thread(decide_for_tenant, transcribed_text, tenant_id, stt_issue)
+            if spl_result.handled:
+                llm_reply, outcome = spl_result.response, "spl"
+            elif admission_controller.fits(budget, ("llm", "tts")):
+                with load_controller.timed("llm"):
+                    llm_reply = await admission_controller.run("llm", get_rag_response, transcribed_text, spl_result=spl_result, max_tokens=quality.max_tokens, tenant_id=tenant_id) # Changed from generate_reply
+                outcome = "full"
+            else:
+                # Shed: relaxed SPL match, a cached reply, or the LLM spoken via <Say>
+                relaxed = spl.closest_intent(spl_result.embedding, ADMISSION_SPL_SLACK)
+                cached = admission_controller.reply_cache.get(tenant_id, transcribed_text)
+                if relaxed is not None:
+                    llm_reply, outcome = relaxed.response, "shed_spl"
+                elif cached is not None:
+                    llm_reply, outcome = cached, "shed_cache"
+                elif admission_controller.fits(budget, ("llm",)):
+                    with load_controller.timed("llm"):
+                        llm_reply = await admission_controller.run("llm", get_rag_response, transcribed_text, spl_result=spl_result, max_tokens=quality.max_tokens, tenant_id=tenant_id)
+                    outcome = "shed_say"
+                else:
+                    return _shed_to_hold(response, call_sid, budget, explicit_tenant)
+
             if "Error" in llm_reply:
                 logger.error(f"RAG Error for Twilio call {call_sid} (prompt: \"{transcribed_text}\"): {llm_reply}")
+                admission_controller.record("error")
                 response.say("I apologize, but I encountered an error generating a reply.")
                 return Response(content=str(response), media_type="application/xml")
             logger.info(f"LLM Reply (from RAG) for Twilio call {call_sid}: {llm_reply}")
+            if outcome in ("full", "shed_say"):
+                admission_controller.reply_cache.put(tenant_id, transcribed_text, llm_reply)
 
             # 3. Synthesize speech from LLM reply
-            if not first_reply_given.get(call_sid):
+            # Per-call state lives in the session store, shared by all workers
+            session = await asyncio.to_thread(session_store.load, call_sid, tenant_id)
+            if not session.first_reply_given:
                 max_tts_length = 200  
-                first_reply_given[call_sid] = True
+                session.first_reply_given = True
             else:
                 max_tts_length = 100  
+            session.turns += 1
+            await asyncio.to_thread(session_store.save, session)
             short_reply = llm_reply[:max_tts_length]
+
+            if outcome == "shed_say" or not admission_controller.fits(budget, ("tts",)):
+                # Twilio speaks the text itself: no local TTS
+                if outcome in ("full", "spl"):
+                    outcome = "shed_say"
+                admission_controller.record(outcome, call_sid, budget)
+                response.say(short_reply)
+                response.say("Is there anything else I can assist you with?")
+                return Response(content=str(response), media_type="application/xml")
+
             output_audio_filename = f"reply_{call_sid}.wav"
-            synthesized_audio_path = synthesize_speech(short_reply, output_audio_filename)
+            with load_controller.timed("tts"):
+                synthesized_audio_path = await admission_controller.run("tts", synthesize_speech, short_reply, output_audio_filename, model_name=quality.tts_model)
 
             if "Error" in synthesized_audio_path:
                 logger.error(f"TTS Error for Twilio call {call_sid} (reply: \"{llm_reply}\"): {synthesized_audio_path}")
+                admission_controller.record("error")
                 response.say("I apologize, but I encountered an error synthesizing my response.")
                 return Response(content=str(response), media_type="application/xml")
             logger.info(f"Synthesized audio for Twilio call {call_sid} saved to: {synthesized_audio_path}")
+            admission_controller.record(outcome, call_sid, budget)
 
             # Construct the URL for the synthesized audio using the provided public URL
-            audio_url = f"https://preexistent-multiaxial-kelsie.ngrok-free.dev/audio/{output_audio_filename}"
+            audio_url = _public_audio_url(output_audio_filename)
             logger.info(f"Twilio audio URL for playback: {audio_url}")
 
             response.say("Here is my response:")
@@ -144,26 +322,90 @@ async def twilio_voice(request: Request):
 
         except httpx.RequestError as e:
             logger.error(f"HTTPX Request Error for Twilio call {call_sid}: {e}")
+            admission_controller.record("error")
             response.say(f"I am sorry, I could not retrieve the audio recording. Error: {e}")
         except Exception as e:
             logger.error(f"An unexpected error occurred for Twilio call {call_sid}: {e}")
+            admission_controller.record("error")
             response.say(f"An unexpected error occurred: {e}")
     else:
         logger.info(f"No recording URL received for Twilio call {call_sid}. Initiating recording.")
         response.say("I did not receive any audio. Please try speaking after the tone.")
-        response.record(action="/twilio_voice", maxLength="10", timeout="5", transcribe=True) # Record user's speech
+        response.record(action=_record_action(explicit_tenant), maxLength="10", timeout="5", transcribe=True) # Record user's speech
 
     return Response(content=str(response), media_type="application/xml")
 
+@app.get("/metrics")
+async def metrics():
+    """
+    Turn outcomes (served / shed), stage estimates, knowledge reloads,
+    reply formats and transcripts gated before the LLM, Prometheus text
+    format.
+    """
+    content = (
+        admission_controller.metrics_text()
+        + knowledge_watcher.metrics_text()
+        + reply_audio_cache.metrics_text()
+        + transcript_gate.metrics_text()
+    )
+    return Response(content=content, media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/profile")
+async def debug_profile(seconds: float = 10.0, hz: float = 100.0, format: str = "collapsed", idle: bool = False, token: str = ""):
+    """
+    Samples all threads for ``seconds`` and returns collapsed stacks
+    (``format=collapsed``, for flamegraphs) or a summary by stage,
+    component and CallSid (``format=json``).
+    """
+    # Off unless explicitly enabled with a token: stacks expose file paths,
+    # and long high-rate profiles slow live calls
+    if not PROFILER_ENABLED or not PROFILER_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(token.encode("utf-8"), PROFILER_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Invalid profiler token.")
+    if not 0 < seconds <= PROFILER_MAX_SECONDS or not 1 <= hz <= 1000 or format not in ("collapsed", "json"):
+        raise HTTPException(status_code=400, detail=f"Need 0 < seconds <= {PROFILER_MAX_SECONDS:g}, 1 <= hz <= 1000, format collapsed|json.")
+
+    logger.info(f"Profiling all threads for {seconds:g}s at {hz:g} Hz")
+    try:
+        # Sampled from a worker thread so the event loop keeps serving calls
+        profile = await asyncio.to_thread(
+            sampling_profiler.profile, seconds, hz, idle, loop_ident=threading.get_ident()
+        )
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if format == "json":
+        return JSONResponse(profile.summary())
+    return Response(content=profile.collapsed(), media_type="text/plain")
+
 @app.get("/audio/{filename}")
-async def get_audio(filename: str):
+async def get_audio(filename: str, request: Request):
     """
-    Serves synthesized audio files.
+    Serves synthesized audio files, in the format picked by ``?format=``
+    or the Accept header (see app.reply_formats); the original WAV otherwise.
     """
+    started = time.perf_counter()
     file_path = os.path.join(AUDIO_OUTPUT_DIR, filename)
-    if not os.path.exists(file_path):
+    if not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="Audio file not found.")
-    return FileResponse(file_path, media_type="audio/wav")
+    try:
+        reply_format = negotiate(request.query_params.get("format"), request.headers.get("accept"))
+    except UnknownFormat as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Encoded once per file and format, then served from the cache
+    served_path = await asyncio.to_thread(reply_audio_cache.path_for, file_path, reply_format)
+
+    def log_download():
+        seconds = reply_audio_cache.record_served(reply_format, served_path, started)
+        logger.info(f"Served {filename} as {reply_format.name}: {os.path.getsize(served_path)} bytes in {seconds * 1000:.0f} ms")
+
+    return FileResponse(
+        served_path,
+        media_type=reply_format.media_type,
+        headers={"Vary": "Accept"},
+        background=BackgroundTask(log_download),
+    )
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,251 @@
+"""
+On-demand in-process sampling profiler.
+
+GET /debug/profile?seconds=10 samples the Python stacks of every thread
+(``sys._current_frames``) at a fixed rate for the requested window, then
+returns them in collapsed-stack format, ready for flamegraph.pl or
+speedscope:
+
+    <stage>;<CallSid>;<root frame>;...;<leaf frame> <samples>
+
+- stage: from the thread: the cpu_scheduler executors (stt, llm, tts),
+  the event loop, embedding batcher, hot-reload watcher, to_thread pool
+- CallSid: the call a stage worker was running for (tagged by
+  admission_controller.run), "-" when unknown (e.g. the event loop)
+
+``?format=json`` returns a summary instead: sample shares by stage, by
+component (Whisper, llama.cpp, Coqui TTS, LangChain, ... taken from the
+innermost library frame) and by CallSid. Idle threads (parked on a lock,
+queue or selector) are left out unless ``?idle=1``.
+
+The endpoint is off (404) unless PROFILER_ENABLED=1 and PROFILER_TOKEN is
+set; requests must pass the token as ``?token=``.
+
+Nothing runs between requests: the sampler thread exists only while a
+profile is being taken. The only standing cost is tagging which call a
+stage worker is serving (two dict operations per stage call).
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+# CallSid of the request being handled (set by the Twilio webhook)
+current_call_sid: ContextVar[Optional[str]] = ContextVar("current_call_sid", default=None)
+
+# Innermost matching frame decides the component; checked in order
+COMPONENTS = (
+    ("faster_whisper", "whisper"),
+    ("ctranslate2", "whisper"),
+    ("llama_cpp", "llama.cpp"),
+    (os.sep + "TTS" + os.sep, "coqui-tts"),
+    ("langchain", "langchain"),
+    ("chromadb", "chroma"),
+    ("onnxruntime", "embeddings"),
+    ("sentence_transformers", "embeddings"),
+    ("torch", "torch"),
+    ("numpy", "numpy"),
+    (os.sep + "app" + os.sep, "app"),
+    ("asyncio", "event-loop"),
+    ("uvicorn", "event-loop"),
+    ("starlette", "fastapi"),
+    ("fastapi", "fastapi"),
+)
+
+# (file, function) of a leaf frame that means the thread is parked
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),  # idle executor worker, blocked in SimpleQueue.get
+}
+
+THREAD_STAGES = {
+    "embedding-batcher": "embeddings",
+    "knowledge-watcher": "hot-reload",
+}
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _short_path(filename: str) -> str:
+    index = filename.rfind("site-packages" + os.sep)
+    if index >= 0:
+        return filename[index + len("site-packages" + os.sep):]
+    index = filename.rfind(os.sep + "app" + os.sep)
+    if index >= 0:
+        return filename[index + 1:]
+    return os.path.basename(filename)
+
+
+@dataclass
+class Profile:
+    seconds: float
+    ticks: int
+    stacks: Counter = field(default_factory=Counter)  # (stage, call, frames) -> samples
+    components: Counter = field(default_factory=Counter)  # (stage, component) -> samples
+    idle_samples: int = 0
+
+    def collapsed(self) -> str:
+        lines = [
+            ";".join((stage, call) + frames) + f" {count}"
+            for (stage, call, frames), count in self.stacks.most_common()
+        ]
+        return "\n".join(lines) + "\n"
+
+    def summary(self, top: int = 20) -> dict:
+        total = sum(self.stacks.values()) or 1
+
+        def shares(counter: Counter) -> Dict[str, dict]:
+            return {
+                key: {"samples": count, "share": round(count / total, 4)}
+                for key, count in counter.most_common()
+            }
+
+        by_stage, by_call, by_component = Counter(), Counter(), Counter()
+        for (stage, call, _), count in self.stacks.items():
+            by_stage[stage] += count
+            by_call[call] += count
+        for (_, component), count in self.components.items():
+            by_component[component] += count
+        return {
+            "seconds": round(self.seconds, 3),
+            "ticks": self.ticks,
+            "rate_hz": round(self.ticks / self.seconds, 1) if self.seconds else 0.0,
+            "samples": sum(self.stacks.values()),
+            "idle_samples": self.idle_samples,
+            "by_stage": shares(by_stage),
+            "by_component": shares(by_component),
+            "by_call": shares(by_call),
+            "top_stacks": [
+                {"stage": stage, "call_sid": call, "leaf": frames[-1] if frames else "", "samples": count}
+                for (stage, call, frames), count in self.stacks.most_common(top)
+            ],
+        }
+
+
+class SamplingProfiler:
+    def __init__(self, max_depth: int = 64):
+        self.max_depth = max_depth
+        self._busy = threading.Lock()
+        self._tags: Dict[int, str] = {}  # thread ident -> CallSid
+        self._labels: Dict[object, Tuple[str, str, str]] = {}  # code -> (label, component, idle key)
+
+    # =========================
+    # Call tagging
+    # =========================
+
+    @contextmanager
+    def tag_thread(self, call_sid: Optional[str]):
+        """
+        Attribute the current thread's samples to ``call_sid`` while inside.
+        """
+        if call_sid is None:
+            yield
+            return
+        ident = threading.get_ident()
+        self._tags[ident] = call_sid
+        try:
+            yield
+        finally:
+            self._tags.pop(ident, None)
+
+    # =========================
+    # Sampling
+    # =========================
+
+    def _describe(self, code) -> Tuple[str, str, str]:
+        described = self._labels.get(code)
+        if described is None:
+            filename = code.co_filename
+            component = next((name for marker, name in COMPONENTS if marker in filename), "")
+            described = (
+                f"{code.co_name} ({_short_path(filename)})".replace(";", ","),
+                component,
+                os.path.basename(filename),
+            )
+            self._labels[code] = described
+        return described
+
+    @staticmethod
+    def _thread_stage(name: str, ident: int, loop_ident: Optional[int]) -> str:
+        if ident == loop_ident:
+            return "event-loop"
+        if name.startswith("cpu-"):
+            return name[4:].split("_")[0]  # cpu-llm_0 -> llm
+        if name.startswith("asyncio_"):
+            return "to-thread"
+        return THREAD_STAGES.get(name, name)
+
+    def profile(self, seconds: float, hz: float = 100.0, include_idle: bool = False,
+                loop_ident: Optional[int] = None) -> Profile:
+        """
+        Sample every thread for ``seconds`` (blocks the calling thread).
+        Raises ProfilerBusy if another profile is running.
+        """
+        if not self._busy.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already being taken")
+        try:
+            return self._sample(seconds, hz, include_idle, loop_ident)
+        finally:
+            self._busy.release()
+
+    def _sample(self, seconds: float, hz: float, include_idle: bool, loop_ident: Optional[int]) -> Profile:
+        me = threading.get_ident()
+        interval = 1.0 / hz
+        stages: Dict[int, str] = {}
+        result = Profile(seconds=0.0, ticks=0)
+
+        start = time.perf_counter()
+        next_tick, next_refresh = start, start
+        while True:
+            now = time.perf_counter()
+            if now - start >= seconds:
+                break
+            if now >= next_refresh:
+                # Thread names change rarely; refresh once a second
+                stages = {t.ident: self._thread_stage(t.name, t.ident, loop_ident) for t in threading.enumerate()}
+                next_refresh = now + 1.0
+
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                frames, component = [], ""
+                leaf = self._describe(frame.f_code)
+                idle = (leaf[2], frame.f_code.co_name) in IDLE_LEAVES
+                if idle:
+                    result.idle_samples += 1
+                    if not include_idle:
+                        continue
+                while frame is not None and len(frames) < self.max_depth:
+                    label, frame_component, _ = self._describe(frame.f_code)
+                    frames.append(label)
+                    component = component or frame_component
+                    frame = frame.f_back
+                stage = stages.get(ident, "other")
+                call = self._tags.get(ident, "-")
+                result.stacks[(stage, call, tuple(reversed(frames)))] += 1
+                result.components[(stage, "idle" if idle else component or "other")] += 1
+            result.ticks += 1
+
+            next_tick += interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.perf_counter()  # fell behind: don't burst to catch up
+
+        result.seconds = time.perf_counter() - start
+        return result
+
+
+sampling_profiler = SamplingProfiler()
@@ -0,0 +1,268 @@
+"""
+Token-budgeted prompt packing and sentence-limited generation.
+
+- Context chunks are packed in relevance order until the prefill budget
+  (counted with the model's own tokenizer) is used up; the chunk that
+  overflows is trimmed at a token boundary.
+- Generation is streamed and stopped as soon as the requested number of
+  sentences has been produced, instead of running to max_tokens.
+- Prefill and decode token counts are reported for every request.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+from app.config import LLM_MAX_TOKENS, LLM_N_CTX, MAX_REPLY_SENTENCES, PROMPT_PREFILL_BUDGET
+
+PROMPT_HEADER = """
+You are a restaurant voice assistant.
+
+Answer ONLY the user's question.
+Do NOT include unrelated information.
+Be concise and specific.
+If the answer is not present, say you don't know.
+
+Context:
+"""
+
+PROMPT_FOOTER = """
+
+User question:
+{query}
+
+Answer ({limit}):
+"""
+
+STOP_SEQUENCES = ["User question:", "Context:"]
+
+# A sentence ends at . ! ? (plus closing quotes/brackets) followed by
+# whitespace or by the end of the text generated so far
+SENTENCE_END = re.compile(r"[.!?][\"')\]]*(?=\s|$)")
+# The word before a period, dots included ("p.m" in "10 p.m.")
+WORD_BEFORE = re.compile(r"[\w.]*$")
+# Never end a sentence: always followed by a name
+TITLES = {"dr", "mr", "mrs", "ms", "st", "prof"}
+# End a sentence only when the next word is capitalized ("at 10 p.m. Call
+# us"); single letters ("a.m.", "e.g.", initials) are treated the same way
+ABBREVIATIONS = {"etc", "approx", "vs", "min", "hrs", "no"}
+
+
+def sentence_ends(text: str) -> List[int]:
+    """
+    End offsets of the complete sentences in ``text``.
+    """
+    ends = []
+    for match in SENTENCE_END.finditer(text):
+        following = text[match.end():].lstrip()
+        if match.group()[0] == "." and _is_abbreviation(text[:match.start()], following):
+            continue
+        if not following and match.group()[0] == "." and match.start() > 0 and text[match.start() - 1].isdigit():
+            # May still become a decimal ("10." -> "10.30")
+            continue
+        ends.append(match.end())
+    return ends
+
+
+def _is_abbreviation(before: str, following: str) -> bool:
+    """
+    Whether the period after ``before`` belongs to an abbreviation rather
+    than ending the sentence. Undecided at the end of the text generated so
+    far: the next word shows which.
+    """
+    word = WORD_BEFORE.search(before).group().lower()
+    last = word.rsplit(".", 1)[-1]
+    if word in TITLES:
+        return True
+    if len(last) == 1 and last.isalpha() or last in ABBREVIATIONS:
+        return not following[:1].isupper()
+    return False
+
+
+def count_sentences(text: str) -> int:
+    return len(sentence_ends(text))
+
+
+def trim_to_sentences(text: str, max_sentences: int) -> str:
+    ends = sentence_ends(text)
+    if len(ends) > max_sentences:
+        text = text[:ends[max_sentences - 1]]
+    elif len(ends) == max_sentences:
+        text = text[:ends[-1]]
+    return text.strip()
+
+
+def sentence_limit_text(max_sentences: int) -> str:
+    if max_sentences <= 1:
+        return "1 sentence max"
+    return f"1–{max_sentences} sentences max"
+
+
+@dataclass
+class PackedPrompt:
+    prompt: str
+    prefill_tokens: int
+    chunks_used: int
+    chunks_trimmed: int = 0
+    chunks_dropped: int = 0
+
+
+@dataclass
+class GenerationResult:
+    text: str
+    prefill_tokens: int
+    decode_tokens: int
+    stopped_early: bool = False
+    sentences: int = 0
+    # Speculative decoding (0 when disabled)
+    draft_proposed: int = 0
+    draft_accepted: int = 0
+
+
+@dataclass
+class PromptBuilder:
+    llm: object
+    prefill_budget: int = PROMPT_PREFILL_BUDGET
+    max_sentences: int = MAX_REPLY_SENTENCES
+    n_ctx: int = LLM_N_CTX
+    stop: List[str] = field(default_factory=lambda: list(STOP_SEQUENCES))
+    # app.speculative drafter attached to the model, for acceptance stats
+    drafter: Optional[object] = None
+
+    # -------------------------
+    # Tokenizer access
+    # -------------------------
+
+    def _client(self):
+        # LangChain's LlamaCpp keeps the llama_cpp.Llama instance on .client
+        return getattr(self.llm, "client", None)
+
+    def tokenize(self, text: str) -> List[int]:
+        client = self._client()
+        if client is not None:
+            return client.tokenize(text.encode("utf-8"), add_bos=False)
+        # Rough fallback: ~4 characters per token
+        return list(range((len(text) + 3) // 4))
+
+    def count_tokens(self, text: str) -> int:
+        return len(self.tokenize(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        if max_tokens <= 0:
+            return ""
+        client = self._client()
+        if client is not None:
+            tokens = client.tokenize(text.encode("utf-8"), add_bos=False)[:max_tokens]
+            return client.detokenize(tokens).decode("utf-8", errors="ignore")
+        return text[: max_tokens * 4]
+
+    # -------------------------
+    # Packing
+    # -------------------------
+
+    def budget_for(self, max_tokens: int) -> int:
+        """
+        Prefill budget, clamped so prompt + reply always fit in n_ctx.
+        """
+        return max(0, min(self.prefill_budget, self.n_ctx - max_tokens))
+
+    def build(self, query: str, chunks: List[str], max_tokens: int = LLM_MAX_TOKENS) -> PackedPrompt:
+        """
+        Pack ``chunks`` (most relevant first) into the prompt within budget.
+        """
+        footer = PROMPT_FOOTER.format(query=query, limit=sentence_limit_text(self.max_sentences))
+        # +1 for the BOS token llama.cpp adds
+        fixed_tokens = self.count_tokens(PROMPT_HEADER) + self.count_tokens(footer) + 1
+        remaining = self.budget_for(max_tokens) - fixed_tokens
+
+        separator = "\n\n"
+        separator_tokens = self.count_tokens(separator)
+        packed: List[str] = []
+        trimmed = 0
+        for chunk in chunks:
+            cost = self.count_tokens(chunk) + (separator_tokens if packed else 0)
+            if cost <= remaining:
+                packed.append(chunk)
+                remaining -= cost
+                continue
+            # Trim the first chunk that does not fit, then stop
+            room = remaining - (separator_tokens if packed else 0)
+            partial = self.truncate(chunk, room).strip()
+            if partial:
+                packed.append(partial)
+                trimmed = 1
+            break
+
+        context = separator.join(packed)
+        prompt = PROMPT_HEADER + context + footer
+        return PackedPrompt(
+            prompt=prompt,
+            prefill_tokens=self.count_tokens(prompt) + 1,
+            chunks_used=len(packed),
+            chunks_trimmed=trimmed,
+            chunks_dropped=len(chunks) - len(packed),
+        )
+
+    # -------------------------
+    # Generation
+    # -------------------------
+
+    def stream(
+        self,
+        packed: PackedPrompt,
+        max_tokens: int = LLM_MAX_TOKENS,
+        max_sentences: Optional[int] = None,
+        stats: Optional[GenerationResult] = None,
+    ) -> Iterator[str]:
+        """
+        Yield generated text pieces (one per token), stopping once
+        ``max_sentences`` sentences are complete. Closing the stream
+        also stops llama.cpp's decode loop.
+        """
+        limit = max_sentences or self.max_sentences
+        text = ""
+        decode_tokens = 0
+        stopped_early = False
+        hit_limit = False
+        # Generations are serialized on the LLM executor, so a snapshot
+        # diff attributes draft proposals to this request
+        draft_before = self.drafter.stats.snapshot() if self.drafter is not None else None
+
+        stream = self.llm.stream(packed.prompt, stop=self.stop, max_tokens=max_tokens)
+        try:
+            for piece in stream:
+                decode_tokens += 1
+                candidate = text + piece
+                ends = sentence_ends(candidate)
+                if len(ends) >= limit:
+                    # Only pass on text up to the end of the last allowed sentence
+                    cut = ends[limit - 1]
+                    if cut > len(text):
+                        yield candidate[len(text):cut]
+                    text = candidate[:cut]
+                    hit_limit = True
+                    stopped_early = decode_tokens < max_tokens
+                    break
+                text = candidate
+                yield piece
+        finally:
+            stream.close()
+            if stats is not None:
+                stats.text = trim_to_sentences(text, limit)
+                stats.prefill_tokens = packed.prefill_tokens
+                stats.decode_tokens = decode_tokens
+                stats.stopped_early = stopped_early
+                stats.sentences = limit if hit_limit else count_sentences(text)
+                if draft_before is not None:
+                    stats.draft_proposed, stats.draft_accepted = self.drafter.usage_since(draft_before, decode_tokens)
+
+    def generate(
+        self,
+        packed: PackedPrompt,
+        max_tokens: int = LLM_MAX_TOKENS,
+        max_sentences: Optional[int] = None,
+    ) -> GenerationResult:
+        stats = GenerationResult(text="", prefill_tokens=packed.prefill_tokens, decode_tokens=0)
+        for _ in self.stream(packed, max_tokens, max_sentences, stats):
+            pass
+        return stats
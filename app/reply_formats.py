@@ -0,0 +1,249 @@
+"""
+Compact, telephony-native encodings of reply audio.
+
+TTS writes 22.05 kHz 16-bit WAV. Twilio plays calls at 8 kHz μ-law, so
+the extra rate and bit depth are only bytes over the tunnel. /audio
+serves a reply in the format a client asks for, via ``?format=<name>``
+or its Accept header:
+
+- "wav":      the original TTS file (default)
+- "ulaw-wav": 8 kHz μ-law WAV (format tag 7), ~1/5.5 of the bytes
+- "ulaw":     headerless 8 kHz μ-law (audio/basic, audio/x-mulaw)
+- "pcm8k":    8 kHz 16-bit PCM WAV, for players without μ-law support
+
+Each format is encoded once per reply, on first request, and cached on
+disk next to the output; the cache entry is re-encoded if the reply file
+is rewritten (reply files are reused per call). Resampling and μ-law
+encoding reuse app.audio_packetizer.
+"""
+
+import io
+import os
+import struct
+import threading
+import time
+import wave
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from app.audio_packetizer import StreamingResampler, float_to_ulaw
+from app.config import REPLY_FORMAT_CACHE_DIR
+
+TELEPHONY_RATE = 8000
+WAVE_FORMAT_MULAW = 7
+
+
+class UnknownFormat(Exception):
+    pass
+
+
+def read_wav(path: str):
+    """
+    (float32 mono audio in [-1, 1], sample rate) from a 16-bit PCM WAV.
+    """
+    with wave.open(path, "rb") as wav_file:
+        if wav_file.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit PCM, got {8 * wav_file.getsampwidth()}-bit")
+        rate, channels = wav_file.getframerate(), wav_file.getnchannels()
+        pcm = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype="<i2")
+    audio = pcm.reshape(-1, channels).mean(axis=1) if channels > 1 else pcm
+    return audio.astype(np.float32) / 32768.0, rate
+
+
+def _resample(audio: np.ndarray, in_rate: int, out_rate: int) -> np.ndarray:
+    resampler = StreamingResampler(in_rate, out_rate)
+    return np.concatenate((resampler.process(audio), resampler.flush()))
+
+
+def _telephony_ulaw(audio: np.ndarray, rate: int) -> bytes:
+    return float_to_ulaw(_resample(audio, rate, TELEPHONY_RATE)).tobytes()
+
+
+def ulaw_wav_bytes(ulaw: bytes, rate: int = TELEPHONY_RATE) -> bytes:
+    """
+    Wrap μ-law samples in a WAV container. The wave module only writes
+    PCM, so the RIFF header is built here (non-PCM needs a fact chunk).
+    """
+    fmt = struct.pack("<HHIIHHH", WAVE_FORMAT_MULAW, 1, rate, rate, 1, 8, 0)
+    fact = struct.pack("<I", len(ulaw))
+    data = ulaw + (b"\x00" if len(ulaw) % 2 else b"")
+    body = (
+        b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"fact" + struct.pack("<I", len(fact)) + fact
+        + b"data" + struct.pack("<I", len(ulaw)) + data
+    )
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def pcm_wav_bytes(audio: np.ndarray, rate: int) -> bytes:
+    pcm = np.clip(np.rint(audio * 32767.0), -32768, 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+@dataclass(frozen=True)
+class ReplyFormat:
+    name: str
+    media_type: str  # Content-Type served
+    extension: str
+    accepts: tuple  # Accept media types answered with this format
+    encode: Optional[Callable[[np.ndarray, int], bytes]] = None  # None: serve the original
+
+
+FORMATS: Dict[str, ReplyFormat] = {
+    "wav": ReplyFormat("wav", "audio/wav", ".wav", ("audio/wav", "audio/x-wav", "audio/wave")),
+    "ulaw-wav": ReplyFormat(
+        "ulaw-wav", "audio/wav", ".wav",
+        ("audio/wav;codec=7", "audio/vnd.wave;codec=7"),
+        lambda audio, rate: ulaw_wav_bytes(_telephony_ulaw(audio, rate)),
+    ),
+    "ulaw": ReplyFormat(
+        "ulaw", "audio/basic", ".ul",
+        ("audio/basic", "audio/x-mulaw", "audio/ulaw", "audio/pcmu"),
+        _telephony_ulaw,
+    ),
+    "pcm8k": ReplyFormat(
+        "pcm8k", "audio/wav", ".wav",
+        ("audio/l16;rate=8000", "audio/wav;rate=8000"),
+        lambda audio, rate: pcm_wav_bytes(_resample(audio, rate, TELEPHONY_RATE), TELEPHONY_RATE),
+    ),
+}
+DEFAULT_FORMAT = "wav"
+
+
+def _parse_media_range(item: str):
+    parts = [p.strip().lower() for p in item.split(";")]
+    params = [p.replace(" ", "") for p in parts[1:] if p and not p.startswith("q=")]
+    quality = 1.0
+    for p in parts[1:]:
+        if p.startswith("q="):
+            try:
+                quality = float(p[2:])
+            except ValueError:
+                quality = 0.0
+    return ";".join([parts[0]] + sorted(params)), quality
+
+
+def negotiate(format_param: Optional[str] = None, accept: Optional[str] = None) -> ReplyFormat:
+    """
+    ``?format=`` wins; otherwise the highest-q Accept media type we can
+    serve; otherwise the original WAV. Raises UnknownFormat for a bad
+    ``format`` value.
+    """
+    if format_param:
+        if format_param not in FORMATS:
+            raise UnknownFormat(f"Unknown audio format: {format_param} (available: {', '.join(FORMATS)})")
+        return FORMATS[format_param]
+    ranges = sorted(
+        (_parse_media_range(item) for item in (accept or "").split(",") if item.strip()),
+        key=lambda r: -r[1],
+    )
+    for media_range, quality in ranges:
+        if quality <= 0:
+            continue
+        for reply_format in FORMATS.values():
+            if media_range in reply_format.accepts:
+                return reply_format
+    return FORMATS[DEFAULT_FORMAT]
+
+
+class ReplyAudioCache:
+    """
+    Encoded copies of reply files: <cache_dir>/<format>/<stem><ext>.
+    """
+
+    def __init__(self, cache_dir: str = REPLY_FORMAT_CACHE_DIR, lock_stripes: int = 64):
+        self.cache_dir = cache_dir
+        # Fixed pool of locks striped by path: bounded however many calls are served
+        self._locks = [threading.Lock() for _ in range(lock_stripes)]
+        self._stats_lock = threading.Lock()
+        self.encodes = 0
+        self.encode_seconds = 0.0
+        self.served_bytes: Counter = Counter()
+        self.served_files: Counter = Counter()
+        self.served_seconds: Counter = Counter()
+
+    def path_for(self, source_path: str, reply_format: ReplyFormat) -> str:
+        """
+        File to serve for ``source_path`` in ``reply_format``, encoding it
+        first if the cached copy is missing or older than the source.
+        """
+        if reply_format.encode is None:
+            return source_path
+        stem = os.path.splitext(os.path.basename(source_path))[0]
+        cached_path = os.path.join(self.cache_dir, reply_format.name, stem + reply_format.extension)
+        # One encode per file and format, however many concurrent fetches
+        with self._locks[hash(cached_path) % len(self._locks)]:
+            if self._fresh(cached_path, source_path):
+                return cached_path
+            start = time.perf_counter()
+            audio, rate = read_wav(source_path)
+            encoded = reply_format.encode(audio, rate)
+            os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+            tmp_path = f"{cached_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(encoded)
+            os.replace(tmp_path, cached_path)
+            with self._stats_lock:
+                self.encodes += 1
+                self.encode_seconds += time.perf_counter() - start
+        return cached_path
+
+    @staticmethod
+    def _fresh(cached_path: str, source_path: str) -> bool:
+        return os.path.exists(cached_path) and os.stat(cached_path).st_mtime_ns >= os.stat(source_path).st_mtime_ns
+
+    def record_served(self, reply_format: ReplyFormat, path: str, started: float) -> float:
+        """
+        Account one download; ``started`` is the request's perf_counter.
+        Run after the body is sent, so the elapsed time covers the transfer
+        up to the last write into the socket.
+        """
+        seconds = time.perf_counter() - started
+        with self._stats_lock:
+            self.served_bytes[reply_format.name] += os.path.getsize(path)
+            self.served_files[reply_format.name] += 1
+            self.served_seconds[reply_format.name] += seconds
+        return seconds
+
+    def metrics_text(self) -> str:
+        with self._stats_lock:
+            served_bytes, served_files = dict(self.served_bytes), dict(self.served_files)
+            served_seconds = dict(self.served_seconds)
+            encodes, encode_seconds = self.encodes, self.encode_seconds
+        lines = [
+            "# HELP voice_reply_audio_bytes_total Reply audio bytes served, by format.",
+            "# TYPE voice_reply_audio_bytes_total counter",
+        ]
+        lines += [f'voice_reply_audio_bytes_total{{format="{f}"}} {n}' for f, n in sorted(served_bytes.items())]
+        lines += [
+            "# HELP voice_reply_audio_files_total Reply audio files served, by format.",
+            "# TYPE voice_reply_audio_files_total counter",
+        ]
+        lines += [f'voice_reply_audio_files_total{{format="{f}"}} {n}' for f, n in sorted(served_files.items())]
+        lines += [
+            "# HELP voice_reply_audio_download_seconds_total Time from request to last byte sent, by format.",
+            "# TYPE voice_reply_audio_download_seconds_total counter",
+        ]
+        lines += [f'voice_reply_audio_download_seconds_total{{format="{f}"}} {s:.3f}' for f, s in sorted(served_seconds.items())]
+        lines += [
+            "# HELP voice_reply_audio_encodes_total Format conversions (cache misses).",
+            "# TYPE voice_reply_audio_encodes_total counter",
+            f"voice_reply_audio_encodes_total {encodes}",
+            "# HELP voice_reply_audio_encode_seconds_total Time spent converting reply audio.",
+            "# TYPE voice_reply_audio_encode_seconds_total counter",
+            f"voice_reply_audio_encode_seconds_total {encode_seconds:.3f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+reply_audio_cache = ReplyAudioCache()
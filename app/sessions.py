@@ -0,0 +1,321 @@
+"""
+Per-call session state, shared across workers and nodes.
+
+Twilio posts every turn of a call to /twilio_voice as a separate webhook.
+State that must survive between turns (whether the first, longer reply
+was already given, turn count, tenant) is kept in a session store keyed
+by CallSid, so any worker can serve any turn:
+
+- "memory": in-process dict (single worker, the previous behaviour)
+- "sqlite": one database file shared by the workers of a node (WAL mode)
+- "kv":     a Redis-protocol key-value server shared by several nodes.
+            ``python -m app.sessions serve-kv`` runs a small local
+            stand-in that speaks the subset used here (GET/SET EX/DEL).
+
+Sessions expire SESSION_TTL seconds after their last turn.
+
+Routing each call's webhooks to the same worker (so in-process caches
+stay warm) is app.call_router's job; the store keeps turns correct when a
+call does move, e.g. after a worker is added or removed.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from loguru import logger
+
+from app.config import SESSION_BACKEND, SESSION_KV_URL, SESSION_SQLITE_PATH, SESSION_TTL
+
+
+@dataclass
+class CallSession:
+    call_sid: str
+    tenant_id: Optional[str] = None
+    first_reply_given: bool = False
+    turns: int = 0
+    updated_at: float = field(default_factory=time.time)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, data: str) -> "CallSession":
+        return cls(**json.loads(data))
+
+
+class SessionStore(ABC):
+    """
+    Backend interface. Methods block; async callers run them in a thread.
+    """
+
+    name = "base"
+
+    def __init__(self, ttl: float = SESSION_TTL):
+        self.ttl = ttl
+
+    @abstractmethod
+    def get(self, call_sid: str) -> Optional[CallSession]:
+        ...
+
+    @abstractmethod
+    def put(self, session: CallSession):
+        ...
+
+    @abstractmethod
+    def delete(self, call_sid: str):
+        ...
+
+    def load(self, call_sid: str, tenant_id: Optional[str] = None) -> CallSession:
+        """
+        The call's session, or a new one for its first turn.
+        """
+        return self.get(call_sid) or CallSession(call_sid=call_sid, tenant_id=tenant_id)
+
+    def save(self, session: CallSession):
+        session.updated_at = time.time()
+        self.put(session)
+
+
+class MemorySessionStore(SessionStore):
+    name = "memory"
+
+    def __init__(self, ttl: float = SESSION_TTL):
+        super().__init__(ttl)
+        self._sessions: Dict[str, CallSession] = {}
+        self._lock = threading.Lock()
+
+    def get(self, call_sid: str) -> Optional[CallSession]:
+        with self._lock:
+            session = self._sessions.get(call_sid)
+            if session is not None and time.time() - session.updated_at > self.ttl:
+                del self._sessions[call_sid]
+                return None
+            return session
+
+    def put(self, session: CallSession):
+        with self._lock:
+            self._sessions[session.call_sid] = session
+            # Expire idle calls opportunistically (the old dict grew forever)
+            cutoff = time.time() - self.ttl
+            for call_sid in [sid for sid, s in self._sessions.items() if s.updated_at < cutoff]:
+                del self._sessions[call_sid]
+
+    def delete(self, call_sid: str):
+        with self._lock:
+            self._sessions.pop(call_sid, None)
+
+
+class SQLiteSessionStore(SessionStore):
+    name = "sqlite"
+
+    def __init__(self, path: str = SESSION_SQLITE_PATH, ttl: float = SESSION_TTL):
+        super().__init__(ttl)
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connection() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(call_sid TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets workers read while one writes
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, call_sid: str) -> Optional[CallSession]:
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE call_sid = ? AND updated_at >= ?",
+            (call_sid, time.time() - self.ttl),
+        ).fetchone()
+        return CallSession.from_json(row[0]) if row else None
+
+    def put(self, session: CallSession):
+        with self._connection() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO sessions (call_sid, data, updated_at) VALUES (?, ?, ?)",
+                (session.call_sid, session.to_json(), session.updated_at),
+            )
+            db.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+
+    def delete(self, call_sid: str):
+        with self._connection() as db:
+            db.execute("DELETE FROM sessions WHERE call_sid = ?", (call_sid,))
+
+
+# =========================
+# Key-value backend (Redis protocol subset)
+# =========================
+
+def _encode_command(*args) -> bytes:
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+class KVSessionStore(SessionStore):
+    """
+    Sessions in a Redis-compatible server (``kv://host:port`` or
+    ``redis://host:port``), one short-lived connection per thread.
+    """
+
+    name = "kv"
+    key_prefix = "call:"
+
+    def __init__(self, url: str = SESSION_KV_URL, ttl: float = SESSION_TTL):
+        super().__init__(ttl)
+        parsed = urlparse(url)
+        self.address = (parsed.hostname or "127.0.0.1", parsed.port or 6379)
+        self._local = threading.local()
+
+    def _reader(self):
+        reader = getattr(self._local, "reader", None)
+        if reader is None:
+            sock = socket.create_connection(self.address, timeout=2.0)
+            reader = self._local.reader = sock.makefile("rwb")
+        return reader
+
+    def _call(self, *args):
+        try:
+            stream = self._reader()
+            stream.write(_encode_command(*args))
+            stream.flush()
+            return self._read_reply(stream)
+        except OSError:
+            reader, self._local.reader = getattr(self._local, "reader", None), None
+            if reader is not None:
+                reader.close()  # reconnect on the next call
+            raise
+
+    @staticmethod
+    def _read_reply(stream):
+        line = stream.readline()
+        if not line:
+            raise ConnectionError("Session server closed the connection")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"-":
+            raise RuntimeError(payload.decode("utf-8", "replace"))
+        if kind in (b"+", b":"):
+            return payload
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = stream.read(length + 2)
+            return data[:-2]
+        raise RuntimeError(f"Unexpected session server reply: {line!r}")
+
+    def get(self, call_sid: str) -> Optional[CallSession]:
+        data = self._call("GET", self.key_prefix + call_sid)
+        return CallSession.from_json(data.decode("utf-8")) if data is not None else None
+
+    def put(self, session: CallSession):
+        self._call("SET", self.key_prefix + session.call_sid, session.to_json(), "EX", int(self.ttl))
+
+    def delete(self, call_sid: str):
+        self._call("DEL", self.key_prefix + call_sid)
+
+
+async def serve_kv(host: str = "127.0.0.1", port: int = 6379):
+    """
+    Local stand-in for a shared Redis: GET, SET (with EX), DEL and PING,
+    kept in memory with per-key expiry. For development and single-host
+    multi-worker setups; use a real Redis across machines.
+    """
+    values: Dict[bytes, tuple] = {}
+
+    async def read_command(reader):
+        header = await reader.readline()
+        if not header:
+            return None
+        count = int(header[1:-2])
+        args = []
+        for _ in range(count):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+                command, now = args[0].upper(), time.monotonic()
+                if command == b"PING":
+                    writer.write(b"+PONG\r\n")
+                elif command == b"GET":
+                    value, expires = values.get(args[1], (None, 0))
+                    if value is None or (expires and expires < now):
+                        values.pop(args[1], None)
+                        writer.write(b"$-1\r\n")
+                    else:
+                        writer.write(b"$%d\r\n%s\r\n" % (len(value), value))
+                elif command == b"SET":
+                    expires = 0
+                    if len(args) >= 5 and args[3].upper() == b"EX":
+                        expires = now + int(args[4])
+                    values[args[1]] = (args[2], expires)
+                    writer.write(b"+OK\r\n")
+                elif command == b"DEL":
+                    removed = sum(values.pop(key, None) is not None for key in args[1:])
+                    writer.write(b":%d\r\n" % removed)
+                else:
+                    writer.write(b"-ERR unsupported command\r\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"[SESSIONS] Key-value stand-in listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+BACKENDS = {
+    "memory": MemorySessionStore,
+    "sqlite": SQLiteSessionStore,
+    "kv": KVSessionStore,
+}
+
+
+def make_session_store(backend: str = SESSION_BACKEND) -> SessionStore:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown session backend: {backend} (available: {', '.join(BACKENDS)})")
+    store = BACKENDS[backend]()
+    logger.info(f"[SESSIONS] Using the {store.name} session store")
+    return store
+
+
+session_store = make_session_store()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Session store utilities")
+    parser.add_argument("command", choices=["serve-kv"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=urlparse(SESSION_KV_URL).port or 6379)
+    args = parser.parse_args()
+    asyncio.run(serve_kv(args.host, args.port))
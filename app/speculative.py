@@ -0,0 +1,167 @@
+"""
+Speculative decoding drafters for the LlamaCpp model.
+
+llama-cpp-python accepts a ``draft_model`` (anything with the
+``LlamaDraftModel`` call interface): before each decode step it asks the drafter for up to N candidate tokens, then
+evaluates the last token plus all candidates in one forward pass of the
+target model and keeps the longest prefix the target agrees with. Every
+accepted candidate is a token generated without its own forward pass.
+
+Two drafters, selected by LLM_SPECULATIVE:
+
+- "prompt-lookup": finds the latest n-gram of the context earlier in the
+  prompt and proposes the tokens that followed it. Answers often copy the
+  retrieved KB text word for word, so this costs nothing and accepts well.
+- "draft-model": greedy continuation from a small GGUF model (phi-2).
+  phi-2 and Llama 3.2 use different tokenizers, so the context is
+  detokenized, continued by phi-2 and the draft re-tokenized for the
+  target; the last drafted token is dropped since it may be a partial word.
+
+Both count their proposals so acceptance can be reported per generation.
+llama_cpp is only imported when a drafter is built, so builds without
+``llama_cpp.llama_speculative`` still start with LLM_SPECULATIVE=off.
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from app.config import (
+    LLM_DRAFT_MODEL_PATH,
+    LLM_DRAFT_NGRAM_SIZE,
+    LLM_DRAFT_TOKENS,
+    LLM_N_CTX,
+    LLM_SPECULATIVE,
+)
+
+
+@dataclass
+class DraftStats:
+    steps: int = 0  # target forward passes that were given a draft
+    proposed: int = 0  # draft tokens proposed
+
+    def snapshot(self) -> "DraftStats":
+        return DraftStats(self.steps, self.proposed)
+
+    def since(self, before: "DraftStats") -> "DraftStats":
+        return DraftStats(self.steps - before.steps, self.proposed - before.proposed)
+
+
+def accepted_tokens(stats: DraftStats, decode_tokens: int) -> int:
+    """
+    Each verification step yields the accepted drafts plus one token from
+    the target itself, so accepted = decoded - steps (approximately: the
+    final step may be cut short by a stop sequence or the sentence limit).
+    """
+    return max(0, min(stats.proposed, decode_tokens - stats.steps))
+
+
+class CountingDrafter(ABC):
+    """
+    Callable like ``llama_cpp.llama_speculative.LlamaDraftModel``; subclasses
+    implement ``propose``.
+    """
+
+    name = "drafter"
+
+    def __init__(self):
+        self.stats = DraftStats()
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def propose(self, input_ids: np.ndarray) -> np.ndarray:
+        """
+        Up to N candidate token ids to follow ``input_ids``.
+        """
+
+    def usage_since(self, before: DraftStats, decode_tokens: int) -> tuple[int, int]:
+        """
+        (proposed, accepted) draft tokens since the ``before`` snapshot.
+        """
+        delta = self.stats.since(before)
+        return delta.proposed, accepted_tokens(delta, decode_tokens)
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs) -> np.ndarray:
+        draft = self.propose(input_ids)
+        with self._lock:
+            self.stats.steps += 1
+            self.stats.proposed += len(draft)
+        return draft
+
+
+class PromptLookupDrafter(CountingDrafter):
+    name = "prompt-lookup"
+
+    def __init__(self, max_ngram_size: int = LLM_DRAFT_NGRAM_SIZE, num_pred_tokens: int = LLM_DRAFT_TOKENS):
+        from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
+
+        super().__init__()
+        self._lookup = LlamaPromptLookupDecoding(max_ngram_size=max_ngram_size, num_pred_tokens=num_pred_tokens)
+
+    def propose(self, input_ids: np.ndarray) -> np.ndarray:
+        return self._lookup(input_ids)
+
+
+class DraftModelDrafter(CountingDrafter):
+    name = "draft-model"
+
+    def __init__(
+        self,
+        model_path: str = LLM_DRAFT_MODEL_PATH,
+        num_pred_tokens: int = LLM_DRAFT_TOKENS,
+        n_ctx: int = LLM_N_CTX,
+        n_threads: Optional[int] = None,
+    ):
+        from llama_cpp import Llama
+
+        super().__init__()
+        self.num_pred_tokens = num_pred_tokens
+        self.n_ctx = n_ctx
+        self.draft = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads, verbose=False)
+        self.target = None
+        self._empty = np.array([], dtype=np.intc)
+
+    def bind(self, target):
+        """
+        The target ``llama_cpp.Llama`` (needed to convert between tokenizers).
+        """
+        self.target = target
+
+    def propose(self, input_ids: np.ndarray) -> np.ndarray:
+        if self.target is None:
+            return self._empty
+        text = self.target.detokenize(input_ids.tolist()).decode("utf-8", errors="ignore")
+        prompt = self.draft.tokenize(text.encode("utf-8"))
+        # The tokenizers differ in length; keep the latest context that fits
+        prompt = prompt[-(self.n_ctx - self.num_pred_tokens - 1):]
+
+        drafted = []
+        # Greedy; reset=True reuses the draft model's KV cache for the shared prefix
+        for token in self.draft.generate(prompt, temp=0.0, top_k=1):
+            if token == self.draft.token_eos():
+                break
+            drafted.append(token)
+            if len(drafted) >= self.num_pred_tokens:
+                break
+        if not drafted:
+            return self._empty
+
+        draft_text = self.draft.detokenize(drafted)
+        tokens = self.target.tokenize(draft_text, add_bos=False)[:-1]
+        return np.array(tokens[:self.num_pred_tokens], dtype=np.intc)
+
+
+def make_drafter(mode: str = LLM_SPECULATIVE, n_threads: Optional[int] = None) -> Optional[CountingDrafter]:
+    """
+    Drafter for ``mode`` ("off", "prompt-lookup" or "draft-model"), or None.
+    """
+    if mode in ("", "off"):
+        return None
+    if mode == "prompt-lookup":
+        return PromptLookupDrafter()
+    if mode == "draft-model":
+        return DraftModelDrafter(n_threads=n_threads)
+    raise ValueError(f"Unknown LLM_SPECULATIVE mode: {mode}")
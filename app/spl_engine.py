@@ -6,13 +6,25 @@ Layer 0 rules:
 - Zero cost
 - Zero ambiguity
 - Safe for voice agents
+
+Layer 2 (semantic):
+- One embedding per utterance
+- Nearest-neighbour search over exemplar utterances
+- Answers only when cosine similarity clears the intent's ``similarity``
+  threshold
+- A rule's ``confidence`` is reported on its matches: as is for a Layer 1
+  regex hit, times the cosine similarity for a Layer 2 match
+- The embedding is handed back for retrieval when nothing matches
 """
 
+import json
 import re
 import string
 from dataclasses import dataclass
 from typing import Optional
 
+import numpy as np
+
 
 def normalize_text(text: str) -> str:
     text = text.lower().strip()
@@ -20,16 +32,142 @@ def normalize_text(text: str) -> str:
     return text
 
 
+# Layer 2 cosine-similarity threshold for intents that don't set one.
+# MiniLM paraphrases of an exemplar typically score 0.7-0.8. This and the
+# per-intent values below are starting points, not measurements: tune
+# them with ``python -m benchmarks.bench_spl_similarity``.
+DEFAULT_SIMILARITY = 0.75
+
+# Default rule pack (the original restaurant); tenants ship their own
+# as spl_rules.json, see load_rules()
+DEFAULT_PATTERNS = [
+    {
+        "name": "opening_hours",
+        "regex": r"(what time|when).*(open|close)|\b(open|opening|close|closing)\b.*(time|hours?)",
+        "response": "We're open daily from 11:00 AM to 10:30 PM.",
+        "confidence": 0.95,
+        "similarity": 0.72,
+        "exemplars": [
+            "when do you open",
+            "when do you guys shut",
+            "what are your hours",
+            "are you open right now",
+            "how late are you open tonight",
+            "what time does the kitchen close",
+        ],
+    },
+    {
+        "name": "location",
+        "regex": r"(where|location|address).*",
+        "response": "We're located at MG Road, Bangalore.",
+        "confidence": 0.95,
+        "similarity": 0.75,
+        "exemplars": [
+            "where are you located",
+            "what is your address",
+            "how do i get to the restaurant",
+            "which area is the restaurant in",
+        ],
+    },
+    {
+        "name": "menu",
+        "regex": r"(menu|dishes|food|items)",
+        "response": "We serve North Indian, South Indian, and Chinese cuisine.",
+        "confidence": 0.9,
+        "similarity": 0.72,
+        "exemplars": [
+            "what do you serve",
+            "what can i eat there",
+            "what kind of cuisine do you have",
+            "do you have vegetarian options",
+        ],
+    },
+    {
+        "name": "greeting",
+        "regex": r"^(hi|hello|hey)$",
+        "response": "Hello! How can I help you?",
+        "confidence": 0.9,
+        "similarity": 0.8,
+        "exemplars": [
+            "hi there",
+            "hello",
+            "good evening",
+            "hey how are you",
+        ],
+    },
+    {
+        "name": "thanks",
+        "regex": r"(thanks|thank you)",
+        "response": "You're welcome!",
+        "confidence": 0.9,
+        "similarity": 0.78,
+        "exemplars": [
+            "thanks a lot",
+            "thank you so much",
+            "that is helpful thanks",
+            "cheers",
+        ],
+    },
+]
+
+
+def load_rules(path: str) -> list[dict]:
+    """
+    Load a rule pack: a JSON file with a "patterns" list in the same shape
+    as DEFAULT_PATTERNS (name, regex, response, confidence, similarity,
+    exemplars).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+    patterns = rules["patterns"] if isinstance(rules, dict) else rules
+    for pattern in patterns:
+        re.compile(pattern["regex"])  # fail at load, not mid-call
+        pattern.setdefault("confidence", 0.9)
+        pattern.setdefault("similarity", DEFAULT_SIMILARITY)
+        pattern.setdefault("exemplars", [])
+    return patterns
+
+
+def exemplar_texts(patterns: list[dict]) -> tuple[list[str], list[int], list[float]]:
+    """
+    Exemplar utterances grouped contiguously by intent, with each intent's
+    start offset and cosine-similarity threshold.
+    """
+    exemplars: list[str] = []
+    offsets: list[int] = []
+    thresholds: list[float] = []
+    for pattern in patterns:
+        offsets.append(len(exemplars))
+        exemplars.extend(pattern.get("exemplars", []) or [pattern["name"]])
+        thresholds.append(pattern.get("similarity", DEFAULT_SIMILARITY))
+    return exemplars, offsets, thresholds
+
+
 @dataclass
 class SPLResult:
     handled: bool
     response: Optional[str] = None
     layer: Optional[int] = None
     reason: Optional[str] = None
+    # Normalized query embedding computed by Layer 2 (reused for retrieval)
+    embedding: Optional[np.ndarray] = None
+    # Matched rule's confidence (Layers 1 and 2)
+    confidence: Optional[float] = None
 
 
 class SPLEngine:
-    def __init__(self):
+    def __init__(
+        self,
+        embeddings=None,
+        patterns: Optional[list[dict]] = None,
+        exemplar_vectors: Optional[np.ndarray] = None,
+    ):
+        """
+        ``patterns`` replaces the default Layer 1/2 rule pack.
+        ``exemplar_vectors`` are precomputed exemplar embeddings (same order
+        as ``exemplar_texts(patterns)``), so loading a rule pack does not
+        re-embed its exemplars.
+        """
         self.min_length = 2
 
         # ===== Layer 0 =====
@@ -38,42 +176,120 @@ class SPLEngine:
         self.system_commands = {"repeat", "say that again", "hang up", "stop"}
 
         # ===== Layer 1 =====
-        self.patterns = [
-            {
-                "name": "opening_hours",
-                "regex": r"(what time|when).*(open|close)|\b(open|opening|close|closing)\b.*(time|hours?)",
-                "response": "We're open daily from 11:00 AM to 10:30 PM.",
-                "confidence": 0.95,
-            },
-            {
-                "name": "location",
-                "regex": r"(where|location|address).*",
-                "response": "We're located at MG Road, Bangalore.",
-                "confidence": 0.95,
-            },
-            {
-                "name": "menu",
-                "regex": r"(menu|dishes|food|items)",
-                "response": "We serve North Indian, South Indian, and Chinese cuisine.",
-                "confidence": 0.9,
-            },
-            {
-                "name": "greeting",
-                "regex": r"^(hi|hello|hey)$",
-                "response": "Hello! How can I help you?",
-                "confidence": 0.9,
-            },
-            {
-                "name": "thanks",
-                "regex": r"(thanks|thank you)",
-                "response": "You're welcome!",
-                "confidence": 0.9,
-            },
-        ]
-
-    def decide(self, text: str) -> SPLResult:
+        self.patterns = DEFAULT_PATTERNS if patterns is None else patterns
+
+        # ===== Layer 2 =====
+        self.embeddings = embeddings
+        self._exemplar_matrix: Optional[np.ndarray] = None
+        self._intent_offsets: Optional[np.ndarray] = None
+        self._intent_thresholds: Optional[np.ndarray] = None
+        self._build_exemplar_index(exemplar_vectors)
+
+    # =========================
+    # Layer 2 – Exemplar index
+    # =========================
+
+    @staticmethod
+    def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _build_exemplar_index(self, vectors: Optional[np.ndarray] = None):
+        """
+        Embed every exemplar utterance once and stack them into a single
+        matrix, grouped contiguously by intent.
+        """
+        exemplars, offsets, thresholds = exemplar_texts(self.patterns)
+
+        if vectors is None:
+            if self.embeddings is None:
+                return
+            try:
+                vectors = np.asarray(self.embeddings.embed_documents(exemplars), dtype=np.float32)
+            except Exception as e:
+                print(f"[SPL:L2] Disabled: could not embed exemplars: {e}")
+                return
+        elif len(vectors) != len(exemplars):
+            print(f"[SPL:L2] Disabled: {len(vectors)} exemplar vectors for {len(exemplars)} exemplars")
+            return
+
+        self._exemplar_matrix = self._normalize_rows(np.asarray(vectors, dtype=np.float32))
+        self._intent_offsets = np.asarray(offsets, dtype=np.intp)
+        self._intent_thresholds = np.asarray(thresholds, dtype=np.float32)
+        print(f"[SPL:L2] Indexed {len(exemplars)} exemplars for {len(offsets)} intents")
+
+    def embed_query(self, text: str) -> Optional[np.ndarray]:
+        """
+        Embed an utterance once; the normalized vector is returned on the
+        SPLResult so retrieval can reuse it.
+        """
+        if self.embeddings is None:
+            return None
+        try:
+            vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        except Exception as e:
+            print(f"[SPL:L2] Embedding failed: {e}")
+            return None
+        return self._normalize_rows(vector)
+
+    def _nearest_intent(self, query_vector: np.ndarray) -> tuple[Optional[int], float]:
+        """
+        Vectorized nearest-neighbour search: one matrix-vector product
+        over all exemplars, then the best score per intent.
+        """
+        similarities = self._exemplar_matrix @ query_vector
+        best_per_intent = np.maximum.reduceat(similarities, self._intent_offsets)
+        margins = best_per_intent - self._intent_thresholds
+        best = int(np.argmax(margins))
+        if margins[best] < 0:
+            return None, float(best_per_intent[best])
+        return best, float(best_per_intent[best])
+
+    def closest_intent(self, query_vector: Optional[np.ndarray], slack: float) -> Optional[SPLResult]:
+        """
+        Degraded-mode Layer 2: answer with the nearest intent if it is
+        within ``slack`` of its similarity threshold. Used when there is no
+        time left for the LLM.
+        """
+        if query_vector is None or self._exemplar_matrix is None:
+            return None
+        similarities = self._exemplar_matrix @ query_vector
+        best_per_intent = np.maximum.reduceat(similarities, self._intent_offsets)
+        margins = best_per_intent - (self._intent_thresholds - slack)
+        best = int(np.argmax(margins))
+        if margins[best] < 0:
+            return None
+        pattern = self.patterns[best]
+        print(f"[SPL:L2] Relaxed match: {pattern['name']} (similarity {best_per_intent[best]:.2f}, slack {slack:.2f})")
+        return SPLResult(
+            handled=True,
+            response=pattern["response"],
+            layer=2,
+            reason=f"Relaxed semantic match: {pattern['name']}",
+            embedding=query_vector,
+            confidence=pattern.get("confidence", 0.9) * float(best_per_intent[best]),
+        )
+
+    def decide(self, text: str, stt_issue: Optional[str] = None) -> SPLResult:
+        """
+        ``stt_issue`` is the transcript gate's reason the text can't be
+        trusted (see app/transcript_gate.py), if any.
+        """
         normalized = normalize_text(text)
 
+        # =========================
+        # Layer 0.0 – Unreliable transcript
+        # =========================
+        if stt_issue:
+            print(f"[SPL:L0] Rejected: unreliable transcript ({stt_issue})")
+            return SPLResult(
+                handled=True,
+                response="Sorry, I didn't catch that. Could you say it again?",
+                layer=0,
+                reason=f"Unreliable transcript: {stt_issue}",
+            )
+
         # =========================
         # Layer 0.1 – Numeric-only
         # =========================
@@ -153,14 +369,40 @@ class SPLEngine:
                     response=pattern["response"],
                     layer=1,
                     reason=f"Pattern match: {pattern['name']}",
+                    confidence=pattern.get("confidence", 0.9),
+                )
+
+        print("[SPL:L1] No decision → passing to Layer 2")
+
+        # =========================
+        # Layer 2 – Semantic intent match
+        # =========================
+        query_vector = None
+        if self._exemplar_matrix is not None:
+            query_vector = self.embed_query(text.strip())
+
+        if query_vector is not None:
+            intent, similarity = self._nearest_intent(query_vector)
+            if intent is not None:
+                pattern = self.patterns[intent]
+                print(f"[SPL:L2] Matched intent: {pattern['name']} (similarity {similarity:.2f})")
+                return SPLResult(
+                    handled=True,
+                    response=pattern["response"],
+                    layer=2,
+                    reason=f"Semantic match: {pattern['name']}",
+                    embedding=query_vector,
+                    confidence=pattern.get("confidence", 0.9) * similarity,
                 )
+            print(f"[SPL:L2] Best similarity {similarity:.2f} below threshold")
 
         # =========================
         # Final fallback
         # =========================
-        print("[SPL:L1] No decision → passing to LLM")
+        print("[SPL:L2] No decision → passing to LLM")
         return SPLResult(
             handled=False,
-            layer=1,
+            layer=2 if query_vector is not None else 1,
             reason="No pattern matched",
+            embedding=query_vector,
         )
@@ -1,31 +1,43 @@
-from faster_whisper import WhisperModel
+from typing import Union
+import numpy as np
 import os
 
-# Load the Faster Whisper model
-# You might want to make the model size configurable (e.g., 'base', 'small', 'medium', 'large')
-# For local development, 'base' or 'small' might be sufficient.
+from app.stt_engine import DecodeProfile, TranscriptionResult, get_stt_engine
+
+# Load the shared Faster Whisper engine (model size, device and language
+# come from config; see app/stt_engine.py for the decode profiles)
 try:
-    # Using a smaller model for faster local inference, adjust as needed
     # The model will be downloaded to ~/.cache/huggingface/hub if not present
-    model = WhisperModel("base", device="cpu", compute_type="int8") # Use "cuda" if you have a GPU
+    engine = get_stt_engine()
 except Exception as e:
     print(f"Error loading Faster Whisper model: {e}")
-    model = None
+    engine = None
 
-def transcribe_audio(audio_path: str) -> str:
+def transcribe_audio_result(audio: Union[str, np.ndarray], profile: Union[str, DecodeProfile, None] = None) -> TranscriptionResult:
     """
-    Transcribes an audio file using the Faster Whisper model.
+    Transcribes audio using the Faster Whisper model, keeping per-segment
+    confidence and no-speech scores.
+    ``audio`` is either a file path or a mono float32 array at 16 kHz.
+    ``profile`` names a decode profile ("accurate", "phone-fast");
+    STT_DEFAULT_PROFILE when omitted.
+    Failures are returned as a result with ``error`` set and no text.
     """
-    if model is None:
-        return "Faster Whisper model not loaded. Cannot transcribe audio."
-    if not os.path.exists(audio_path):
-        return f"Audio file not found: {audio_path}"
+    if engine is None:
+        return TranscriptionResult(text="", error="Faster Whisper model not loaded. Cannot transcribe audio.")
+    if isinstance(audio, str) and not os.path.exists(audio):
+        return TranscriptionResult(text="", error=f"Audio file not found: {audio}")
     try:
-        segments, info = model.transcribe(audio_path, beam_size=5)
-        transcribed_text = "".join([segment.text for segment in segments])
-        return transcribed_text
+        return engine.transcribe(audio, profile)
     except Exception as e:
-        return f"Error transcribing audio: {e}"
+        return TranscriptionResult(text="", error=f"Error transcribing audio: {e}")
+
+def transcribe_audio(audio: Union[str, np.ndarray], profile: Union[str, DecodeProfile, None] = None) -> str:
+    """
+    Text-only variant of ``transcribe_audio_result``: the transcript, or
+    the error message on failure.
+    """
+    result = transcribe_audio_result(audio, profile)
+    return result.error or result.text
 
 if __name__ == "__main__":
     # Simple test for transcription (requires a test audio file)
@@ -0,0 +1,204 @@
+"""
+Shared Whisper engine with named decode profiles.
+
+One WhisperModel per process serves both the request path (app.stt) and
+the local streaming path (app.stt_streaming). How a turn is decoded is
+chosen by profile instead of ad-hoc keyword arguments:
+
+- "phone-fast": greedy, fixed language, no timestamps, no temperature
+  fallback and no conditioning on previous text. Tuned for short (< 15 s)
+  phone utterances, where beam search and fallback rarely change the text.
+- "accurate": beam search with temperature fallback, fixed language.
+
+The language is always fixed (STT_LANGUAGE) so no call pays for
+language detection.
+
+Transcriptions come back as a TranscriptionResult: the text plus each
+segment's avg_logprob, no_speech_prob and compression_ratio, so callers
+can tell line noise from speech (see app.transcript_gate).
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from faster_whisper import WhisperModel
+
+from app.config import STT_COMPUTE_TYPE, STT_DEFAULT_PROFILE, STT_DEVICE, STT_LANGUAGE, STT_MODEL_SIZE
+from app.cpu_scheduler import cpu_scheduler
+
+
+@dataclass(frozen=True)
+class DecodeProfile:
+    name: str
+    beam_size: int
+    best_of: int = 1
+    temperature: Union[float, Tuple[float, ...]] = 0.0
+    without_timestamps: bool = True
+    condition_on_previous_text: bool = False
+    vad_filter: bool = True
+    vad_parameters: Dict[str, int] = field(default_factory=dict)
+    max_new_tokens: Optional[int] = None
+
+    def transcribe_kwargs(self) -> dict:
+        kwargs = {
+            "beam_size": self.beam_size,
+            "best_of": self.best_of,
+            "temperature": self.temperature,
+            "without_timestamps": self.without_timestamps,
+            "condition_on_previous_text": self.condition_on_previous_text,
+            "vad_filter": self.vad_filter,
+        }
+        if self.vad_parameters:
+            kwargs["vad_parameters"] = dict(self.vad_parameters)
+        if self.max_new_tokens:
+            kwargs["max_new_tokens"] = self.max_new_tokens
+        return kwargs
+
+
+PROFILES: Dict[str, DecodeProfile] = {
+    "phone-fast": DecodeProfile(
+        name="phone-fast",
+        beam_size=1,
+        # Short turns: tighter silence splitting, replies are a sentence or two
+        vad_parameters={"min_silence_duration_ms": 300, "speech_pad_ms": 200},
+        max_new_tokens=128,
+    ),
+    "accurate": DecodeProfile(
+        name="accurate",
+        beam_size=5,
+        best_of=5,
+        temperature=(0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        condition_on_previous_text=True,
+    ),
+}
+
+
+@dataclass(frozen=True)
+class SegmentConfidence:
+    text: str
+    start: float
+    end: float
+    avg_logprob: float  # mean token log-probability (closer to 0 = more confident)
+    no_speech_prob: float  # probability the segment holds no speech
+    compression_ratio: float  # gzip ratio of the text; high = repetitive (typical on noise)
+
+
+@dataclass
+class TranscriptionResult:
+    text: str
+    segments: List[SegmentConfidence] = field(default_factory=list)
+    duration: float = 0.0
+    error: Optional[str] = None  # set instead of raising by app.stt
+
+    def _weights(self) -> List[float]:
+        # Longer segments count more; equal weights if timestamps are degenerate
+        weights = [max(seg.end - seg.start, 0.0) for seg in self.segments]
+        return weights if sum(weights) > 0 else [1.0] * len(self.segments)
+
+    def _weighted(self, values: List[float]) -> Optional[float]:
+        if not self.segments:
+            return None
+        weights = self._weights()
+        return sum(v * w for v, w in zip(values, weights)) / sum(weights)
+
+    @property
+    def avg_logprob(self) -> Optional[float]:
+        return self._weighted([seg.avg_logprob for seg in self.segments])
+
+    @property
+    def no_speech_prob(self) -> Optional[float]:
+        return self._weighted([seg.no_speech_prob for seg in self.segments])
+
+    @property
+    def compression_ratio(self) -> Optional[float]:
+        return max((seg.compression_ratio for seg in self.segments), default=None)
+
+    def confidence(self) -> dict:
+        """
+        Turn-level scores, rounded for logs and API responses.
+        """
+        def rounded(value):
+            return None if value is None else round(value, 3)
+
+        return {
+            "avg_logprob": rounded(self.avg_logprob),
+            "no_speech_prob": rounded(self.no_speech_prob),
+            "compression_ratio": rounded(self.compression_ratio),
+            "segments": len(self.segments),
+        }
+
+
+def get_profile(profile: Union[str, DecodeProfile, None] = None) -> DecodeProfile:
+    if isinstance(profile, DecodeProfile):
+        return profile
+    name = profile or STT_DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown STT profile: {name} (available: {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+class STTEngine:
+    def __init__(
+        self,
+        model_size: str = STT_MODEL_SIZE,
+        device: str = STT_DEVICE,
+        compute_type: str = STT_COMPUTE_TYPE,
+        language: str = STT_LANGUAGE,
+    ):
+        self.model_size = model_size
+        self.language = language
+        # Loaded on the STT executor so CTranslate2's threads inherit its core set
+        self.model = cpu_scheduler.run(
+            "stt",
+            WhisperModel,
+            model_size,
+            device=device, # Use "cuda" if you have a GPU
+            compute_type=compute_type,
+            **cpu_scheduler.whisper_kwargs(),
+        )
+
+    def transcribe(
+        self,
+        audio: Union[str, np.ndarray],
+        profile: Union[str, DecodeProfile, None] = None,
+    ) -> TranscriptionResult:
+        """
+        Transcribe a file path or a mono float32 array at 16 kHz with the
+        given decode profile. Raises on failure.
+        """
+        decode = get_profile(profile)
+        segments, info = self.model.transcribe(audio, language=self.language, **decode.transcribe_kwargs())
+        kept = [
+            SegmentConfidence(
+                text=seg.text.strip(),
+                start=seg.start,
+                end=seg.end,
+                avg_logprob=seg.avg_logprob,
+                no_speech_prob=seg.no_speech_prob,
+                compression_ratio=seg.compression_ratio,
+            )
+            for seg in segments
+            if seg.text.strip()
+        ]
+        return TranscriptionResult(
+            text=" ".join(seg.text for seg in kept),
+            segments=kept,
+            duration=info.duration,
+        )
+
+
+_engine: Optional[STTEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_stt_engine() -> STTEngine:
+    """
+    Process-wide engine (the Whisper model is loaded once).
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = STTEngine()
+        return _engine
@@ -2,7 +2,9 @@
 
 import numpy as np
 import logging
-from faster_whisper import WhisperModel
+from typing import Optional, Union
+
+from app.stt_engine import DecodeProfile, STTEngine, TranscriptionResult, get_stt_engine
 
 logger = logging.getLogger(__name__)
 
@@ -10,7 +12,7 @@ logger = logging.getLogger(__name__)
 class StreamingSTT:
     """
     Streaming-style STT engine that:
-    - Initializes Whisper ONCE
+    - Shares the process-wide Whisper engine (app.stt_engine)
     - Accepts incremental audio chunks
     - Produces FINAL text only on demand
 
@@ -19,17 +21,11 @@ class StreamingSTT:
 
     def __init__(
         self,
-        model_size: str = "base",
-        device: str = "cpu",
-        compute_type: str = "int8",
-        language: str = "en",
+        profile: Union[str, DecodeProfile, None] = None,
+        engine: Optional[STTEngine] = None,
     ):
-        self.model_size = model_size
-        self.device = device
-        self.compute_type = compute_type
-        self.language = language
-
-        self.model: WhisperModel | None = None
+        self.profile = profile
+        self.engine = engine
         self.audio_buffer: list[np.ndarray] = []
 
     # =========================
@@ -38,16 +34,12 @@ class StreamingSTT:
 
     def initialize(self):
         """
-        Load Whisper model once and reuse across turns.
+        Load the shared Whisper engine once and reuse across turns.
         """
-        if self.model is None:
-            logger.info(f"Loading Whisper model: {self.model_size}")
-            self.model = WhisperModel(
-                self.model_size,
-                device=self.device,
-                compute_type=self.compute_type,
-            )
-            logger.info("Whisper model loaded")
+        if self.engine is None:
+            logger.info("Loading Whisper engine")
+            self.engine = get_stt_engine()
+            logger.info(f"Whisper engine loaded ({self.engine.model_size}, language={self.engine.language})")
 
     def reset(self):
         """
@@ -78,30 +70,22 @@ class StreamingSTT:
     # Final transcription
     # =========================
 
-    def finalize(self) -> str:
+    def finalize(self, profile: Union[str, DecodeProfile, None] = None) -> TranscriptionResult:
         """
-        Transcribe all buffered audio and return FINAL text.
+        Transcribe all buffered audio and return the FINAL result (text
+        plus per-segment confidence).
+        ``profile`` overrides the decode profile for this turn.
         """
         if not self.audio_buffer:
-            return ""
+            return TranscriptionResult(text="")
 
         self.initialize()
 
         audio = np.concatenate(self.audio_buffer).astype(np.float32)
-
-        segments, _ = self.model.transcribe(
-            audio,
-            language=self.language,
-            beam_size=5,
-            vad_filter=True,
-            without_timestamps=True,
-        )
-
-        text_parts = [seg.text.strip() for seg in segments if seg.text.strip()]
-        final_text = " ".join(text_parts)
+        result = self.engine.transcribe(audio, profile or self.profile)
 
         self.reset()
-        return final_text
+        return result
 
 
 # ============================================================
@@ -0,0 +1,422 @@
+"""
+Multi-tenant knowledge bases and SPL rule packs.
+
+Each restaurant (tenant) lives in its own directory:
+
+    data/tenants/<tenant_id>/
+        tenant.json         {"name": ..., "phone_numbers": ["+15551234567", ...]}
+        knowledge_base.md   same format as data/knowledge_base.md
+        spl_rules.json      optional {"patterns": [...]}, default rules otherwise
+        index/              built by ``python -m app.tenants build``
+            <version>/      one directory per build (time_ns); newest wins
+                vectors.npy     normalized chunk embeddings (float32, N x D)
+                chunks.bin      UTF-8 chunk texts, concatenated
+                offsets.npy     N + 1 byte offsets into chunks.bin
+                exemplars.npy   embeddings of the rule pack's exemplar utterances
+                                (the default rules' when there is no spl_rules.json)
+
+Tenants are selected by the dialed number (Twilio "To") or an explicit
+tenant id. Nothing is loaded until a tenant is first used; the index files
+are memory-mapped, so loading costs milliseconds and pages are faulted in
+on demand. Loaded tenants are kept in an LRU bounded by a total memory
+budget: idle tenants are evicted (unmapped), hot tenants stay resident.
+
+An index older than its sources is rebuilt on load. A running server
+rebuilds changed tenants in the background (app.hot_reload) into a new
+version directory and swaps the loaded tenant; turns in flight keep the
+version they started with, whose files stay mapped until released.
+
+Requests without a tenant use the original single-restaurant setup
+(data/knowledge_base.md, the Chroma index and the default rules).
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from app.config import TENANT_MEMORY_BUDGET_MB, TENANTS_DIR
+from app.spl_engine import DEFAULT_PATTERNS, SPLEngine, exemplar_texts, load_rules
+
+INDEX_FILES = ("vectors.npy", "chunks.bin", "offsets.npy", "exemplars.npy")
+SOURCE_FILES = ("knowledge_base.md", "spl_rules.json")
+
+
+class TenantNotFound(Exception):
+    pass
+
+
+def normalize_phone_number(number: str) -> str:
+    """
+    "+1 (555) 123-4567" -> "+15551234567"
+    """
+    return re.sub(r"[^\d+]", "", number or "")
+
+
+# =========================
+# Index files
+# =========================
+
+def _write_atomic(path: str, write):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def source_mtime_ns(tenant_dir: str) -> int:
+    """
+    Latest modification time of a tenant's knowledge base and rule pack.
+    """
+    paths = [os.path.join(tenant_dir, name) for name in SOURCE_FILES]
+    return max((os.stat(path).st_mtime_ns for path in paths if os.path.exists(path)), default=0)
+
+
+def current_index_dir(tenant_dir: str) -> Optional[str]:
+    """
+    Newest complete index version of a tenant, or None if never built.
+    """
+    root = os.path.join(tenant_dir, "index")
+    if not os.path.isdir(root):
+        return None
+    for version in sorted((v for v in os.listdir(root) if v.isdigit()), key=int, reverse=True):
+        index_dir = os.path.join(root, version)
+        if all(os.path.exists(os.path.join(index_dir, name)) for name in INDEX_FILES):
+            return index_dir
+    return None
+
+
+def _remove_old_versions(tenant_dir: str, keep: str):
+    """
+    Delete index versions older than ``keep``. Newer ones are left alone:
+    another process sharing the directory (a second worker, or
+    ``python -m app.tenants build``) may have just built or be building
+    one. A version still mapped by a turn in flight cannot be removed on
+    Windows; it is retried after the next build.
+    """
+    root = os.path.join(tenant_dir, "index")
+    kept = int(os.path.basename(keep))
+    for version in os.listdir(root):
+        path = os.path.join(root, version)
+        if version.isdigit() and int(version) < kept and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def build_tenant_index(tenant_dir: str, embeddings=None) -> str:
+    """
+    Chunk and embed a tenant's knowledge base and rule-pack exemplars, and
+    write the memory-mappable index files into a new version directory.
+    Returns that directory.
+    """
+    from app.embedding_engine import get_embedding_engine
+    from app.vector_search import split_knowledge_base
+
+    embeddings = embeddings or get_embedding_engine()
+    version = time.time_ns()
+    with open(os.path.join(tenant_dir, "knowledge_base.md"), "r", encoding="utf-8") as f:
+        chunks = split_knowledge_base(f.read())
+    patterns = _load_patterns(tenant_dir)
+
+    vectors = SPLEngine._normalize_rows(np.asarray(embeddings.embed_documents(chunks), dtype=np.float32))
+    exemplars, _, _ = exemplar_texts(DEFAULT_PATTERNS if patterns is None else patterns)
+    exemplar_vectors = np.asarray(embeddings.embed_documents(exemplars), dtype=np.float32)
+
+    encoded = [chunk.encode("utf-8") for chunk in chunks]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(chunk) for chunk in encoded])
+
+    # Versions are named by build start, so sources edited mid-build count as newer
+    index_dir = os.path.join(tenant_dir, "index", str(version))
+    os.makedirs(index_dir, exist_ok=True)
+    _write_atomic(os.path.join(index_dir, "vectors.npy"), lambda f: np.save(f, vectors))
+    _write_atomic(os.path.join(index_dir, "chunks.bin"), lambda f: f.write(b"".join(encoded)))
+    _write_atomic(os.path.join(index_dir, "offsets.npy"), lambda f: np.save(f, offsets))
+    _write_atomic(os.path.join(index_dir, "exemplars.npy"), lambda f: np.save(f, exemplar_vectors))
+    logger.info(f"[TENANT] Built index for {os.path.basename(tenant_dir)}: {len(chunks)} chunks")
+    return index_dir
+
+
+def _load_patterns(tenant_dir: str) -> Optional[List[dict]]:
+    rules_path = os.path.join(tenant_dir, "spl_rules.json")
+    return load_rules(rules_path) if os.path.exists(rules_path) else None
+
+
+class TenantIndex:
+    """
+    Read-only, memory-mapped chunk index with brute-force cosine search.
+    """
+
+    def __init__(self, index_dir: str):
+        self.index_dir = index_dir
+        self.vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(index_dir, "offsets.npy"), mmap_mode="r")
+        texts_path = os.path.join(index_dir, "chunks.bin")
+        # An empty knowledge base writes an empty file, which can't be mapped
+        if os.path.getsize(texts_path):
+            self.texts = np.memmap(texts_path, dtype=np.uint8, mode="r")
+        else:
+            self.texts = np.zeros(0, dtype=np.uint8)
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.offsets.nbytes + self.texts.nbytes
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def chunk(self, i: int) -> str:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return bytes(self.texts[start:end]).decode("utf-8")
+
+    def search(self, query_vector: np.ndarray, k: int) -> List[str]:
+        """
+        Top-``k`` chunks for a normalized query vector, best first.
+        """
+        k = min(k, len(self.vectors))
+        if k <= 0:
+            return []
+        scores = self.vectors @ query_vector
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [self.chunk(i) for i in top[np.argsort(-scores[top])]]
+
+
+@dataclass
+class Tenant:
+    tenant_id: str
+    name: str
+    index: TenantIndex
+    spl_engine: SPLEngine
+    nbytes: int
+
+
+# =========================
+# Store
+# =========================
+
+class TenantStore:
+    def __init__(
+        self,
+        root: str = TENANTS_DIR,
+        memory_budget_mb: float = TENANT_MEMORY_BUDGET_MB,
+        embeddings=None,
+    ):
+        self.root = root
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self._embeddings = embeddings
+
+        self._routes: Dict[str, str] = {}
+        self._tenant_ids: set = set()
+        self._loaded: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._resident_bytes = 0
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+        self.loads = 0
+        self.evictions = 0
+        self.refresh_routes()
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            from app.embedding_engine import get_embedding_engine
+
+            self._embeddings = get_embedding_engine()
+        return self._embeddings
+
+    def refresh_routes(self):
+        """
+        Scan tenant.json files for dialed-number routes (no indexes loaded).
+        """
+        routes, tenant_ids = {}, set()
+        if os.path.isdir(self.root):
+            for tenant_id in sorted(os.listdir(self.root)):
+                manifest_path = os.path.join(self.root, tenant_id, "tenant.json")
+                if not os.path.exists(manifest_path):
+                    continue
+                try:
+                    with open(manifest_path, "r", encoding="utf-8") as f:
+                        manifest = json.load(f)
+                except (OSError, ValueError) as e:
+                    logger.error(f"[TENANT] Skipping {tenant_id}: bad tenant.json: {e}")
+                    continue
+                tenant_ids.add(tenant_id)
+                for number in manifest.get("phone_numbers", []):
+                    routes[normalize_phone_number(number)] = tenant_id
+        with self._lock:
+            self._routes = routes
+            self._tenant_ids = tenant_ids
+        logger.info(f"[TENANT] {len(tenant_ids)} tenants, {len(routes)} phone numbers")
+
+    def tenant_ids(self) -> List[str]:
+        return sorted(self._tenant_ids)
+
+    def resolve(self, tenant_id: Optional[str] = None, phone_number: Optional[str] = None) -> Optional[str]:
+        """
+        Tenant for a request: an explicit ``tenant_id`` wins, then the dialed
+        number. Returns None for the default (single-restaurant) setup and
+        raises TenantNotFound for an unknown explicit id.
+        """
+        if tenant_id:
+            if tenant_id not in self._tenant_ids:
+                raise TenantNotFound(f"Unknown tenant: {tenant_id}")
+            return tenant_id
+        if phone_number:
+            return self._routes.get(normalize_phone_number(phone_number))
+        return None
+
+    def get(self, tenant_id: str) -> Tenant:
+        """
+        Loaded tenant, mapping its index on first use (LRU-tracked).
+        """
+        with self._lock:
+            tenant = self._loaded.get(tenant_id)
+            if tenant is not None:
+                self._loaded.move_to_end(tenant_id)
+                return tenant
+            if tenant_id not in self._tenant_ids:
+                raise TenantNotFound(f"Unknown tenant: {tenant_id}")
+            load_lock = self._load_locks.setdefault(tenant_id, threading.Lock())
+
+        # Load outside the store lock; concurrent first calls wait for one load
+        with load_lock:
+            with self._lock:
+                tenant = self._loaded.get(tenant_id)
+            if tenant is None:
+                tenant = self._load(tenant_id)
+                with self._lock:
+                    self._loaded[tenant_id] = tenant
+                    self._resident_bytes += tenant.nbytes
+                    self._evict(keep=tenant_id)
+            return tenant
+
+    def reload(self, tenant_id: str) -> bool:
+        """
+        Rebuild a tenant's index and rules from its sources. A loaded tenant
+        is replaced in one step; turns in flight keep the old version.
+        Returns whether the tenant was loaded (and so swapped).
+        """
+        tenant_dir = os.path.join(self.root, tenant_id)
+        with self._lock:
+            if tenant_id not in self._tenant_ids:
+                raise TenantNotFound(f"Unknown tenant: {tenant_id}")
+            load_lock = self._load_locks.setdefault(tenant_id, threading.Lock())
+
+        # Build before taking the load lock: first calls are not held up meanwhile
+        try:
+            index_dir = build_tenant_index(tenant_dir, self.embeddings)
+        except FileNotFoundError:
+            # Another process finished a newer build and removed ours mid-write
+            index_dir = current_index_dir(tenant_dir)
+            if index_dir is None:
+                raise
+            logger.info(f"[TENANT] {tenant_id}: using the newer index {os.path.basename(index_dir)} built elsewhere")
+        with load_lock:
+            with self._lock:
+                swap = tenant_id in self._loaded
+            if swap:
+                tenant = self._load(tenant_id, index_dir)
+                index_dir = tenant.index.index_dir
+                with self._lock:
+                    previous = self._loaded.pop(tenant_id, None)
+                    if previous is not None:
+                        self._resident_bytes -= previous.nbytes
+                    self._loaded[tenant_id] = tenant
+                    self._resident_bytes += tenant.nbytes
+                    self._evict(keep=tenant_id)
+        _remove_old_versions(tenant_dir, keep=index_dir)
+        return swap
+
+    def _load(self, tenant_id: str, index_dir: Optional[str] = None) -> Tenant:
+        try:
+            return self._load_version(tenant_id, index_dir)
+        except FileNotFoundError as e:
+            # Another process replaced this version meanwhile: load the newest
+            logger.warning(f"[TENANT] {tenant_id}: index version gone ({e}); loading the current one")
+            return self._load_version(tenant_id)
+
+    def _load_version(self, tenant_id: str, index_dir: Optional[str] = None) -> Tenant:
+        start = time.perf_counter()
+        tenant_dir = os.path.join(self.root, tenant_id)
+        index_dir = index_dir or current_index_dir(tenant_dir)
+        if index_dir is None or int(os.path.basename(index_dir)) < source_mtime_ns(tenant_dir):
+            index_dir = build_tenant_index(tenant_dir, self.embeddings)
+
+        with open(os.path.join(tenant_dir, "tenant.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        index = TenantIndex(index_dir)
+        patterns = _load_patterns(tenant_dir)
+        exemplar_vectors = np.load(os.path.join(index_dir, "exemplars.npy"), mmap_mode="r")
+        exemplars, _, _ = exemplar_texts(DEFAULT_PATTERNS if patterns is None else patterns)
+        if len(exemplar_vectors) != len(exemplars):
+            # Index built by an older version (or for other default rules): embed at load
+            logger.warning(f"[TENANT] {tenant_id}: exemplar index does not match the rules; embedding exemplars")
+            exemplar_vectors = None
+        spl_engine = SPLEngine(embeddings=self.embeddings, patterns=patterns, exemplar_vectors=exemplar_vectors)
+        exemplar_bytes = spl_engine._exemplar_matrix.nbytes if spl_engine._exemplar_matrix is not None else 0
+
+        self.loads += 1
+        tenant = Tenant(
+            tenant_id=tenant_id,
+            name=manifest.get("name", tenant_id),
+            index=index,
+            spl_engine=spl_engine,
+            nbytes=index.nbytes + exemplar_bytes,
+        )
+        logger.info(
+            f"[TENANT] Loaded {tenant_id} in {(time.perf_counter() - start) * 1000:.1f} ms "
+            f"({len(index)} chunks, {tenant.nbytes / 1024:.0f} KiB)"
+        )
+        return tenant
+
+    def _evict(self, keep: str):
+        """
+        Drop least recently used tenants until within the memory budget
+        (caller holds the lock). The tenant just loaded is never evicted.
+        """
+        while self._resident_bytes > self.memory_budget and len(self._loaded) > 1:
+            tenant_id = next(iter(self._loaded))
+            if tenant_id == keep:
+                break
+            tenant = self._loaded.pop(tenant_id)
+            self._resident_bytes -= tenant.nbytes
+            self.evictions += 1
+            logger.info(f"[TENANT] Evicted {tenant_id} ({tenant.nbytes / 1024:.0f} KiB)")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "tenants": len(self._tenant_ids),
+                "loaded": list(self._loaded),
+                "resident_bytes": self._resident_bytes,
+                "memory_budget": self.memory_budget,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+tenant_store = TenantStore()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build tenant indexes")
+    parser.add_argument("command", choices=["build", "list"])
+    parser.add_argument("tenants", nargs="*", help="Tenant ids (default: all)")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for tenant_id in tenant_store.tenant_ids():
+            print(tenant_id)
+    else:
+        for tenant_id in args.tenants or tenant_store.tenant_ids():
+            tenant_dir = os.path.join(tenant_store.root, tenant_id)
+            _remove_old_versions(tenant_dir, keep=build_tenant_index(tenant_dir))
@@ -0,0 +1,125 @@
+"""
+Confidence gate between STT and the LLM.
+
+Whisper will transcribe line noise, hold music or a cough into confident-
+looking words, which then go through SPL and often retrieval + the LLM.
+The gate looks at the turn's TranscriptionResult scores (see
+app.stt_engine) and flags a turn as unreliable when:
+
+- "no speech":         nothing transcribed, or the duration-weighted
+                       no_speech_prob >= STT_NO_SPEECH_THRESHOLD *and*
+                       avg_logprob < STT_MIN_AVG_LOGPROB (Whisper's own
+                       silence rule; a high no_speech_prob alone is common
+                       on short, clear answers like "yes")
+- "low confidence":    the duration-weighted avg_logprob < STT_MIN_AVG_LOGPROB
+- "repetitive output": a segment's compression_ratio > STT_MAX_COMPRESSION_RATIO
+                       (Whisper's usual hallucination loop on noise)
+
+Flagged turns are answered by SPL Layer 0 ("didn't catch that", see
+``SPLEngine.decide(stt_issue=...)``) with no retrieval or generation.
+The defaults are Whisper's own thresholds, combined the way Whisper
+combines them.
+
+The share of LLM calls saved is reported at /metrics: gated turns with
+text (which would otherwise have gone on past SPL Layer 0) over those
+plus the LLM calls actually made. It is an upper bound, since SPL
+Layers 1–2 might have answered some of the gated turns.
+"""
+
+import threading
+from collections import Counter
+from typing import Optional
+
+from loguru import logger
+
+from app.config import STT_GATE_ENABLED, STT_MAX_COMPRESSION_RATIO, STT_MIN_AVG_LOGPROB, STT_NO_SPEECH_THRESHOLD
+
+REASONS = ("no speech", "low confidence", "repetitive output")
+
+
+class TranscriptGate:
+    def __init__(
+        self,
+        enabled: bool = STT_GATE_ENABLED,
+        min_avg_logprob: float = STT_MIN_AVG_LOGPROB,
+        no_speech_threshold: float = STT_NO_SPEECH_THRESHOLD,
+        max_compression_ratio: float = STT_MAX_COMPRESSION_RATIO,
+    ):
+        self.enabled = enabled
+        self.min_avg_logprob = min_avg_logprob
+        self.no_speech_threshold = no_speech_threshold
+        self.max_compression_ratio = max_compression_ratio
+
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.gated: Counter = Counter({reason: 0 for reason in REASONS})
+        self.llm_calls = 0
+        self.llm_calls_saved = 0
+
+    def issue(self, result) -> Optional[str]:
+        """
+        Why ``result`` (a TranscriptionResult) is unreliable, or None.
+        """
+        if not result.text.strip() or result.no_speech_prob is None:
+            return "no speech"
+        low_confidence = result.avg_logprob < self.min_avg_logprob
+        if low_confidence and result.no_speech_prob >= self.no_speech_threshold:
+            return "no speech"
+        if low_confidence:
+            return "low confidence"
+        if result.compression_ratio > self.max_compression_ratio:
+            return "repetitive output"
+        return None
+
+    def check(self, result) -> Optional[str]:
+        """
+        Gate one turn: the reason to skip the LLM, or None to go on.
+        Counted for the saved-calls report.
+        """
+        issue = self.issue(result) if self.enabled else None
+        with self._lock:
+            self.turns += 1
+            if issue is not None:
+                self.gated[issue] += 1
+                if len(result.text.strip()) >= 2:
+                    self.llm_calls_saved += 1
+        if issue is not None:
+            logger.info(f"[STT-GATE] {issue}: {result.text!r} {result.confidence()}")
+        return issue
+
+    def record_llm_call(self):
+        with self._lock:
+            self.llm_calls += 1
+
+    def saved_share(self) -> float:
+        with self._lock:
+            total = self.llm_calls + self.llm_calls_saved
+            return self.llm_calls_saved / total if total else 0.0
+
+    def metrics_text(self) -> str:
+        with self._lock:
+            turns, gated = self.turns, dict(self.gated)
+            llm_calls, saved = self.llm_calls, self.llm_calls_saved
+        lines = [
+            "# HELP voice_stt_turns_total Transcribed turns checked by the confidence gate.",
+            "# TYPE voice_stt_turns_total counter",
+            f"voice_stt_turns_total {turns}",
+            "# HELP voice_stt_gated_total Turns answered without retrieval or generation, by reason.",
+            "# TYPE voice_stt_gated_total counter",
+        ]
+        lines += [f'voice_stt_gated_total{{reason="{r}"}} {n}' for r, n in sorted(gated.items())]
+        lines += [
+            "# HELP voice_llm_calls_total LLM generations run.",
+            "# TYPE voice_llm_calls_total counter",
+            f"voice_llm_calls_total {llm_calls}",
+            "# HELP voice_llm_calls_saved_total Gated turns with text that would otherwise have passed SPL Layer 0.",
+            "# TYPE voice_llm_calls_saved_total counter",
+            f"voice_llm_calls_saved_total {saved}",
+            "# HELP voice_llm_calls_saved_ratio Saved / (saved + run); an upper bound.",
+            "# TYPE voice_llm_calls_saved_ratio gauge",
+            f"voice_llm_calls_saved_ratio {self.saved_share():.4f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+transcript_gate = TranscriptGate()
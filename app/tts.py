@@ -1,6 +1,14 @@
 from TTS.api import TTS
+from typing import Optional
+import numpy as np
+import threading
+import wave
+import io
 import os
 
+from app.cpu_scheduler import cpu_scheduler
+from app.load_controller import QUALITY_LEVELS
+
 # Define the path for saving audio files
 AUDIO_OUTPUT_DIR = "audio_output"
 
@@ -11,28 +19,81 @@ if not os.path.exists(AUDIO_OUTPUT_DIR):
 # Load the TTS model
 # You might need to specify a model name, e.g., "tts_models/en/ljspeech/tacotron2-DDC"
 # For simplicity, we'll use a default or a common one if available.
+DEFAULT_TTS_MODEL = "tts_models/en/ljspeech/tacotron2-DDC"
+
+cpu_scheduler.configure_torch()
+
 try:
     # This will download the model if not already present
-    tts_model = TTS(model_name="tts_models/en/ljspeech/tacotron2-DDC", progress_bar=False, gpu=False)
+    tts_model = TTS(model_name=DEFAULT_TTS_MODEL, progress_bar=False, gpu=False)
 except Exception as e:
     print(f"Error loading TTS model: {e}")
     tts_model = None
 
-def synthesize_speech(text: str, output_filename: str) -> str:
+# Alternative models (e.g. a lighter voice under load)
+_tts_models = {DEFAULT_TTS_MODEL: tts_model}
+_tts_models_lock = threading.Lock()
+
+def get_tts_model(model_name: Optional[str] = None):
+    """
+    Returns the loaded TTS model for ``model_name`` (default model if omitted),
+    loading and caching it on first use (the quality-level voices are
+    preloaded at import). Returns None if it cannot be loaded.
+    """
+    if not model_name or model_name == DEFAULT_TTS_MODEL:
+        return tts_model
+    with _tts_models_lock:
+        if model_name not in _tts_models:
+            try:
+                _tts_models[model_name] = TTS(model_name=model_name, progress_bar=False, gpu=False)
+            except Exception as e:
+                print(f"Error loading TTS model {model_name}: {e}")
+                _tts_models[model_name] = None
+        return _tts_models[model_name]
+
+# Preload every voice the load controller can switch to, so stepping down
+# under load never loads (or downloads) a model on the TTS worker
+for _level in QUALITY_LEVELS:
+    get_tts_model(_level.tts_model)
+
+def synthesize_speech(text: str, output_filename: str, model_name: Optional[str] = None) -> str:
     """
     Synthesizes speech from text and saves it to an audio file.
     Returns the path to the saved audio file.
+    ``model_name`` selects an alternative Coqui model (falls back to the default).
     """
-    if tts_model is None:
+    model = get_tts_model(model_name) or tts_model
+    if model is None:
         return "TTS model not loaded. Cannot synthesize speech."
 
     output_path = os.path.join(AUDIO_OUTPUT_DIR, output_filename)
     try:
-        tts_model.tts_to_file(text=text, file_path=output_path)
+        model.tts_to_file(text=text, file_path=output_path)
         return output_path
     except Exception as e:
         return f"Error synthesizing speech: {e}"
 
+def synthesize_to_wav_bytes(text: str, model_name: Optional[str] = None) -> bytes:
+    """
+    Synthesizes speech in memory and returns a complete 16-bit PCM WAV file.
+    Raises on failure (used by streaming callers that report errors themselves).
+    """
+    model = get_tts_model(model_name) or tts_model
+    if model is None:
+        raise RuntimeError("TTS model not loaded. Cannot synthesize speech.")
+
+    audio = np.asarray(model.tts(text=text), dtype=np.float32)
+    sample_rate = model.synthesizer.output_sample_rate
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype("<i2")
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
 if __name__ == "__main__":
     # Simple test for speech synthesis
     print("TTS module created. Testing synthesize_speech...")
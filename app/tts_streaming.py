@@ -1,9 +1,43 @@
 import re
+import time
+import queue
+import asyncio
+import threading
 import numpy as np
-from typing import List, Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
 
 from TTS.api import TTS
 
+from app.config import TTS_XTTS_SPEAKER, TTS_XTTS_SPEAKER_WAV, TTS_XTTS_STREAM_CHUNK_SIZE
+from app.cpu_scheduler import cpu_scheduler
+
+_END = object()  # end of a sentence's chunk queue
+
+
+@dataclass
+class SynthesisStats:
+    """
+    Per-sentence timing: time to first chunk, total render time and the
+    audio duration produced (rtf < 1 = faster than real time).
+    """
+    chars: int
+    first_chunk_s: float
+    total_s: float
+    audio_s: float
+
+    @property
+    def rtf(self) -> float:
+        return self.total_s / self.audio_s if self.audio_s else float("inf")
+
+
+def _to_numpy(wav) -> np.ndarray:
+    if hasattr(wav, "detach"):  # torch tensor
+        wav = wav.detach().cpu().numpy()
+    return np.asarray(wav, dtype=np.float32).reshape(-1)
+
 class StreamingTTS:
     """
     XTTS-v2 based sentence-level TTS.
@@ -11,6 +45,10 @@ class StreamingTTS:
     - CPU-first
     - Load model once, reuse
     - Future-safe for Twilio / WebRTC
+    - Pipelined: sentence N+1 renders while sentence N plays
+    - Speaker conditioning latents computed once per voice and cached
+    - Chunked: with ``chunked=True`` audio is yielded while a sentence is
+      still being generated (XTTS ``inference_stream``)
     """
 
     def __init__(
@@ -19,16 +57,39 @@ class StreamingTTS:
         language: str = "en",
         device: str = "cpu",
         debug_save_wav: bool = False,
+        speaker: Optional[str] = TTS_XTTS_SPEAKER,
+        speaker_wav: Optional[str] = TTS_XTTS_SPEAKER_WAV,
+        chunked: bool = True,
+        stream_chunk_size: int = TTS_XTTS_STREAM_CHUNK_SIZE,
     ):
         self.language = language
         self.debug_save_wav = debug_save_wav
+        self.speaker = speaker
+        self.speaker_wav = speaker_wav or None
+        self.chunked = chunked
+        self.stream_chunk_size = stream_chunk_size
 
         # Load once
+        cpu_scheduler.configure_torch()
         self.tts = TTS(
             model_name=model_name,
             progress_bar=False,
             gpu=(device != "cpu"),
         )
+        # The underlying Xtts model (None for non-XTTS models)
+        self.xtts = getattr(getattr(self.tts, "synthesizer", None), "tts_model", None)
+        if not hasattr(self.xtts, "get_conditioning_latents"):
+            self.xtts = None
+
+        # voice key -> (gpt_cond_latent, speaker_embedding)
+        self._latents: Dict[Tuple, Tuple] = {}
+        self._latents_lock = threading.Lock()
+        self.stats: Deque[SynthesisStats] = deque(maxlen=256)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # The scheduler's TTS executor has a single worker: the model is not
+        # thread-safe, so every sentence is rendered on that thread, in order
+        return cpu_scheduler.executor("tts")
 
     # -------------------------
     # Sentence handling
@@ -46,6 +107,43 @@ class StreamingTTS:
         sentences = re.split(r"(?<=[.!?])\s+", text)
         return [s.strip() for s in sentences if s.strip()]
 
+    # -------------------------
+    # Speaker conditioning
+    # -------------------------
+
+    def _voice_key(self, speaker: Optional[str], speaker_wav: Optional[str]) -> Tuple:
+        if speaker_wav:
+            return ("wav", speaker_wav)
+        return ("speaker", speaker)
+
+    def conditioning_latents(
+        self,
+        speaker: Optional[str] = None,
+        speaker_wav: Optional[str] = None,
+    ) -> Tuple:
+        """
+        (gpt_cond_latent, speaker_embedding) for a voice, computed once.
+        A ``speaker_wav`` reference clip (voice cloning) takes precedence
+        over a built-in ``speaker`` name; an unknown name raises ValueError.
+        """
+        speaker = speaker or self.speaker
+        speaker_wav = speaker_wav or self.speaker_wav
+        key = self._voice_key(speaker, speaker_wav)
+        with self._latents_lock:
+            if key not in self._latents:
+                start = time.perf_counter()
+                if speaker_wav:
+                    latents = self.xtts.get_conditioning_latents(audio_path=[speaker_wav])
+                else:
+                    speakers = self.xtts.speaker_manager.speakers
+                    if speaker not in speakers:
+                        raise ValueError(f"Unknown XTTS speaker {speaker!r}; available: {', '.join(sorted(speakers))}")
+                    voice = speakers[speaker]
+                    latents = (voice["gpt_cond_latent"], voice["speaker_embedding"])
+                self._latents[key] = latents
+                print(f"[TTS] Conditioning latents for {key[1]}: {time.perf_counter() - start:.2f}s (cached)")
+            return self._latents[key]
+
     # -------------------------
     # Synthesis
     # -------------------------
@@ -63,13 +161,15 @@ class StreamingTTS:
         if not sentence:
             return None
 
-        wav = self.tts.tts(
-            text=sentence,
-            language=self.language,
-            speaker_wav=None,  # no voice cloning for now
-        )
-
-        audio = np.array(wav, dtype=np.float32)
+        start = time.perf_counter()
+        if self.xtts is not None:
+            gpt_cond_latent, speaker_embedding = self.conditioning_latents()
+            out = self.xtts.inference(sentence, self.language, gpt_cond_latent, speaker_embedding)
+            audio = _to_numpy(out["wav"])
+        else:
+            audio = _to_numpy(self.tts.tts(text=sentence, language=self.language))
+        elapsed = time.perf_counter() - start
+        self.stats.append(SynthesisStats(len(sentence), elapsed, elapsed, len(audio) / sample_rate))
 
         if self.debug_save_wav:
             from scipy.io.wavfile import write
@@ -77,6 +177,186 @@ class StreamingTTS:
 
         return audio
 
+    def stream_sentence(
+        self,
+        sentence: str,
+        sample_rate: int = 24000,
+        cancelled: Optional[threading.Event] = None,
+    ) -> Iterator[np.ndarray]:
+        """
+        Yield a sentence's audio in chunks as XTTS generates it
+        (``stream_chunk_size`` GPT tokens per chunk). Falls back to one
+        chunk for models without streaming inference.
+        """
+        if not sentence:
+            return
+        if self.xtts is None or not hasattr(self.xtts, "inference_stream"):
+            audio = self.synthesize_sentence(sentence, sample_rate)
+            if audio is not None:
+                yield audio
+            return
+
+        gpt_cond_latent, speaker_embedding = self.conditioning_latents()
+        start = time.perf_counter()
+        first_chunk = None
+        samples = 0
+        chunks = self.xtts.inference_stream(
+            sentence,
+            self.language,
+            gpt_cond_latent,
+            speaker_embedding,
+            stream_chunk_size=self.stream_chunk_size,
+        )
+        for chunk in chunks:
+            if cancelled is not None and cancelled.is_set():
+                break
+            audio = _to_numpy(chunk)
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            samples += len(audio)
+            yield audio
+        total = time.perf_counter() - start
+        self.stats.append(SynthesisStats(len(sentence), first_chunk or total, total, samples / sample_rate))
+
+    def _render_chunks(self, sentence: str, sample_rate: int, put, cancelled: threading.Event):
+        # Runs on the TTS worker; ``put`` hands chunks to the consumer
+        try:
+            for audio in self.stream_sentence(sentence, sample_rate, cancelled):
+                put(audio)
+        finally:
+            put(_END)
+
+    def _submit(self, sentence: str, sample_rate: int) -> Future:
+        return self._get_executor().submit(
+            self.synthesize_sentence, sentence, sample_rate
+        )
+
+    def _submit_sentence(self, sentence: str, sample_rate: int, cancelled: threading.Event):
+        """
+        Queue a sentence on the worker. Returns (future, chunk queue); the
+        queue is None when rendering whole sentences.
+        """
+        if not self.chunked:
+            return self._submit(sentence, sample_rate), None
+        chunks = queue.Queue()
+        future = self._get_executor().submit(
+            self._render_chunks, sentence, sample_rate, chunks.put, cancelled
+        )
+        return future, chunks
+
+    def stream(
+        self,
+        text: str,
+        sample_rate: int = 24000,
+        lookahead: int = 1,
+    ) -> Iterator[np.ndarray]:
+        """
+        Yield audio as soon as it is ready: whole sentences, or chunks of
+        a sentence while it is still generating when ``chunked``.
+
+        While the caller plays or transmits sentence N, up to ``lookahead``
+        following sentences are queued on the worker, so memory stays
+        bounded regardless of reply length.
+        """
+        sentences = iter(self.split_sentences(text))
+        pending: Deque[Tuple[Future, Optional[queue.Queue]]] = deque()
+        cancelled = threading.Event()
+
+        for _ in range(lookahead + 1):
+            sentence = next(sentences, None)
+            if sentence is None:
+                break
+            pending.append(self._submit_sentence(sentence, sample_rate, cancelled))
+
+        try:
+            while pending:
+                future, chunks = pending.popleft()
+
+                sentence = next(sentences, None)
+                if sentence is not None:
+                    pending.append(self._submit_sentence(sentence, sample_rate, cancelled))
+
+                if chunks is None:
+                    audio = future.result()
+                    if audio is not None:
+                        yield audio
+                    continue
+                while (audio := chunks.get()) is not _END:
+                    yield audio
+                future.result()  # re-raise render errors
+        finally:
+            # Consumer stopped early (barge-in, hang-up): stop the sentence
+            # being rendered and drop queued work
+            cancelled.set()
+            for future, _ in pending:
+                future.cancel()
+
+    async def astream(
+        self,
+        text: str,
+        sample_rate: int = 24000,
+        lookahead: int = 1,
+    ) -> AsyncIterator[np.ndarray]:
+        """
+        Async-iterator variant of ``stream`` for event-loop callers.
+        Synthesis runs on the worker thread; the loop is never blocked.
+        """
+        loop = asyncio.get_running_loop()
+        sentences = iter(self.split_sentences(text))
+        pending: Deque[Tuple[asyncio.Future, Optional[asyncio.Queue]]] = deque()
+        cancelled = threading.Event()
+
+        def submit(sentence: str):
+            if not self.chunked:
+                return asyncio.wrap_future(self._submit(sentence, sample_rate)), None
+            chunks = asyncio.Queue()
+            future = self._get_executor().submit(
+                self._render_chunks, sentence, sample_rate,
+                lambda audio: loop.call_soon_threadsafe(chunks.put_nowait, audio), cancelled,
+            )
+            return asyncio.wrap_future(future), chunks
+
+        for _ in range(lookahead + 1):
+            sentence = next(sentences, None)
+            if sentence is None:
+                break
+            pending.append(submit(sentence))
+
+        try:
+            while pending:
+                future, chunks = pending.popleft()
+
+                sentence = next(sentences, None)
+                if sentence is not None:
+                    pending.append(submit(sentence))
+
+                if chunks is None:
+                    audio = await future
+                    if audio is not None:
+                        yield audio
+                    continue
+                while (audio := await chunks.get()) is not _END:
+                    yield audio
+                await future
+        finally:
+            cancelled.set()
+            for future, _ in pending:
+                future.cancel()
+
+    def stats_summary(self) -> Dict[str, float]:
+        """
+        Median time to first chunk and real-time factor over recent sentences.
+        """
+        if not self.stats:
+            return {}
+        first = sorted(s.first_chunk_s for s in self.stats)
+        rtf = sorted(s.rtf for s in self.stats)
+        return {
+            "sentences": len(self.stats),
+            "ttfc_s": first[len(first) // 2],
+            "rtf": rtf[len(rtf) // 2],
+        }
+
     def synthesize(
         self,
         text: str,
@@ -86,13 +366,4 @@ class StreamingTTS:
         Sentence-by-sentence synthesis.
         Returns list of float32 audio chunks.
         """
-
-        sentences = self.split_sentences(text)
-        audio_chunks: List[np.ndarray] = []
-
-        for sentence in sentences:
-            audio = self.synthesize_sentence(sentence, sample_rate)
-            if audio is not None:
-                audio_chunks.append(audio)
-
-        return audio_chunks
+        return list(self.stream(text, sample_rate))
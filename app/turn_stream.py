@@ -0,0 +1,149 @@
+"""
+Progressive turn pipeline for the streaming endpoint.
+
+Runs STT -> LLM -> TTS for one utterance and emits server-sent events as
+each piece becomes available:
+
+    event: transcript   {"text", "confidence", "stt_issue"} as soon as STT finishes
+    event: token        {"text": ...}                 each LLM token
+    event: audio        {"index", "text", "wav_base64"} each sentence, in order
+    event: done         {"reply": ..., "timings": {...}}
+    event: error        {"stage": ..., "detail": ...}
+
+Sentences are handed to TTS while the LLM is still generating the next
+one, so a client can start playback before the reply is complete.
+"""
+
+import asyncio
+import base64
+import json
+import threading
+import time
+from typing import AsyncIterator, List, Optional
+
+import numpy as np
+from loguru import logger
+
+from app.admission import admission_controller
+from app.agent import decide_for_tenant, stream_rag_response
+from app.load_controller import QualityLevel, load_controller
+from app.prompt_builder import sentence_ends
+from app.stt import transcribe_audio_result
+from app.transcript_gate import transcript_gate
+from app.tts import synthesize_to_wav_bytes
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_turn(audio: np.ndarray, quality: QualityLevel, tenant_id: Optional[str] = None) -> AsyncIterator[str]:
+    loop = asyncio.get_running_loop()
+    timings = {}
+    turn_start = time.perf_counter()
+
+    # =========================
+    # 1. STT
+    # =========================
+    with load_controller.timed("stt"):
+        transcription = await admission_controller.run("stt", transcribe_audio_result, audio, quality.stt_profile)
+    timings["transcript"] = time.perf_counter() - turn_start
+    if transcription.error:
+        logger.error(f"STT Error (stream): {transcription.error}")
+        yield sse_event("error", {"stage": "stt", "detail": transcription.error})
+        return
+    transcript = transcription.text
+    stt_issue = transcript_gate.check(transcription)
+    yield sse_event("transcript", {"text": transcript, "confidence": transcription.confidence(), "stt_issue": stt_issue})
+
+    # SPL first: its replies (incl. gated transcripts) skip the LLM executor
+    # (in a thread: the tenant lookup may load or build its index)
+    _, spl_result = await asyncio.to_thread(decide_for_tenant, transcript, tenant_id, stt_issue)
+
+    # =========================
+    # 2. LLM tokens (worker thread) -> events queue
+    # =========================
+    events: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+
+    def produce_tokens():
+        try:
+            for piece in stream_rag_response(transcript, spl_result=spl_result, max_tokens=quality.max_tokens, tenant_id=tenant_id):
+                if cancelled.is_set():
+                    break
+                loop.call_soon_threadsafe(events.put_nowait, ("token", piece))
+        except Exception as e:
+            loop.call_soon_threadsafe(events.put_nowait, ("error", {"stage": "llm", "detail": str(e)}))
+        loop.call_soon_threadsafe(events.put_nowait, ("llm_done", None))
+
+    # =========================
+    # 3. TTS per sentence (single TTS worker, completion order = sentence order)
+    # =========================
+    tts_tasks: List[asyncio.Task] = []
+
+    async def synthesize(index: int, sentence: str):
+        try:
+            wav = await admission_controller.run("tts", synthesize_to_wav_bytes, sentence, quality.tts_model)
+        except Exception as e:
+            await events.put(("error", {"stage": "tts", "detail": str(e), "index": index}))
+            return
+        if index == 0:
+            timings["first_audio"] = time.perf_counter() - turn_start
+        await events.put(("audio", {
+            "index": index,
+            "text": sentence,
+            "wav_base64": base64.b64encode(wav).decode("ascii"),
+        }))
+
+    def speak(sentence: str):
+        sentence = sentence.strip()
+        if sentence:
+            tts_tasks.append(asyncio.create_task(synthesize(len(tts_tasks), sentence)))
+
+    llm_start = time.perf_counter()
+    # An SPL reply is a single piece; don't queue it behind LLM generations
+    if spl_result.handled:
+        producer = asyncio.ensure_future(asyncio.to_thread(produce_tokens))
+    else:
+        producer = asyncio.ensure_future(admission_controller.run("llm", produce_tokens))
+    reply = ""
+    spoken_upto = 0
+    try:
+        while True:
+            kind, payload = await events.get()
+            if kind == "token":
+                if not reply:
+                    timings["first_token"] = time.perf_counter() - turn_start
+                reply += payload
+                yield sse_event("token", {"text": payload})
+                for end in sentence_ends(reply):
+                    if end > spoken_upto:
+                        speak(reply[spoken_upto:end])
+                        spoken_upto = end
+            elif kind == "audio":
+                yield sse_event("audio", payload)
+            elif kind == "error":
+                logger.error(f"Streaming turn error: {payload}")
+                yield sse_event("error", payload)
+            elif kind == "llm_done":
+                if not spl_result.handled:
+                    load_controller.record_latency("llm", time.perf_counter() - llm_start)
+                speak(reply[spoken_upto:])
+                break
+
+        tts_start = time.perf_counter()
+        await asyncio.gather(*tts_tasks)
+        if tts_tasks:
+            load_controller.record_latency("tts", time.perf_counter() - tts_start)
+        while not events.empty():
+            kind, payload = events.get_nowait()
+            yield sse_event(kind, payload)
+
+        timings["total"] = time.perf_counter() - turn_start
+        yield sse_event("done", {"reply": reply.strip(), "timings": timings})
+    finally:
+        # Client went away: stop generating and drop queued sentences
+        cancelled.set()
+        for task in tts_tasks:
+            task.cancel()
+        await asyncio.wait([producer])
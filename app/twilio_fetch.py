@@ -0,0 +1,81 @@
+import asyncio
+import numpy as np
+from typing import Optional, Tuple
+
+import httpx
+from loguru import logger
+
+from app.audio_decode import WavStreamDecoder
+from app.config import (
+    TWILIO_FETCH_MAX_CONNECTIONS,
+    TWILIO_FETCH_TIMEOUT,
+    TWILIO_RECORDING_RETRIES,
+)
+
+
+class RecordingFetcher:
+    """
+    Downloads Twilio recordings over one shared keep-alive client and
+    decodes them in memory, straight into the 16 kHz float32 array
+    Whisper consumes. Nothing touches the disk.
+
+    The client is created once (``start``) and reused across turns, so
+    later turns skip the TCP/TLS handshake. Pass ``transport`` to point
+    the fetcher at a local stand-in instead of api.twilio.com.
+    """
+
+    def __init__(
+        self,
+        auth: Optional[Tuple[str, str]] = None,
+        max_connections: int = TWILIO_FETCH_MAX_CONNECTIONS,
+        timeout: float = TWILIO_FETCH_TIMEOUT,
+        retries: int = TWILIO_RECORDING_RETRIES,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.auth = auth
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.retries = retries
+        self.transport = transport
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                auth=self.auth,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=self.transport,
+            )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def fetch_audio(self, recording_url: str) -> np.ndarray:
+        """
+        Stream ``{recording_url}.wav`` into the decoder and return the
+        decoded utterance.
+
+        Twilio can answer 404 for a moment right after a recording ends;
+        that is retried with a short backoff instead of a separate
+        metadata request before every download.
+        """
+        await self.start()
+        media_url = f"{recording_url}.wav"
+
+        for attempt in range(self.retries + 1):
+            decoder = WavStreamDecoder()
+            async with self.client.stream("GET", media_url) as response:
+                if response.status_code == 404 and attempt < self.retries:
+                    logger.info(f"Recording not ready yet ({media_url}), retrying")
+                    await asyncio.sleep(0.25 * (attempt + 1))
+                    continue
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    decoder.feed(chunk)
+            return decoder.finish()
@@ -0,0 +1,158 @@
+"""
+Streaming multipart reader for audio uploads.
+
+Starlette's form parser spools uploads into temporary files. This reader
+parses the request body chunk by chunk instead and feeds the audio part
+straight into an incremental decoder (app.audio_decode), so an upload
+becomes a 16 kHz float32 array with no file ever written. The body size
+is capped, so memory stays bounded.
+"""
+
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import numpy as np
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from app.audio_decode import SUPPORTED_UPLOAD_EXTENSIONS, decoder_for_filename
+
+
+class UploadError(Exception):
+    """
+    Invalid or oversized upload; ``status_code`` is the HTTP status to return.
+    """
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class DecodedUpload:
+    filename: str
+    audio: np.ndarray
+    bytes_received: int
+
+
+class MultipartAudioReader:
+    def __init__(self, content_type: str, field_name: str, max_bytes: int):
+        _, params = parse_options_header(content_type or "")
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise UploadError("Expected a multipart/form-data upload.")
+
+        self.field_name = field_name
+        self.max_bytes = max_bytes
+        self.bytes_received = 0
+
+        self.filename: Optional[str] = None
+        self.decoder = None
+        self._audio_done = False
+        self._error: Optional[Exception] = None
+
+        self._header_field = b""
+        self._header_value = b""
+        self._part_name: Optional[str] = None
+        self._part_filename: Optional[str] = None
+        self._in_audio_part = False
+
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    # -------------------------
+    # Parser callbacks
+    # -------------------------
+
+    def _on_part_begin(self):
+        self._part_name = None
+        self._part_filename = None
+        self._in_audio_part = False
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        if self._header_field.lower() == b"content-disposition":
+            _, options = parse_options_header(self._header_value)
+            name = options.get(b"name")
+            filename = options.get(b"filename")
+            self._part_name = name.decode("latin-1") if name else None
+            self._part_filename = filename.decode("utf-8", errors="replace") if filename else None
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        if self._part_name != self.field_name or self._audio_done:
+            return
+        filename = self._part_filename or ""
+        if not filename.lower().endswith(SUPPORTED_UPLOAD_EXTENSIONS):
+            self._error = UploadError("Invalid file format. Only WAV, MP3, OGG are supported.")
+            return
+        self.filename = filename
+        self.decoder = decoder_for_filename(filename)
+        self._in_audio_part = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._in_audio_part and self._error is None:
+            try:
+                self.decoder.feed(data[start:end])
+            except Exception as e:
+                self._error = UploadError(f"Could not decode audio: {e}")
+
+    def _on_part_end(self):
+        if self._in_audio_part:
+            self._audio_done = True
+        self._in_audio_part = False
+
+    # -------------------------
+    # Driving the parser
+    # -------------------------
+
+    def write(self, chunk: bytes):
+        self.bytes_received += len(chunk)
+        if self.bytes_received > self.max_bytes:
+            raise UploadError(f"Upload exceeds {self.max_bytes} bytes.", status_code=413)
+        self._parser.write(chunk)
+        if self._error is not None:
+            raise self._error
+
+    def finish(self) -> DecodedUpload:
+        self._parser.finalize()
+        if self._error is not None:
+            raise self._error
+        if self.decoder is None or not self._audio_done:
+            raise UploadError(f"Missing '{self.field_name}' file field.")
+        try:
+            audio = self.decoder.finish()
+        except Exception as e:
+            raise UploadError(f"Could not decode audio: {e}")
+        return DecodedUpload(self.filename, audio, self.bytes_received)
+
+
+async def read_audio_upload(
+    stream: AsyncIterator[bytes],
+    content_type: str,
+    max_bytes: int,
+    field_name: str = "audio_file",
+) -> DecodedUpload:
+    """
+    Consume a multipart request body (``request.stream()``) and return the
+    decoded audio of its ``field_name`` file part.
+    """
+    reader = MultipartAudioReader(content_type, field_name, max_bytes)
+    async for chunk in stream:
+        reader.write(chunk)
+    return reader.finish()
@@ -2,8 +2,22 @@
 import os
 from langchain_community.vectorstores import Chroma
 from langchain_text_splitters import CharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from app.config import KNOWLEDGE_BASE_PATH, CHROMA_DB_PATH
+from app.config import KNOWLEDGE_BASE_PATH, CHROMA_DB_PATH, EMBEDDING_MODEL_NAME
+from app.embedding_engine import get_embedding_engine
+
+def split_knowledge_base(knowledge_base_text: str) -> list[str]:
+    """
+    Splits a markdown knowledge base into chunks at its "## " sections.
+    """
+    text_splitter = CharacterTextSplitter(
+        separator="\n## ",
+        chunk_size=1000,
+        chunk_overlap=200,
+        length_function=len,
+        is_separator_regex=False,
+    )
+    docs = text_splitter.split_text(knowledge_base_text)
+    return [docs[0]] + ["## " + doc for doc in docs[1:]]
 
 def build_vector_index():
     """
@@ -20,23 +34,13 @@ def build_vector_index():
         print(f"Error: Knowledge base file not found at {KNOWLEDGE_BASE_PATH}")
         return
 
-    text_splitter = CharacterTextSplitter(
-        separator="\n## ",
-        chunk_size=1000,
-        chunk_overlap=200,
-        length_function=len,
-        is_separator_regex=False,
-    )
-    docs = text_splitter.split_text(knowledge_base_text)
-    docs = [docs[0]] + ["## " + doc for doc in docs[1:]]
+    docs = split_knowledge_base(knowledge_base_text)
     print(f"Split document into {len(docs)} chunks.")
 
     try:
-        # Using a popular, lightweight, and multilingual model
-        model_name = "all-MiniLM-L6-v2"
-        # The model will be downloaded automatically on the first run
-        embeddings = HuggingFaceEmbeddings(model_name=model_name)
-        print(f"Initialized local embeddings model: {model_name}")
+        # Shared engine (quantized, batched); downloaded on the first run
+        embeddings = get_embedding_engine()
+        print(f"Initialized local embeddings model: {EMBEDDING_MODEL_NAME}")
     except Exception as e:
         print(f"Error initializing local embeddings model: {e}")
         return
@@ -62,8 +66,7 @@ def load_vector_index():
         return None
     
     try:
-        model_name = "all-MiniLM-L6-v2"
-        embeddings = HuggingFaceEmbeddings(model_name=model_name)
+        embeddings = get_embedding_engine()
         vector_store = Chroma(
             persist_directory=CHROMA_DB_PATH, 
             embedding_function=embeddings
@@ -0,0 +1,128 @@
+"""
+CPU partitioning benchmark: throughput of full STT -> LLM -> TTS turns
+under mixed concurrent load.
+
+Concurrent callers each run several turns, so one call is transcribing
+while another generates and a third synthesizes. Each mode runs in its
+own subprocess, because thread counts are fixed when the models load:
+- shared:      no partitioning, every library sizes its pool to all cores
+- partitioned: disjoint core sets and thread counts per stage
+- pinned:      partitioned + CPU affinity pinning of the stage threads
+
+Reported per mode: turns/min, turn latency p50/p95 and mean time per
+stage (including queueing for the stage's executor).
+
+Run from the repo root (needs the Whisper, GGUF and Coqui models):
+    python -m benchmarks.bench_cpu_partition --callers 3 --turns 3
+    python -m benchmarks.bench_cpu_partition --audio question.wav
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MODES = {
+    "shared": {"CPU_PARTITIONING": "0", "CPU_PIN_AFFINITY": "0"},
+    "partitioned": {"CPU_PARTITIONING": "1", "CPU_PIN_AFFINITY": "0"},
+    "pinned": {"CPU_PARTITIONING": "1", "CPU_PIN_AFFINITY": "1"},
+}
+QUESTIONS = [
+    "What time do you close tonight?",
+    "Do you have vegetarian dishes?",
+    "Can I book a table for six on Saturday?",
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def measure(callers: int, turns: int, audio_path: str = None) -> dict:
+    from app.agent import get_rag_response
+    from app.audio_decode import decode_wav_bytes
+    from app.cpu_scheduler import cpu_scheduler
+    from app.stt import transcribe_audio
+    from app.tts import synthesize_to_wav_bytes
+
+    if audio_path:
+        with open(audio_path, "rb") as f:
+            utterances = [decode_wav_bytes(f.read())]
+    else:
+        # No recording given: use the TTS voice reading the questions
+        utterances = [decode_wav_bytes(synthesize_to_wav_bytes(q)) for q in QUESTIONS]
+
+    stage_times = {"stt": [], "llm": [], "tts": []}
+
+    def timed(stage, fn, *args):
+        t0 = time.perf_counter()
+        result = cpu_scheduler.run(stage, fn, *args)
+        stage_times[stage].append(time.perf_counter() - t0)
+        return result
+
+    def call(caller: int):
+        latencies = []
+        for turn in range(turns):
+            audio = utterances[(caller + turn) % len(utterances)]
+            t0 = time.perf_counter()
+            text = timed("stt", transcribe_audio, audio)
+            reply = timed("llm", get_rag_response, text)
+            timed("tts", synthesize_to_wav_bytes, reply)
+            latencies.append(time.perf_counter() - t0)
+        return latencies
+
+    call(0)  # warm-up: first inference allocates buffers and thread pools
+    for times in stage_times.values():
+        times.clear()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(callers) as pool:
+        latencies = [lat for lats in pool.map(call, range(callers)) for lat in lats]
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "cores": {stage: plan.cores for stage, plan in cpu_scheduler.plan.items()},
+        "threads": {stage: plan.threads for stage, plan in cpu_scheduler.plan.items()},
+        "turns_per_min": len(latencies) / elapsed * 60,
+        "p50_s": statistics.median(latencies),
+        "p95_s": percentile(latencies, 0.95),
+        "stage_mean_s": {stage: statistics.mean(times) for stage, times in stage_times.items()},
+    }
+
+
+def main(args):
+    print(f"{args.callers} concurrent callers x {args.turns} turns, {os.cpu_count()} CPUs")
+    print(f"{'mode':<12} {'turns/min':>9} {'p50 s':>7} {'p95 s':>7} "
+          f"{'stt s':>7} {'llm s':>7} {'tts s':>7}  threads (stt/llm/tts)")
+    for mode, env in MODES.items():
+        command = [sys.executable, "-m", "benchmarks.bench_cpu_partition", "--only", mode,
+                   "--callers", str(args.callers), "--turns", str(args.turns)]
+        if args.audio:
+            command += ["--audio", args.audio]
+        proc = subprocess.run(command, capture_output=True, text=True, env={**os.environ, **env})
+        if proc.returncode != 0:
+            print(f"{mode:<12} failed: {proc.stderr.strip().splitlines()[-1:]}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        stages = r["stage_mean_s"]
+        threads = "/".join(str(r["threads"][s]) for s in ("stt", "llm", "tts"))
+        print(f"{mode:<12} {r['turns_per_min']:>9.1f} {r['p50_s']:>7.2f} {r['p95_s']:>7.2f} "
+              f"{stages['stt']:>7.2f} {stages['llm']:>7.2f} {stages['tts']:>7.2f}  {threads}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--callers", type=int, default=3, help="Concurrent calls")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per call")
+    parser.add_argument("--audio", help="WAV utterance to use instead of synthesized questions")
+    parser.add_argument("--only", choices=list(MODES), help="Measure one mode (set via env) and print JSON")
+    args = parser.parse_args()
+    if args.only:
+        print(json.dumps(measure(args.callers, args.turns, args.audio)))
+    else:
+        main(args)
@@ -0,0 +1,132 @@
+"""
+Embedding benchmark: LangChain HuggingFaceEmbeddings vs EmbeddingEngine.
+
+Each configuration runs in its own subprocess so resident memory is
+measured in isolation. Reported per configuration:
+- load time and resident memory after load
+- sequential embed_query latency (p50 / p95), cache disabled
+- throughput with concurrent callers (dynamic batching)
+- cached-query latency
+
+Run from the repo root:
+    python -m benchmarks.bench_embeddings
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+QUERIES = [
+    "when do you guys shut tonight",
+    "do you deliver to indiranagar",
+    "can i book a table for six people on saturday",
+    "is the butter chicken spicy",
+    "what vegetarian dishes do you have",
+    "how long does delivery take",
+    "do you take reservations for large groups",
+    "are you open on sundays",
+]
+CONFIGS = ["langchain", "onnx-int8", "torch"]
+SEQUENTIAL_ROUNDS = 5
+CONCURRENT_CALLERS = 16
+
+
+def rss_mib() -> float:
+    """
+    Resident set size of this process (Linux), in MiB.
+    """
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def measure(config: str) -> dict:
+    baseline = rss_mib()
+    start = time.perf_counter()
+    if config == "langchain":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+
+        embedder = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        embed = embedder.embed_query
+        uncached = embed
+        label = config
+    else:
+        from app.embedding_engine import EmbeddingEngine
+
+        embedder = EmbeddingEngine(backend=config, cache_size=len(QUERIES))
+        embed = embedder.embed_query
+        uncached = lambda text: embedder._submit(text).result()  # bypass the cache
+        label = embedder.backend.name  # shows a fallback if ONNX Runtime is missing
+    load_time = time.perf_counter() - start
+    loaded_rss = rss_mib()
+
+    uncached(QUERIES[0])  # warm-up
+
+    latencies = []
+    for _ in range(SEQUENTIAL_ROUNDS):
+        for query in QUERIES:
+            t0 = time.perf_counter()
+            uncached(query)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    total = CONCURRENT_CALLERS * len(QUERIES)
+    with ThreadPoolExecutor(CONCURRENT_CALLERS) as pool:
+        t0 = time.perf_counter()
+        list(pool.map(lambda i: uncached(f"{QUERIES[i % len(QUERIES)]} #{i}"), range(total)))
+        throughput = total / (time.perf_counter() - t0)
+
+    for query in QUERIES:
+        embed(query)
+    cached = []
+    for query in QUERIES:
+        t0 = time.perf_counter()
+        embed(query)
+        cached.append((time.perf_counter() - t0) * 1000)
+
+    return {
+        "config": label,
+        "load_s": load_time,
+        "rss_mib": loaded_rss - baseline,
+        "peak_rss_mib": rss_mib() - baseline,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 0.95),
+        "throughput_qps": throughput,
+        "cached_ms": statistics.median(cached),
+    }
+
+
+def main():
+    print(f"{'config':<10} {'load s':>7} {'RSS MiB':>8} {'peak MiB':>9} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'qps@' + str(CONCURRENT_CALLERS):>8} {'cached ms':>10}")
+    for config in CONFIGS:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_embeddings", "--only", config],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"{config:<10} failed: {proc.stderr.strip().splitlines()[-1:]}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{r['config']:<10} {r['load_s']:>7.1f} {r['rss_mib']:>8.0f} {r['peak_rss_mib']:>9.0f} "
+              f"{r['p50_ms']:>7.1f} {r['p95_ms']:>7.1f} {r['throughput_qps']:>8.0f} {r['cached_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--only", choices=CONFIGS, help="Measure one configuration and print JSON")
+    args = parser.parse_args()
+    if args.only:
+        print(json.dumps(measure(args.only)))
+    else:
+        main()
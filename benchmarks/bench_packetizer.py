@@ -0,0 +1,85 @@
+"""
+Outbound packetizer benchmark.
+
+Feeds synthetic TTS-sized chunks through MulawPacketizer on a single
+thread and reports 20 ms frames produced per second of CPU time, plus
+peak memory for a short and a long reply.
+
+Run from the repo root:
+    python -m benchmarks.bench_packetizer
+"""
+
+import time
+import tracemalloc
+
+import numpy as np
+
+from app.audio_packetizer import MulawPacketizer
+
+SENTENCE_SECONDS = 2.5
+REPLY_SECONDS = 60
+
+
+def synthetic_reply(sample_rate: int, seconds: float, rng: np.random.Generator):
+    """
+    Yield sentence-sized float32 chunks of speech-like audio.
+    """
+    chunk = int(sample_rate * SENTENCE_SECONDS)
+    remaining = int(sample_rate * seconds)
+    t = np.arange(chunk) / sample_rate
+    while remaining > 0:
+        n = min(chunk, remaining)
+        f0 = rng.uniform(100, 250)
+        voiced = sum(np.sin(2 * np.pi * f0 * h * t[:n]) / h for h in range(1, 12))
+        audio = 0.2 * voiced + 0.02 * rng.standard_normal(n)
+        yield audio.astype(np.float32)
+        remaining -= n
+
+
+def run(in_rate: int, seconds: float) -> dict:
+    rng = np.random.default_rng(0)
+    chunks = list(synthetic_reply(in_rate, seconds, rng))
+    packetizer = MulawPacketizer(in_rate=in_rate)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    frames = sum(1 for _ in packetizer.packetize(chunks))
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    return {
+        "frames": frames,
+        "frames_per_cpu_sec": frames / cpu if cpu else float("inf"),
+        "realtime_x": seconds / wall if wall else float("inf"),
+    }
+
+
+def peak_memory(in_rate: int, seconds: float) -> int:
+    rng = np.random.default_rng(0)
+    packetizer = MulawPacketizer(in_rate=in_rate)
+    tracemalloc.start()
+    for chunk in synthetic_reply(in_rate, seconds, rng):
+        for _ in packetizer.feed(chunk):
+            pass
+    for _ in packetizer.flush():
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+if __name__ == "__main__":
+    print(f"Reply length: {REPLY_SECONDS}s, chunk: {SENTENCE_SECONDS}s, single core\n")
+    for in_rate in (24000, 22050):
+        stats = run(in_rate, REPLY_SECONDS)
+        print(
+            f"{in_rate:>5} Hz -> 8 kHz μ-law | "
+            f"{stats['frames']} frames | "
+            f"{stats['frames_per_cpu_sec']:,.0f} frames/s/core | "
+            f"{stats['realtime_x']:,.0f}x realtime"
+        )
+
+    print()
+    for seconds in (10, 120):
+        peak = peak_memory(24000, seconds)
+        print(f"Peak traced memory, {seconds:>3}s reply: {peak / 1024:,.0f} KiB")
@@ -0,0 +1,89 @@
+"""
+Reply audio format benchmark: bytes per reply and download time.
+
+For each format in app.reply_formats.FORMATS, reports the encoded size,
+the encode time (paid once per reply and format, on first fetch) and
+the transfer time at a few uplink speeds, for a TTS-sized reply.
+
+With --url, the same reply is also downloaded from a running server in
+every format (as Twilio would fetch it through the tunnel), and the
+measured time to last byte is reported.
+
+Run from the repo root:
+    python -m benchmarks.bench_reply_formats
+    python -m benchmarks.bench_reply_formats --wav audio_output/reply_CA123.wav
+    python -m benchmarks.bench_reply_formats --url https://<tunnel>/audio/reply_CA123.wav
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from app.reply_formats import FORMATS, ReplyAudioCache, pcm_wav_bytes
+
+TTS_RATE = 22050
+LINK_MBITS = (1, 5, 20)
+
+
+def synthetic_reply(seconds: float) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    t = np.arange(int(TTS_RATE * seconds)) / TTS_RATE
+    voiced = sum(np.sin(2 * np.pi * 140 * h * t) / h for h in range(1, 12))
+    return (0.2 * voiced + 0.02 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def local(args):
+    workdir = tempfile.mkdtemp(prefix="reply_formats_")
+    source = args.wav
+    if source is None:
+        source = os.path.join(workdir, "reply.wav")
+        with open(source, "wb") as f:
+            f.write(pcm_wav_bytes(synthetic_reply(args.seconds), TTS_RATE))
+
+    original = os.path.getsize(source)
+    header = f"{'format':<10} {'bytes':>9} {'ratio':>6} {'encode ms':>10}"
+    header += "".join(f" {f'@{mbit} Mbit/s':>12}" for mbit in LINK_MBITS)
+    print(header)
+    for reply_format in FORMATS.values():
+        cache = ReplyAudioCache(os.path.join(workdir, "formats"))
+        start = time.perf_counter()
+        path = cache.path_for(source, reply_format)
+        encode_ms = (time.perf_counter() - start) * 1000 if reply_format.encode else 0.0
+        size = os.path.getsize(path)
+        row = f"{reply_format.name:<10} {size:>9} {original / size:>5.1f}x {encode_ms:>10.1f}"
+        row += "".join(f" {size * 8 / (mbit * 1e6) * 1000:>9.0f} ms" for mbit in LINK_MBITS)
+        print(row)
+
+
+def remote(args):
+    import httpx
+
+    print(f"\nDownloads from {args.url} ({args.rounds} rounds)")
+    print(f"{'format':<10} {'bytes':>9} {'p50 ms':>8} {'max ms':>8}")
+    with httpx.Client(timeout=30.0) as client:
+        for name in FORMATS:
+            client.get(args.url, params={"format": name}).raise_for_status()  # encode + warm the cache
+            times, size = [], 0
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                response = client.get(args.url, params={"format": name})
+                response.raise_for_status()
+                size = len(response.content)
+                times.append((time.perf_counter() - start) * 1000)
+            print(f"{name:<10} {size:>9} {statistics.median(times):>8.0f} {max(times):>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--wav", help="A synthesized 16-bit PCM reply (default: synthetic speech)")
+    parser.add_argument("--seconds", type=float, default=8.0, help="Synthetic reply length")
+    parser.add_argument("--url", help="/audio/<file> URL on a running server to download from")
+    parser.add_argument("--rounds", type=int, default=5, help="Downloads per format with --url")
+    args = parser.parse_args()
+    local(args)
+    if args.url:
+        remote(args)
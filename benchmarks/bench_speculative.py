@@ -0,0 +1,128 @@
+"""
+Speculative decoding benchmark: Llama-3.2-3B alone vs prompt-lookup
+drafting vs phi-2 as a draft model.
+
+Prompts are packed exactly like the agent does (PromptBuilder, same
+budget and sentence limit) from knowledge-base sections, so the answers
+can copy context text the way real replies do. Each mode runs in its own
+subprocess. Reported per mode:
+- decode tokens/sec (excluding time to first token) and speed-up vs off
+- time to first token
+- draft acceptance rate (accepted / proposed draft tokens)
+
+Run from the repo root (needs the GGUF models in models/):
+    python -m benchmarks.bench_speculative
+    python -m benchmarks.bench_speculative --temperature 0 --rounds 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODES = ["off", "prompt-lookup", "draft-model"]
+QUESTIONS = [
+    ("What are your opening hours on weekends?", "## Open Hours"),
+    ("Do you deliver and how long does it take?", "## Delivery Options"),
+    ("How do I reserve a table for a group?", "## Table Reservation System"),
+    ("What is on the menu?", "## Menu"),
+]
+
+
+def context_for(sections, heading):
+    # Relevant section first, then the rest (the builder packs to budget)
+    return sorted(sections, key=lambda s: not s.startswith(heading))
+
+
+def measure(mode: str, rounds: int, temperature: float) -> dict:
+    from langchain_community.llms import LlamaCpp
+
+    from app.config import ACTIVE_MODEL_PATH, KNOWLEDGE_BASE_PATH, LLM_N_CTX
+    from app.cpu_scheduler import cpu_scheduler
+    from app.prompt_builder import GenerationResult, PromptBuilder
+    from app.speculative import DraftModelDrafter, make_drafter
+    from app.vector_search import split_knowledge_base
+
+    drafter = make_drafter(mode, n_threads=cpu_scheduler.plan["llm"].threads)
+    llm_kwargs = cpu_scheduler.llama_kwargs()
+    if drafter is not None:
+        llm_kwargs.setdefault("model_kwargs", {})["draft_model"] = drafter
+    llm = LlamaCpp(
+        model_path=ACTIVE_MODEL_PATH,
+        n_ctx=LLM_N_CTX,
+        temperature=temperature,
+        verbose=False,
+        **llm_kwargs,
+    )
+    if isinstance(drafter, DraftModelDrafter):
+        drafter.bind(llm.client)
+    builder = PromptBuilder(llm, drafter=drafter)
+
+    with open(KNOWLEDGE_BASE_PATH, "r", encoding="utf-8") as f:
+        sections = split_knowledge_base(f.read())
+    prompts = [builder.build(q, context_for(sections, heading)) for q, heading in QUESTIONS]
+
+    builder.generate(prompts[0])  # warm-up
+
+    rates, first_token, decoded, proposed, accepted = [], [], 0, 0, 0
+    for _ in range(rounds):
+        for packed in prompts:
+            stats = GenerationResult(text="", prefill_tokens=packed.prefill_tokens, decode_tokens=0)
+            t0 = time.perf_counter()
+            t_first = None
+            for _ in builder.stream(packed, stats=stats):
+                if t_first is None:
+                    t_first = time.perf_counter()
+            t_end = time.perf_counter()
+            if t_first is None or stats.decode_tokens < 2:
+                continue
+            first_token.append(t_first - t0)
+            rates.append((stats.decode_tokens - 1) / max(t_end - t_first, 1e-9))
+            decoded += stats.decode_tokens
+            proposed += stats.draft_proposed
+            accepted += stats.draft_accepted
+
+    return {
+        "mode": mode,
+        "tokens_per_s": statistics.median(rates),
+        "ttft_s": statistics.median(first_token),
+        "decoded": decoded,
+        "proposed": proposed,
+        "accepted": accepted,
+    }
+
+
+def main(args):
+    print(f"{len(QUESTIONS)} prompts x {args.rounds} rounds, temperature {args.temperature}")
+    print(f"{'mode':<14} {'tok/s':>7} {'speed-up':>9} {'TTFT s':>7} {'accepted':>9} {'proposed':>9} {'accept %':>9}")
+    baseline = None
+    for mode in MODES:
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_speculative", "--only", mode,
+             "--rounds", str(args.rounds), "--temperature", str(args.temperature)],
+            capture_output=True, text=True, env={**os.environ, "LLM_SPECULATIVE": mode},
+        )
+        if proc.returncode != 0:
+            print(f"{mode:<14} failed: {proc.stderr.strip().splitlines()[-1:]}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        baseline = baseline or (r["tokens_per_s"] if mode == "off" else None)
+        speed_up = f"{r['tokens_per_s'] / baseline:.2f}x" if baseline else "-"
+        rate = f"{r['accepted'] / r['proposed']:.0%}" if r["proposed"] else "-"
+        print(f"{mode:<14} {r['tokens_per_s']:>7.1f} {speed_up:>9} {r['ttft_s']:>7.2f} "
+              f"{r['accepted']:>9} {r['proposed']:>9} {rate:>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=2, help="Passes over the prompts")
+    parser.add_argument("--temperature", type=float, default=0.8, help="0.8 = the agent's LlamaCpp default")
+    parser.add_argument("--only", choices=MODES, help="Measure one mode and print JSON")
+    args = parser.parse_args()
+    if args.only:
+        print(json.dumps(measure(args.only, args.rounds, args.temperature)))
+    else:
+        main(args)
@@ -0,0 +1,120 @@
+"""
+SPL Layer 2 threshold benchmark: how paraphrases score against each intent.
+
+For every intent, held-out paraphrases (not among its exemplars) and
+off-topic queries are embedded and compared with the intent's exemplars.
+Reported per intent:
+- hit: share of paraphrases that clear the intent's ``similarity``
+- p10 / median of the paraphrases' best similarity to the intent
+- neg max: highest similarity of any off-topic query or other intent's
+  paraphrase (what the threshold must stay above)
+- suggest: midpoint between neg max and p10, a starting point for the
+  rule pack's ``similarity``
+
+Run from the repo root:
+    python -m benchmarks.bench_spl_similarity
+    python -m benchmarks.bench_spl_similarity --rules data/tenants/<id>/spl_rules.json --paraphrases p.json
+
+``--paraphrases`` is a JSON object {"<intent name>": [...], "none": [...]}
+where "none" lists queries that should reach the LLM.
+"""
+
+import argparse
+import json
+import statistics
+
+import numpy as np
+
+PARAPHRASES = {
+    "opening_hours": [
+        "till what time are you open",
+        "what hours do you keep on weekends",
+        "is the place open for lunch",
+        "are you still serving at ten",
+        "when do you stop taking orders",
+    ],
+    "location": [
+        "how do i find you",
+        "whereabouts is the restaurant",
+        "can you give me directions",
+        "what street are you on",
+    ],
+    "menu": [
+        "what sort of food do you make",
+        "do you have anything without meat",
+        "can you tell me about your dishes",
+        "what's good to eat at your place",
+    ],
+    "greeting": [
+        "hi",
+        "hello there",
+        "good afternoon",
+    ],
+    "thanks": [
+        "thank you very much",
+        "great thanks",
+        "much appreciated",
+    ],
+}
+OFF_TOPIC = [
+    "can i book a table for six people on saturday",
+    "do you deliver to indiranagar",
+    "is the butter chicken spicy",
+    "how much is the thali",
+    "can i pay by card",
+    "my order arrived cold",
+]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main(args):
+    from app.embedding_engine import get_embedding_engine
+    from app.spl_engine import DEFAULT_PATTERNS, SPLEngine, load_rules
+
+    patterns = load_rules(args.rules) if args.rules else DEFAULT_PATTERNS
+    paraphrases, off_topic = PARAPHRASES, OFF_TOPIC
+    if args.paraphrases:
+        with open(args.paraphrases, "r", encoding="utf-8") as f:
+            paraphrases = json.load(f)
+        off_topic = paraphrases.pop("none", [])
+
+    engine = SPLEngine(embeddings=get_embedding_engine(), patterns=patterns)
+    if engine._exemplar_matrix is None:
+        raise SystemExit("Exemplars could not be embedded")
+
+    def best_per_intent(text: str) -> np.ndarray:
+        similarities = engine._exemplar_matrix @ engine.embed_query(text)
+        return np.maximum.reduceat(similarities, engine._intent_offsets)
+
+    scored = {text: best_per_intent(text) for texts in paraphrases.values() for text in texts}
+    scored.update({text: best_per_intent(text) for text in off_topic})
+
+    print(f"{'intent':<16} {'thresh':>7} {'hit':>6} {'p10':>6} {'median':>7} {'neg max':>8} {'suggest':>8}")
+    for index, pattern in enumerate(patterns):
+        name = pattern["name"]
+        threshold = float(engine._intent_thresholds[index])
+        positives = [float(scored[text][index]) for text in paraphrases.get(name, [])]
+        negatives = [float(scores[index]) for text, scores in scored.items() if text not in paraphrases.get(name, [])]
+        neg_max = max(negatives, default=0.0)
+        if not positives:
+            print(f"{name:<16} {threshold:>7.2f} {'-':>6} {'-':>6} {'-':>7} {neg_max:>8.2f} {'-':>8}")
+            continue
+        hit = sum(p >= threshold for p in positives) / len(positives)
+        p10 = percentile(positives, 0.1)
+        print(f"{name:<16} {threshold:>7.2f} {hit:>6.0%} {p10:>6.2f} {statistics.median(positives):>7.2f} "
+              f"{neg_max:>8.2f} {(p10 + neg_max) / 2:>8.2f}")
+        if args.verbose:
+            for text in paraphrases[name]:
+                print(f"  {float(scored[text][index]):.2f}  {text}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rules", help="Rule pack JSON (default: the built-in rules)")
+    parser.add_argument("--paraphrases", help="JSON {intent: [paraphrases], \"none\": [off-topic]}")
+    parser.add_argument("--verbose", action="store_true", help="Print every paraphrase's similarity")
+    main(parser.parse_args())
@@ -0,0 +1,134 @@
+"""
+STT benchmark: word error rate and real-time factor per decode profile.
+
+The audio set is a directory of utterances with reference transcripts
+next to them (same stem):
+
+    calls/
+        0001.wav   0001.txt
+        0002.mp3   0002.txt
+        ...
+
+Every profile in app.stt_engine.PROFILES is measured, plus "legacy" (the
+previous request-path settings: beam 5, language detection, timestamps).
+Reported per profile:
+- WER over the whole set (word edits / reference words, after lowercasing
+  and stripping punctuation)
+- RTF: decode time / audio duration (lower is faster; < 1 = faster than real time)
+- median and p95 latency per utterance
+- gated: share of utterances app.transcript_gate would send to "say that
+  again" instead of the LLM (on real speech these are false rejections;
+  "-" for legacy, which keeps no segment scores)
+
+Run from the repo root:
+    python -m benchmarks.bench_stt path/to/calls
+"""
+
+import argparse
+import os
+import re
+import statistics
+import time
+
+from app.audio_decode import SUPPORTED_UPLOAD_EXTENSIONS, WHISPER_SAMPLE_RATE, decoder_for_filename
+
+LEGACY = "legacy"
+
+
+def normalize_words(text: str):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_errors(reference, hypothesis) -> int:
+    """
+    Levenshtein distance over words (substitutions + deletions + insertions).
+    """
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def load_dataset(path: str):
+    """
+    [(name, float32 16 kHz audio, reference text)] for every audio file
+    that has a matching .txt transcript.
+    """
+    items = []
+    for filename in sorted(os.listdir(path)):
+        stem, extension = os.path.splitext(filename)
+        transcript_path = os.path.join(path, stem + ".txt")
+        if extension.lower() not in SUPPORTED_UPLOAD_EXTENSIONS or not os.path.exists(transcript_path):
+            continue
+        decoder = decoder_for_filename(filename)
+        with open(os.path.join(path, filename), "rb") as f:
+            decoder.feed(f.read())
+        with open(transcript_path, "r", encoding="utf-8") as f:
+            items.append((stem, decoder.finish(), f.read().strip()))
+    return items
+
+
+def main(args):
+    from app.stt_engine import PROFILES, get_stt_engine
+    from app.transcript_gate import transcript_gate
+
+    dataset = load_dataset(args.dataset)
+    if not dataset:
+        raise SystemExit(f"No audio files with .txt transcripts in {args.dataset}")
+    total_audio = sum(len(audio) for _, audio, _ in dataset) / WHISPER_SAMPLE_RATE
+
+    engine = get_stt_engine()
+    transcribers = {
+        LEGACY: lambda audio: "".join(s.text for s in engine.model.transcribe(audio, beam_size=5)[0]),
+    }
+    for name in PROFILES:
+        transcribers[name] = lambda audio, name=name: engine.transcribe(audio, name)  # TranscriptionResult
+
+    print(f"{len(dataset)} utterances, {total_audio:.1f}s of audio, Whisper {engine.model_size}")
+    print(f"{'profile':<12} {'WER':>7} {'RTF':>7} {'p50 s':>7} {'p95 s':>7} {'gated':>7}")
+    for name, transcribe in transcribers.items():
+        if args.profiles and name not in args.profiles:
+            continue
+        transcribe(dataset[0][1])  # warm-up
+        errors = words = 0
+        latencies = []
+        gated = scored = 0
+        for _ in range(args.rounds):
+            for stem, audio, reference in dataset:
+                t0 = time.perf_counter()
+                hypothesis = transcribe(audio)
+                latencies.append(time.perf_counter() - t0)
+                if not isinstance(hypothesis, str):
+                    scored += 1
+                    gated += transcript_gate.issue(hypothesis) is not None
+                    hypothesis = hypothesis.text
+                ref_words = normalize_words(reference)
+                errors += word_errors(ref_words, normalize_words(hypothesis))
+                words += len(ref_words)
+                if args.verbose:
+                    print(f"  [{name}] {stem}: {hypothesis.strip()}")
+        rtf = sum(latencies) / (total_audio * args.rounds)
+        gated_share = f"{gated / scored:.1%}" if scored else "-"
+        print(f"{name:<12} {errors / max(words, 1):>7.1%} {rtf:>7.3f} "
+              f"{statistics.median(latencies):>7.2f} {percentile(latencies, 0.95):>7.2f} {gated_share:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("dataset", help="Directory of audio files with .txt reference transcripts")
+    parser.add_argument("--profiles", nargs="*", help="Only these profiles (default: all + legacy)")
+    parser.add_argument("--rounds", type=int, default=1, help="Passes over the set (for stable RTF)")
+    parser.add_argument("--verbose", action="store_true", help="Print every hypothesis")
+    main(parser.parse_args())
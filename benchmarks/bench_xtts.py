@@ -0,0 +1,85 @@
+"""
+XTTS benchmark: time to first chunk (TTFC) and real-time factor (RTF).
+
+Modes, on the same sentences:
+- legacy:    ``tts.tts(...)`` per sentence: audio only once the sentence is
+             done, and with --speaker-wav the conditioning latents are
+             recomputed from the clip on every call
+- cached:    ``Xtts.inference`` with conditioning latents cached per voice
+- streaming: ``Xtts.inference_stream`` with cached latents, chunked
+
+TTFC is the time until the first audio of a sentence is available; RTF
+is render time / audio duration (< 1 = faster than real time).
+
+Run from the repo root:
+    python -m benchmarks.bench_xtts
+    python -m benchmarks.bench_xtts --speaker-wav voice.wav --chunk-size 10
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+SENTENCES = [
+    "We're open daily from eleven in the morning to half past ten at night.",
+    "Yes, we deliver within five kilometres and it usually takes about forty minutes.",
+    "I can book a table for six on Saturday evening.",
+    "Our butter chicken is mildly spiced, but the kitchen can make it hotter.",
+]
+SAMPLE_RATE = 24000
+
+
+def main(args):
+    from app.tts_streaming import StreamingTTS, _to_numpy
+
+    tts = StreamingTTS(speaker_wav=args.speaker_wav, stream_chunk_size=args.chunk_size)
+    if tts.xtts is None:
+        raise SystemExit("StreamingTTS did not load an XTTS model")
+
+    start = time.perf_counter()
+    tts.conditioning_latents()
+    print(f"Conditioning latents: {time.perf_counter() - start:.2f}s once per voice, then cached")
+
+    def legacy(sentence):
+        t0 = time.perf_counter()
+        kwargs = {"speaker_wav": args.speaker_wav} if args.speaker_wav else {"speaker": tts.speaker}
+        audio = _to_numpy(tts.tts.tts(text=sentence, language=tts.language, **kwargs))
+        elapsed = time.perf_counter() - t0
+        return elapsed, elapsed, len(audio)
+
+    def cached(sentence):
+        t0 = time.perf_counter()
+        audio = tts.synthesize_sentence(sentence, SAMPLE_RATE)
+        elapsed = time.perf_counter() - t0
+        return elapsed, elapsed, len(audio)
+
+    def streaming(sentence):
+        t0 = time.perf_counter()
+        first, samples = None, 0
+        for chunk in tts.stream_sentence(sentence, SAMPLE_RATE):
+            first = first or time.perf_counter() - t0
+            samples += len(chunk)
+        return first, time.perf_counter() - t0, samples
+
+    print(f"{'mode':<10} {'TTFC p50 s':>10} {'TTFC max s':>10} {'RTF':>6}")
+    for name, render in [("legacy", legacy), ("cached", cached), ("streaming", streaming)]:
+        render(SENTENCES[0])  # warm-up
+        first_chunk, render_time, audio_time = [], 0.0, 0.0
+        for _ in range(args.rounds):
+            for sentence in SENTENCES:
+                first, total, samples = render(sentence)
+                first_chunk.append(first)
+                render_time += total
+                audio_time += samples / SAMPLE_RATE
+        print(f"{name:<10} {statistics.median(first_chunk):>10.2f} {np.max(first_chunk):>10.2f} "
+              f"{render_time / audio_time:>6.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--speaker-wav", help="Reference clip for voice cloning (default: built-in speaker)")
+    parser.add_argument("--chunk-size", type=int, default=20, help="GPT tokens per streamed chunk")
+    parser.add_argument("--rounds", type=int, default=2, help="Passes over the sentences")
+    main(parser.parse_args())
@@ -0,0 +1,320 @@
+"""
+Synthetic-caller load generator for the FastAPI voice service.
+
+Simulates phone callers arriving as a Poisson process at each of a series
+of arrival rates. Each caller makes a few turns against the target:
+
+- twilio   POST /twilio_voice with a RecordingUrl on the local Twilio stand-in
+- upload   POST /process_audio/ with a recorded file
+- stream   POST to a streaming turn endpoint (time to first byte is recorded too)
+
+Recorded audio comes from a directory of WAV files. The Twilio stand-in
+(tools/twilio_standin.py) is started in-process to serve those
+recordings, so no real Twilio account is involved.
+
+Reports per-turn latency percentiles, error rate and achieved throughput
+per arrival rate, and the saturation point: the first rate where p95
+exceeds the SLO (Twilio's ~15 s webhook timeout by default), the error
+rate exceeds the limit, or a backlog is still draining long after
+arrivals stop.
+
+    python -m tools.load_generator --recordings path/to/wavs \\
+        --target http://127.0.0.1:8000 --rates 0.2,0.5,1,2 --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+import uvicorn
+
+from tools.twilio_standin import create_app, recording_url
+
+ERROR_MARKERS = ("apologize", "error occurred", "could not retrieve")
+
+
+@dataclass
+class TurnResult:
+    endpoint: str
+    latency: float
+    ok: bool
+    first_byte: Optional[float] = None
+    detail: str = ""
+
+
+@dataclass
+class StepReport:
+    rate: float
+    offered_calls: int
+    turns: int
+    errors: int
+    error_rate: float
+    throughput: float
+    offered_turn_rate: float
+    p50: float
+    p90: float
+    p95: float
+    p99: float
+    max: float
+    drain: float
+    backlog: bool
+    ttfb_p50: Optional[float] = None
+    by_endpoint: Dict[str, Dict[str, float]] = field(default_factory=dict)
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+# =========================
+# Local Twilio stand-in
+# =========================
+
+def start_standin(recordings_dir: str, host: str, port: int, latency: float) -> uvicorn.Server:
+    config = uvicorn.Config(create_app(recordings_dir, latency), host=host, port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, name="twilio-standin", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+# =========================
+# Callers
+# =========================
+
+class LoadGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.recordings = sorted(
+            os.path.splitext(name)[0]
+            for name in os.listdir(args.recordings)
+            if name.endswith(".wav")
+        )
+        if not self.recordings:
+            raise SystemExit(f"No .wav recordings in {args.recordings}")
+        self.standin_url = f"http://{args.standin_host}:{args.standin_port}"
+        self.endpoints = args.endpoints.split(",")
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def twilio_turn(self, call_sid: str, recording_sid: str) -> TurnResult:
+        form = {
+            "CallSid": call_sid,
+            "RecordingUrl": recording_url(self.standin_url, recording_sid),
+            "From": "+15550000000",
+            "To": self.args.dialed_number,
+        }
+        start = time.perf_counter()
+        response = await self.client.post(f"{self.args.target}/twilio_voice", data=form)
+        latency = time.perf_counter() - start
+        body = response.text.lower()
+        ok = response.status_code == 200 and not any(marker in body for marker in ERROR_MARKERS)
+        return TurnResult("twilio", latency, ok, detail="" if ok else f"{response.status_code}")
+
+    async def upload_turn(self, recording_sid: str) -> TurnResult:
+        path = os.path.join(self.args.recordings, f"{recording_sid}.wav")
+        with open(path, "rb") as f:
+            files = {"audio_file": (f"{recording_sid}.wav", f.read(), "audio/wav")}
+        start = time.perf_counter()
+        response = await self.client.post(f"{self.args.target}/process_audio/", files=files)
+        latency = time.perf_counter() - start
+        ok = response.status_code == 200
+        return TurnResult("upload", latency, ok, detail="" if ok else f"{response.status_code}")
+
+    async def stream_turn(self, recording_sid: str) -> TurnResult:
+        path = os.path.join(self.args.recordings, f"{recording_sid}.wav")
+        with open(path, "rb") as f:
+            files = {"audio_file": (f"{recording_sid}.wav", f.read(), "audio/wav")}
+        start = time.perf_counter()
+        first_byte = None
+        async with self.client.stream("POST", f"{self.args.target}{self.args.stream_path}", files=files) as response:
+            async for _ in response.aiter_bytes():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - start
+            ok = response.status_code == 200
+        latency = time.perf_counter() - start
+        return TurnResult("stream", latency, ok, first_byte=first_byte, detail="" if ok else f"{response.status_code}")
+
+    async def caller(self, results: List[TurnResult]):
+        call_sid = f"CA{uuid.uuid4().hex}"
+        for _ in range(self.args.turns_per_call):
+            endpoint = random.choice(self.endpoints)
+            recording_sid = random.choice(self.recordings)
+            try:
+                if endpoint == "twilio":
+                    result = await self.twilio_turn(call_sid, recording_sid)
+                elif endpoint == "upload":
+                    result = await self.upload_turn(recording_sid)
+                else:
+                    result = await self.stream_turn(recording_sid)
+            except Exception as e:
+                result = TurnResult(endpoint, float("nan"), False, detail=type(e).__name__)
+            results.append(result)
+            await asyncio.sleep(random.uniform(*self.args.think_time))
+
+    async def run_step(self, rate: float) -> StepReport:
+        """
+        Poisson arrivals at ``rate`` calls/s for ``duration`` seconds, at
+        most ``max_callers`` active at once; waits for all calls to finish.
+        """
+        results: List[TurnResult] = []
+        active = asyncio.Semaphore(self.args.max_callers)
+        tasks = []
+
+        async def admitted_caller():
+            async with active:
+                await self.caller(results)
+
+        start = time.perf_counter()
+        deadline = start + self.args.duration
+        while time.perf_counter() < deadline:
+            tasks.append(asyncio.create_task(admitted_caller()))
+            await asyncio.sleep(random.expovariate(rate))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+        latencies = [r.latency for r in results if r.ok]
+        errors = sum(1 for r in results if not r.ok)
+        first_bytes = [r.first_byte for r in results if r.first_byte is not None]
+
+        by_endpoint = {}
+        for endpoint in self.endpoints:
+            subset = [r for r in results if r.endpoint == endpoint]
+            ok = [r.latency for r in subset if r.ok]
+            if subset:
+                by_endpoint[endpoint] = {
+                    "turns": len(subset),
+                    "error_rate": 1 - len(ok) / len(subset),
+                    "p50": percentile(ok, 0.50),
+                    "p95": percentile(ok, 0.95),
+                }
+
+        # Once arrivals stop, an unsaturated service finishes the last calls
+        # in about one call's duration; a longer drain means a queue built up
+        p50 = percentile(latencies, 0.50)
+        call_time = self.args.turns_per_call * ((p50 if latencies else 0.0) + sum(self.args.think_time) / 2)
+        drain = elapsed - self.args.duration
+
+        return StepReport(
+            rate=rate,
+            offered_calls=len(tasks),
+            turns=len(results),
+            errors=errors,
+            error_rate=errors / len(results) if results else 0.0,
+            throughput=len(latencies) / elapsed if elapsed else 0.0,
+            # Realized (not nominal) arrivals
+            offered_turn_rate=len(tasks) * self.args.turns_per_call / self.args.duration,
+            p50=p50,
+            p90=percentile(latencies, 0.90),
+            p95=percentile(latencies, 0.95),
+            p99=percentile(latencies, 0.99),
+            max=max(latencies) if latencies else float("nan"),
+            drain=drain,
+            backlog=drain > 2 * call_time + 1.0,
+            ttfb_p50=statistics.median(first_bytes) if first_bytes else None,
+            by_endpoint=by_endpoint,
+        )
+
+    async def run(self) -> List[StepReport]:
+        limits = httpx.Limits(max_connections=self.args.max_callers, max_keepalive_connections=self.args.max_callers)
+        async with httpx.AsyncClient(timeout=self.args.timeout, limits=limits) as client:
+            self.client = client
+            reports = []
+            for rate in self.args.rates:
+                print(f"▶ {rate:g} calls/s for {self.args.duration:g}s ...", flush=True)
+                report = await self.run_step(rate)
+                print_step(report)
+                reports.append(report)
+            return reports
+
+
+# =========================
+# Reporting
+# =========================
+
+def print_step(r: StepReport):
+    ttfb = f" ttfb p50={r.ttfb_p50:.2f}s" if r.ttfb_p50 is not None else ""
+    print(
+        f"  turns={r.turns} errors={r.errors} ({r.error_rate:.1%}) "
+        f"throughput={r.throughput:.2f}/s (offered {r.offered_turn_rate:.2f}/s) "
+        f"p50={r.p50:.2f}s p90={r.p90:.2f}s p95={r.p95:.2f}s p99={r.p99:.2f}s max={r.max:.2f}s{ttfb} "
+        f"drain={r.drain:.1f}s{' BACKLOG' if r.backlog else ''}"
+    )
+    for endpoint, stats in r.by_endpoint.items():
+        print(f"    {endpoint:<7} turns={stats['turns']:.0f} err={stats['error_rate']:.1%} "
+              f"p50={stats['p50']:.2f}s p95={stats['p95']:.2f}s")
+
+
+def saturation_point(reports: List[StepReport], slo_p95: float, max_error_rate: float) -> Optional[StepReport]:
+    for r in reports:
+        if r.p95 > slo_p95 or r.error_rate > max_error_rate or r.backlog:
+            return r
+    return None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Synthetic-caller load generator")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="Base URL of the voice service")
+    parser.add_argument("--recordings", required=True, help="Directory of WAV recordings")
+    parser.add_argument("--endpoints", default="twilio", help="Comma list of: twilio, upload, stream")
+    parser.add_argument("--stream-path", default="/process_audio_stream/", help="Streaming endpoint path")
+    parser.add_argument("--rates", default="0.2,0.5,1,2", help="Comma list of arrival rates (calls/s)")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of arrivals per rate")
+    parser.add_argument("--turns-per-call", type=int, default=3)
+    parser.add_argument("--think-time", default="1,3", help="Pause between turns, min,max seconds")
+    parser.add_argument("--max-callers", type=int, default=64, help="Max concurrently active callers")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout (s)")
+    parser.add_argument("--slo-p95", type=float, default=15.0, help="p95 turn latency SLO (s)")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--dialed-number", default="+15551234567", help="'To' sent with webhooks")
+    parser.add_argument("--standin-host", default="127.0.0.1")
+    parser.add_argument("--standin-port", type=int, default=8081)
+    parser.add_argument("--standin-latency", type=float, default=0.05, help="Simulated Twilio API latency (s)")
+    parser.add_argument("--json", help="Write the reports to this JSON file")
+    args = parser.parse_args()
+    args.rates = [float(r) for r in args.rates.split(",")]
+    args.think_time = tuple(float(t) for t in args.think_time.split(","))
+    return args
+
+
+def main():
+    args = parse_args()
+    standin = start_standin(args.recordings, args.standin_host, args.standin_port, args.standin_latency)
+    try:
+        reports = asyncio.run(LoadGenerator(args).run())
+    finally:
+        standin.should_exit = True
+
+    saturated = saturation_point(reports, args.slo_p95, args.max_error_rate)
+    print()
+    if saturated is None:
+        print(f"No saturation up to {reports[-1].rate:g} calls/s — try higher rates.")
+    else:
+        index = reports.index(saturated)
+        sustainable = reports[index - 1].rate if index else None
+        print(f"Saturation at {saturated.rate:g} calls/s "
+              f"(p95={saturated.p95:.2f}s, errors={saturated.error_rate:.1%}, "
+              f"throughput {saturated.throughput:.2f}/{saturated.offered_turn_rate:.2f} turns/s)")
+        if sustainable is not None:
+            print(f"Highest sustainable rate tested: {sustainable:g} calls/s")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([asdict(r) for r in reports], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
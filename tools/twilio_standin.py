@@ -0,0 +1,87 @@
+"""
+Local stand-in for the parts of the Twilio REST API the agent talks to.
+
+Serves WAV files from a directory as Twilio recordings:
+
+    GET /2010-04-01/Accounts/{AccountSid}/Recordings/{RecordingSid}.wav
+    GET /2010-04-01/Accounts/{AccountSid}/Recordings/{RecordingSid}.json
+
+``RecordingSid`` is the file name without ``.wav``. Responses are sent in
+chunks, like the real API, and ``--latency`` adds a fixed delay per request.
+
+Run it as a server and send webhooks whose RecordingUrl points at it:
+    python -m tools.twilio_standin --recordings path/to/wavs --port 8081
+
+or use it in-process without a socket:
+    fetcher = RecordingFetcher(transport=httpx.ASGITransport(app=create_app(dir)))
+"""
+
+import argparse
+import asyncio
+import os
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CHUNK_SIZE = 8192
+
+
+def create_app(recordings_dir: str, latency: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    app.state.requests = 0
+
+    def recording_path(recording_sid: str) -> str:
+        path = os.path.join(recordings_dir, f"{recording_sid}.wav")
+        if not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail="Recording not found")
+        return path
+
+    @app.get("/2010-04-01/Accounts/{account_sid}/Recordings/{recording_sid}.wav")
+    async def recording_media(account_sid: str, recording_sid: str):
+        app.state.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        path = recording_path(recording_sid)
+
+        def chunks():
+            with open(path, "rb") as f:
+                while chunk := f.read(CHUNK_SIZE):
+                    yield chunk
+
+        return StreamingResponse(chunks(), media_type="audio/x-wav")
+
+    @app.get("/2010-04-01/Accounts/{account_sid}/Recordings/{recording_sid}.json")
+    async def recording_details(account_sid: str, recording_sid: str):
+        app.state.requests += 1
+        if latency:
+            await asyncio.sleep(latency)
+        path = recording_path(recording_sid)
+        return JSONResponse({
+            "sid": recording_sid,
+            "account_sid": account_sid,
+            "status": "completed",
+            "media_format": "wav",
+            "bytes": os.path.getsize(path),
+        })
+
+    return app
+
+
+def recording_url(base_url: str, recording_sid: str, account_sid: str = "ACstandin") -> str:
+    """
+    The RecordingUrl Twilio would send in the webhook for this recording.
+    """
+    return f"{base_url.rstrip('/')}/2010-04-01/Accounts/{account_sid}/Recordings/{recording_sid}"
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local Twilio API stand-in")
+    parser.add_argument("--recordings", required=True, help="Directory of WAV recordings")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="Added delay per request (s)")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.recordings, args.latency), host=args.host, port=args.port)